@@ -0,0 +1,31 @@
+"""add carts status updated_at index
+
+Revision ID: 7d1e4b9a2c30
+Revises: 286c2307065b
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d1e4b9a2c30'
+down_revision: Union[str, Sequence[str], None] = '286c2307065b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 清理任务按 (status, updated_at) 扫描，CONCURRENTLY 避免建索引期间锁住 carts 写入
+    with op.get_context().autocommit_block():
+        op.create_index('ix_carts_status_updated_at', 'carts', ['status', 'updated_at'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_carts_status_updated_at', table_name='carts', postgresql_concurrently=True)
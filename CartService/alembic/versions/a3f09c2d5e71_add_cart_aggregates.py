@@ -0,0 +1,43 @@
+"""add cart aggregates
+
+Revision ID: a3f09c2d5e71
+Revises: 7d1e4b9a2c30
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f09c2d5e71'
+down_revision: Union[str, Sequence[str], None] = '7d1e4b9a2c30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('carts', sa.Column('item_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('carts', sa.Column('subtotal', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False))
+    # 回填已有购物车的聚合值
+    op.execute(
+        """
+        UPDATE carts
+        SET item_count = totals.item_count, subtotal = totals.subtotal
+        FROM (
+            SELECT cart_id, SUM(quantity) AS item_count, SUM(quantity * unit_price) AS subtotal
+            FROM cart_items
+            GROUP BY cart_id
+        ) AS totals
+        WHERE carts.id = totals.cart_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('carts', 'subtotal')
+    op.drop_column('carts', 'item_count')
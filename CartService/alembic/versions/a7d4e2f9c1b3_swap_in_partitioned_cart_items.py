@@ -0,0 +1,106 @@
+"""swap in partitioned cart_items
+
+Revision ID: a7d4e2f9c1b3
+Revises: f3c8a1d6e2b9
+Create Date: 2026-10-17 16:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d4e2f9c1b3'
+down_revision: Union[str, Sequence[str], None] = 'f3c8a1d6e2b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ITEM_COLUMNS = "id, cart_id, product_id, quantity, unit_price, added_at, updated_version"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 第二步：短暂锁住 cart_items 完成切换。回填脚本已完成时直接切换；
+    # 否则在锁内补齐未回填的行 (只适用于数据量小的环境，大表请先运行回填脚本)
+    op.execute("LOCK TABLE cart_items IN ACCESS EXCLUSIVE MODE")
+    op.execute(
+        f"""
+        INSERT INTO cart_items_partitioned ({ITEM_COLUMNS})
+        SELECT {ITEM_COLUMNS} FROM cart_items
+        WHERE NOT EXISTS (SELECT 1 FROM cart_items_backfill WHERE completed_at IS NOT NULL)
+        ON CONFLICT DO NOTHING
+        """
+    )
+    op.execute("DROP TRIGGER cart_items_sync_partitioned ON cart_items")
+    op.execute("DROP FUNCTION cart_items_sync_partitioned()")
+    op.execute("DROP TABLE cart_items_backfill")
+    op.execute("DROP TABLE cart_items")
+    op.execute("ALTER TABLE cart_items_partitioned RENAME TO cart_items")
+    op.execute("ALTER TABLE cart_items RENAME CONSTRAINT cart_items_partitioned_pkey TO cart_items_pkey")
+    op.execute("ALTER TABLE cart_items RENAME CONSTRAINT uq_cart_product_partitioned TO uq_cart_product")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # 恢复到 f3c8a1d6e2b9 的状态：分区表改回影子表，普通表 cart_items 整表复制重建，
+    # 期间 cart_items 不可写，只用于回滚演练或小数据量环境
+    op.execute("LOCK TABLE cart_items IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE cart_items RENAME CONSTRAINT cart_items_pkey TO cart_items_partitioned_pkey")
+    op.execute("ALTER TABLE cart_items RENAME CONSTRAINT uq_cart_product TO uq_cart_product_partitioned")
+    op.execute("ALTER TABLE cart_items RENAME TO cart_items_partitioned")
+    op.execute(
+        """
+        CREATE TABLE cart_items (
+            id uuid NOT NULL,
+            cart_id uuid NOT NULL,
+            product_id varchar(100) NOT NULL,
+            quantity integer NOT NULL,
+            unit_price numeric(10, 2) NOT NULL,
+            added_at timestamp without time zone NOT NULL,
+            updated_version integer DEFAULT 0 NOT NULL,
+            CONSTRAINT cart_items_pkey PRIMARY KEY (id),
+            CONSTRAINT uq_cart_product UNIQUE (cart_id, product_id),
+            CONSTRAINT ck_quantity_positive CHECK (quantity > 0),
+            CONSTRAINT cart_items_cart_id_fkey FOREIGN KEY (cart_id) REFERENCES carts (id) ON DELETE CASCADE
+        )
+        """
+    )
+    op.execute(f"INSERT INTO cart_items ({ITEM_COLUMNS}) SELECT {ITEM_COLUMNS} FROM cart_items_partitioned")
+    op.execute(
+        """
+        CREATE TABLE cart_items_backfill (
+            id integer PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+            last_id uuid,
+            copied bigint DEFAULT 0 NOT NULL,
+            completed_at timestamp without time zone
+        )
+        """
+    )
+    op.execute("INSERT INTO cart_items_backfill (id, completed_at) VALUES (1, now())")
+    op.execute(
+        """
+        CREATE FUNCTION cart_items_sync_partitioned() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                DELETE FROM cart_items_partitioned WHERE cart_id = OLD.cart_id AND id = OLD.id;
+            END IF;
+            IF TG_OP = 'DELETE' THEN
+                RETURN OLD;
+            END IF;
+            INSERT INTO cart_items_partitioned
+                (id, cart_id, product_id, quantity, unit_price, added_at, updated_version)
+            VALUES
+                (NEW.id, NEW.cart_id, NEW.product_id, NEW.quantity, NEW.unit_price, NEW.added_at, NEW.updated_version);
+            RETURN NEW;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER cart_items_sync_partitioned
+        AFTER INSERT OR UPDATE OR DELETE ON cart_items
+        FOR EACH ROW EXECUTE FUNCTION cart_items_sync_partitioned()
+        """
+    )
@@ -0,0 +1,55 @@
+"""add user cart indexes
+
+Revision ID: b6d2f8a4c913
+Revises: e4b7d1c9a8f2
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d2f8a4c913'
+down_revision: Union[str, Sequence[str], None] = 'e4b7d1c9a8f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 同一用户存在多个 active 购物车时，保留最近更新的一个，其余标记为 abandoned
+    op.execute(
+        """
+        UPDATE carts SET status = 'abandoned', version = version + 1
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY user_id ORDER BY updated_at DESC, id DESC) AS rank
+            FROM carts
+            WHERE user_id IS NOT NULL AND status = 'active'
+        ) ranked
+        WHERE carts.id = ranked.id AND ranked.rank > 1
+        """
+    )
+    # 用户购物车列表按 (updated_at, id) 做 keyset 分页；该索引以 user_id 开头，可替代 ix_carts_user_id。
+    # 唯一部分索引保证每个用户最多一个 active 购物车，查询活动购物车只需一次索引探测。
+    # 若去重之后、建索引完成之前又产生了重复的 active 购物车，CONCURRENTLY 会失败并留下 INVALID 索引，需删除后重跑
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_carts_user_id_updated_at', 'carts', ['user_id', 'updated_at', 'id'],
+            unique=False, postgresql_concurrently=True,
+        )
+        op.create_index(
+            'uq_carts_user_id_active', 'carts', ['user_id'],
+            unique=True, postgresql_where=sa.text("status = 'active'"), postgresql_concurrently=True,
+        )
+        op.drop_index('ix_carts_user_id', table_name='carts', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_carts_user_id', 'carts', ['user_id'], unique=False, postgresql_concurrently=True)
+        op.drop_index('uq_carts_user_id_active', table_name='carts', postgresql_concurrently=True)
+        op.drop_index('ix_carts_user_id_updated_at', table_name='carts', postgresql_concurrently=True)
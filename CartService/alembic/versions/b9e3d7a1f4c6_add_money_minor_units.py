@@ -0,0 +1,116 @@
+"""add money minor units
+
+Revision ID: b9e3d7a1f4c6
+Revises: c2e8f4a6b1d9
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e3d7a1f4c6'
+down_revision: Union[str, Sequence[str], None] = 'c2e8f4a6b1d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 第一步：增加以最小货币单位存储的 BIGINT 列和购物车币种，触发器让新写入的两种表示保持一致；
+    # 存量数据由 python -m app.services.money_backfill 分批回填，之后 d4a8c2e6f1b7 加上 NOT NULL。
+    # 带常量默认值的 ADD COLUMN 只修改系统表，不重写表
+    op.add_column('carts', sa.Column('currency', sa.String(length=3), server_default='USD', nullable=False))
+    op.add_column('carts', sa.Column('subtotal_minor', sa.BigInteger(), nullable=True))
+    op.add_column('cart_items', sa.Column('unit_price_minor', sa.BigInteger(), nullable=True))
+
+    # 与 app.core.money.ZERO_DECIMAL_CURRENCIES 保持一致
+    op.execute(
+        """
+        CREATE FUNCTION currency_exponent(code text) RETURNS integer LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT CASE WHEN code IN ('CLP', 'ISK', 'JPY', 'KRW', 'PYG', 'UGX', 'VND', 'XAF', 'XOF') THEN 0 ELSE 2 END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE FUNCTION money_to_minor(amount numeric, code text) RETURNS bigint LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT round(amount * power(10::numeric, currency_exponent(code)))::bigint
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE FUNCTION money_from_minor(amount bigint, code text) RETURNS numeric LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT amount / power(10::numeric, currency_exponent(code))
+        $$
+        """
+    )
+
+    # decimal 模式 (及旧版本应用) 只写 subtotal，minor_units 模式只写 subtotal_minor，由触发器补齐另一列
+    op.execute(
+        """
+        CREATE FUNCTION carts_sync_minor_units() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND NEW.subtotal_minor IS DISTINCT FROM OLD.subtotal_minor
+                    AND NEW.subtotal IS NOT DISTINCT FROM OLD.subtotal THEN
+                NEW.subtotal := money_from_minor(NEW.subtotal_minor, NEW.currency);
+            ELSIF TG_OP = 'INSERT' OR NEW.subtotal IS DISTINCT FROM OLD.subtotal THEN
+                NEW.subtotal_minor := money_to_minor(NEW.subtotal, NEW.currency);
+            END IF;
+            RETURN NEW;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER carts_sync_minor_units
+        BEFORE INSERT OR UPDATE OF subtotal, subtotal_minor ON carts
+        FOR EACH ROW EXECUTE FUNCTION carts_sync_minor_units()
+        """
+    )
+
+    # 明细单价由请求中的十进制金额写入，按所属购物车的币种换算；
+    # 写路径都已锁住该购物车行，查询币种是一次主键查找
+    op.execute(
+        """
+        CREATE FUNCTION cart_items_sync_minor_units() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            code text;
+        BEGIN
+            IF TG_OP = 'INSERT' OR NEW.unit_price IS DISTINCT FROM OLD.unit_price THEN
+                SELECT currency INTO code FROM carts WHERE id = NEW.cart_id;
+                -- 无小数位的货币同时规整十进制列，两列表示的金额相同
+                NEW.unit_price := round(NEW.unit_price, currency_exponent(code));
+                NEW.unit_price_minor := money_to_minor(NEW.unit_price, code);
+            END IF;
+            RETURN NEW;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER cart_items_sync_minor_units
+        BEFORE INSERT OR UPDATE OF unit_price ON cart_items
+        FOR EACH ROW EXECUTE FUNCTION cart_items_sync_minor_units()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER cart_items_sync_minor_units ON cart_items")
+    op.execute("DROP FUNCTION cart_items_sync_minor_units()")
+    op.execute("DROP TRIGGER carts_sync_minor_units ON carts")
+    op.execute("DROP FUNCTION carts_sync_minor_units()")
+    op.execute("DROP FUNCTION money_from_minor(bigint, text)")
+    op.execute("DROP FUNCTION money_to_minor(numeric, text)")
+    op.execute("DROP FUNCTION currency_exponent(text)")
+    op.drop_column('cart_items', 'unit_price_minor')
+    op.drop_column('carts', 'subtotal_minor')
+    op.drop_column('carts', 'currency')
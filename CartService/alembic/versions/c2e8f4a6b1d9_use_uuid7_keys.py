@@ -0,0 +1,53 @@
+"""use uuid7 keys
+
+Revision ID: c2e8f4a6b1d9
+Revises: a7d4e2f9c1b3
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e8f4a6b1d9'
+down_revision: Union[str, Sequence[str], None] = 'a7d4e2f9c1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # PostgreSQL 18 之前没有内置 uuidv7()：在 gen_random_uuid() 的前 48 位写入毫秒时间戳，
+    # 并把版本号从 4 (0100) 改为 7 (0111)。列类型不变，已有的 uuid4 主键继续有效
+    op.execute(
+        """
+        CREATE FUNCTION uuid_generate_v7() RETURNS uuid LANGUAGE sql VOLATILE PARALLEL SAFE AS $$
+            SELECT encode(
+                set_bit(
+                    set_bit(
+                        overlay(
+                            uuid_send(gen_random_uuid())
+                            PLACING substring(int8send(floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint) FROM 3)
+                            FROM 1 FOR 6
+                        ),
+                        52, 1
+                    ),
+                    53, 1
+                ),
+                'hex'
+            )::uuid
+        $$
+        """
+    )
+    op.alter_column('carts', 'id', server_default=sa.text('uuid_generate_v7()'))
+    op.alter_column('cart_items', 'id', server_default=sa.text('uuid_generate_v7()'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('cart_items', 'id', server_default=None)
+    op.alter_column('carts', 'id', server_default=None)
+    op.execute("DROP FUNCTION uuid_generate_v7()")
@@ -0,0 +1,52 @@
+"""enforce money minor units
+
+Revision ID: d4a8c2e6f1b7
+Revises: b9e3d7a1f4c6
+Create Date: 2026-10-17 19:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a8c2e6f1b7'
+down_revision: Union[str, Sequence[str], None] = 'b9e3d7a1f4c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MINOR_UNIT_COLUMNS = (("carts", "subtotal_minor"), ("cart_items", "unit_price_minor"))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 第二步：在 money_backfill 完成后运行。补齐回填之后仍为空的行 (回填完成时不会更新任何行，
+    # 没有运行回填的小库在这里一次完成)
+    op.execute(
+        """
+        UPDATE carts SET subtotal_minor = money_to_minor(subtotal, currency)
+        WHERE subtotal_minor IS NULL
+        """
+    )
+    op.execute(
+        """
+        UPDATE cart_items SET unit_price_minor = money_to_minor(cart_items.unit_price, carts.currency)
+        FROM carts
+        WHERE carts.id = cart_items.cart_id AND cart_items.unit_price_minor IS NULL
+        """
+    )
+    # 直接 SET NOT NULL 会在 ACCESS EXCLUSIVE 锁下全表扫描；先用 NOT VALID 的 CHECK 约束
+    # 在 SHARE UPDATE EXCLUSIVE 锁下完成校验，SET NOT NULL 据此跳过扫描
+    for table, column in MINOR_UNIT_COLUMNS:
+        constraint = f"ck_{column}_not_null"
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {constraint} CHECK ({column} IS NOT NULL) NOT VALID")
+        op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {constraint}")
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL")
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {constraint}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, column in MINOR_UNIT_COLUMNS:
+        op.alter_column(table, column, nullable=True)
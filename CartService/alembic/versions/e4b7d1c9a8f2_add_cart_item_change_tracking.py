@@ -0,0 +1,51 @@
+"""add cart item change tracking
+
+Revision ID: e4b7d1c9a8f2
+Revises: c58e2a7f1b94
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7d1c9a8f2'
+down_revision: Union[str, Sequence[str], None] = 'c58e2a7f1b94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('carts', sa.Column('changes_horizon', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('cart_items', sa.Column('updated_version', sa.Integer(), server_default='0', nullable=False))
+    # 已有明细视为在购物车当前版本时变更，since=0 的客户端仍能拿到全量
+    op.execute(
+        """
+        UPDATE cart_items
+        SET updated_version = carts.version
+        FROM carts
+        WHERE carts.id = cart_items.cart_id
+        """
+    )
+    op.create_table('cart_item_tombstones',
+    sa.Column('cart_id', sa.UUID(), nullable=False),
+    sa.Column('item_id', sa.UUID(), nullable=False),
+    sa.Column('product_id', sa.String(length=100), nullable=False),
+    sa.Column('removed_version', sa.Integer(), nullable=False),
+    sa.Column('removed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['cart_id'], ['carts.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('cart_id', 'item_id')
+    )
+    op.create_index('ix_cart_item_tombstones_removed_at', 'cart_item_tombstones', ['removed_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_cart_item_tombstones_removed_at', table_name='cart_item_tombstones')
+    op.drop_table('cart_item_tombstones')
+    op.drop_column('cart_items', 'updated_version')
+    op.drop_column('carts', 'changes_horizon')
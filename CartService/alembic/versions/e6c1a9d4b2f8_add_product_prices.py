@@ -0,0 +1,72 @@
+"""add product prices
+
+Revision ID: e6c1a9d4b2f8
+Revises: d4a8c2e6f1b7
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6c1a9d4b2f8'
+down_revision: Union[str, Sequence[str], None] = 'd4a8c2e6f1b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONS = [f"cart_items_p{n:02d}" for n in range(16)]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'product_prices',
+        sa.Column('product_id', sa.String(length=100), nullable=False),
+        sa.Column('currency', sa.String(length=3), nullable=False),
+        sa.Column('unit_price', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('discontinued', sa.Boolean(), server_default=sa.text('false'), nullable=False),
+        sa.Column('txid', sa.BigInteger(), server_default=sa.text('(pg_current_xact_id()::text)::bigint'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('product_id', 'currency'),
+    )
+    op.create_index('ix_product_prices_txid', 'product_prices', ['txid'], unique=False)
+    # 定价系统直接 UPSERT 该表，更新时由触发器刷新 txid，保证增量刷新能读到修改
+    op.execute(
+        """
+        CREATE FUNCTION product_prices_touch() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.txid := (pg_current_xact_id()::text)::bigint;
+            NEW.updated_at := now();
+            RETURN NEW;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER product_prices_touch
+        BEFORE INSERT OR UPDATE ON product_prices
+        FOR EACH ROW EXECUTE FUNCTION product_prices_touch()
+        """
+    )
+
+    # 分区表不支持 CREATE INDEX CONCURRENTLY：先在父表上建 ON ONLY 的无效索引，
+    # 逐个分区并发建索引后挂载，全部挂载后父表索引自动变为有效
+    op.execute("CREATE INDEX ix_cart_items_product_id ON ONLY cart_items (product_id)")
+    with op.get_context().autocommit_block():
+        for partition in PARTITIONS:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_product_id_idx ON {partition} (product_id)")
+            op.execute(f"ALTER INDEX ix_cart_items_product_id ATTACH PARTITION {partition}_product_id_idx")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # 删除父表索引会一并删除已挂载的分区索引
+    op.drop_index('ix_cart_items_product_id', table_name='cart_items')
+    op.execute("DROP TRIGGER product_prices_touch ON product_prices")
+    op.execute("DROP FUNCTION product_prices_touch()")
+    op.drop_index('ix_product_prices_txid', table_name='product_prices')
+    op.drop_table('product_prices')
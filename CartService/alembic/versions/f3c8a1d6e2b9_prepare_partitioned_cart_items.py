@@ -0,0 +1,97 @@
+"""prepare partitioned cart_items
+
+Revision ID: f3c8a1d6e2b9
+Revises: d81c5a3e7b26
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8a1d6e2b9'
+down_revision: Union[str, Sequence[str], None] = 'd81c5a3e7b26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CART_ITEMS_PARTITIONS = 16
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 第一步：创建按 cart_id 哈希分区的影子表，触发器把 cart_items 上的新写入同步过去；
+    # 存量数据由 python -m app.services.cart_items_backfill 分批回填，之后 a7d4e2f9c1b3 完成切换。
+    # 分区表的主键和唯一约束必须包含分区键，主键改为 (cart_id, id)。
+    # 主键 / 唯一约束的索引名在 schema 内唯一，先使用临时名称，切换时再改回
+    op.execute(
+        """
+        CREATE TABLE cart_items_partitioned (
+            id uuid NOT NULL,
+            cart_id uuid NOT NULL,
+            product_id varchar(100) NOT NULL,
+            quantity integer NOT NULL,
+            unit_price numeric(10, 2) NOT NULL,
+            added_at timestamp without time zone NOT NULL,
+            updated_version integer DEFAULT 0 NOT NULL,
+            CONSTRAINT cart_items_partitioned_pkey PRIMARY KEY (cart_id, id),
+            CONSTRAINT uq_cart_product_partitioned UNIQUE (cart_id, product_id),
+            CONSTRAINT ck_quantity_positive CHECK (quantity > 0),
+            CONSTRAINT cart_items_cart_id_fkey FOREIGN KEY (cart_id) REFERENCES carts (id) ON DELETE CASCADE
+        ) PARTITION BY HASH (cart_id)
+        """
+    )
+    for remainder in range(CART_ITEMS_PARTITIONS):
+        op.execute(
+            f"CREATE TABLE cart_items_p{remainder:02d} PARTITION OF cart_items_partitioned "
+            f"FOR VALUES WITH (MODULUS {CART_ITEMS_PARTITIONS}, REMAINDER {remainder})"
+        )
+
+    # 回填进度，支持中断后继续
+    op.execute(
+        """
+        CREATE TABLE cart_items_backfill (
+            id integer PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+            last_id uuid,
+            copied bigint DEFAULT 0 NOT NULL,
+            completed_at timestamp without time zone
+        )
+        """
+    )
+    op.execute("INSERT INTO cart_items_backfill (id) VALUES (1)")
+
+    op.execute(
+        """
+        CREATE FUNCTION cart_items_sync_partitioned() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                DELETE FROM cart_items_partitioned WHERE cart_id = OLD.cart_id AND id = OLD.id;
+            END IF;
+            IF TG_OP = 'DELETE' THEN
+                RETURN OLD;
+            END IF;
+            INSERT INTO cart_items_partitioned
+                (id, cart_id, product_id, quantity, unit_price, added_at, updated_version)
+            VALUES
+                (NEW.id, NEW.cart_id, NEW.product_id, NEW.quantity, NEW.unit_price, NEW.added_at, NEW.updated_version);
+            RETURN NEW;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER cart_items_sync_partitioned
+        AFTER INSERT OR UPDATE OR DELETE ON cart_items
+        FOR EACH ROW EXECUTE FUNCTION cart_items_sync_partitioned()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER cart_items_sync_partitioned ON cart_items")
+    op.execute("DROP FUNCTION cart_items_sync_partitioned()")
+    op.execute("DROP TABLE cart_items_backfill")
+    op.execute("DROP TABLE cart_items_partitioned")
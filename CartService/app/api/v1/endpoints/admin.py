@@ -0,0 +1,36 @@
+import secrets
+from datetime import datetime
+from typing import Literal
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.services.cart_export import EXPORT_STATUSES, export_carts
+
+
+def require_admin_token(x_admin_token: str | None = Header(default=None)) -> None:
+    """管理接口需要携带 X-Admin-Token；未配置 ADMIN_API_TOKEN 时管理接口关闭"""
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_API_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin_token)])
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+@router.get("/exports/carts")
+async def export_carts_endpoint(
+    format: Literal["ndjson", "csv"] = Query(default="ndjson"),
+    cart_status: list[Literal["active", "abandoned", "merged"]] | None = Query(default=None, alias="status"),
+    updated_from: datetime | None = Query(default=None, description="updated_at 下界 (包含)"),
+    updated_to: datetime | None = Query(default=None, description="updated_at 上界 (不包含)"),
+):
+    """流式导出购物车及明细：NDJSON 每行一个购物车，CSV 每行一个商品"""
+    statuses = tuple(cart_status) if cart_status else EXPORT_STATUSES
+    return StreamingResponse(
+        export_carts(format, statuses, updated_from, updated_to, settings.CART_EXPORT_CHUNK_SIZE),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="carts.{format}"'},
+    )
@@ -1,64 +1,291 @@
 import uuid
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.session import get_db
+from app.core.config import settings
+from app.core.etag import format_etag, etag_matches, parse_if_match
+from app.core.serialization import json_dumps
+from app.db.session import get_db, get_read_db, read_session, prefers_primary
 from app.schemas.cart import (
     CartCreate, CartResponse, CartItemCreate, CartItemResponse,
-    CartItemUpdate, CartMergeRequest
+    CartItemUpdate, CartMergeRequest, CartUserAttach, CartSummaryResponse,
+    CartBatchRequest, CartBatchResponse, CartChangesResponse, CartBatchGetRequest, CartBatchGetResponse
 )
+from app.services.cart_cache import cart_cache, CachedCart
+from app.services.cart_notifier import cart_notifier
 from app.services.cart_service import CartService
+from app.services.quantity_buffer import quantity_buffer
 
 router = APIRouter(prefix="/carts", tags=["carts"])
 
+# NDJSON 流式批量读取时每批查询的购物车数量
+BATCH_GET_STREAM_CHUNK_SIZE = 500
+
+
+async def flush_buffered_quantities(cart_id: uuid.UUID) -> None:
+    """购物车有尚未落库的数量更新时先刷新，保证读到最新值、后续写操作按顺序生效"""
+    await quantity_buffer.flush(cart_id)
+
+
+async def _stream_cart_documents(cart_ids: list[uuid.UUID], prefer_primary: bool):
+    found = set()
+    async with read_session(prefer_primary) as db:
+        for start in range(0, len(cart_ids), BATCH_GET_STREAM_CHUNK_SIZE):
+            documents = await CartService.get_cart_documents(db, cart_ids[start:start + BATCH_GET_STREAM_CHUNK_SIZE])
+            # 每批结束只读事务，避免长时间持有快照
+            await db.commit()
+            for document in documents:
+                found.add(document["id"])
+                yield json_dumps(document) + b"\n"
+    yield json_dumps({"missing": [cart_id for cart_id in cart_ids if cart_id not in found]}) + b"\n"
+
+
+def _cart_changed_message(cart_id: uuid.UUID, version: int) -> bytes:
+    return b"id: %d\nevent: cart.changed\ndata: %s\n\n" % (version, json_dumps({"cart_id": cart_id, "version": version}))
+
+
+async def _stream_cart_changes(cart_id: uuid.UUID, last_event_id: str | None):
+    async with cart_notifier.subscribe(cart_id) as subscription:
+        # 订阅之后再从主库读一次版本号，订阅建立之前提交的修改也不会漏掉；只在连接建立时查询数据库
+        try:
+            async with read_session(prefer_primary=True) as db:
+                version = await CartService.get_cart_version(db, cart_id)
+        except HTTPException:
+            return
+        yield b"retry: %d\n\n" % settings.CART_STREAM_RETRY_MS
+        if last_event_id != str(version):
+            yield _cart_changed_message(cart_id, version)
+        while True:
+            latest = await subscription.wait(settings.CART_STREAM_HEARTBEAT_SECONDS)
+            if latest is None:
+                yield b": keepalive\n\n"
+            elif latest > version:
+                version = latest
+                yield _cart_changed_message(cart_id, version)
+
+
+@router.get("/{cart_id}", response_model=CartResponse, dependencies=[Depends(flush_buffered_quantities)])
+async def get_cart(
+    cart_id: uuid.UUID,
+    if_none_match: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """获取购物车详情（包含所有商品项和计算后的总价）。支持 If-None-Match 条件请求"""
+    cached = await cart_cache.get(cart_id)
+    if cached is not None:
+        if etag_matches(if_none_match, cached.version):
+            return Response(status_code=304, headers={"ETag": format_etag(cached.version)})
+        return Response(
+            content=cached.payload, media_type="application/json", headers={"ETag": format_etag(cached.version)}
+        )
+
+    if if_none_match:
+        # 只查询版本号，未变化时不加载商品明细
+        version = await CartService.get_cart_version(db, cart_id)
+        if etag_matches(if_none_match, version):
+            return Response(status_code=304, headers={"ETag": format_etag(version)})
+
+    # 跳过 ORM 与 Pydantic 校验，Core 行直接用 orjson 序列化，结果同时写入缓存；
+    # 副本或旧快照读到的版本早于最近一次失效的版本时，缓存拒绝写入
+    document = await CartService.get_cart_document(db, cart_id)
+    payload = json_dumps(document)
+    version = document["version"]
+    await cart_cache.set(cart_id, CachedCart(version, payload))
+    return Response(content=payload, media_type="application/json", headers={"ETag": format_etag(version)})
+
+
+@router.post(":batchGet", response_model=CartBatchGetResponse)
+async def batch_get_carts(
+    batch: CartBatchGetRequest,
+    request: Request,
+    accept: str | None = Header(default=None)
+):
+    """批量获取购物车，供服务间调用。Accept: application/x-ndjson 时逐行流式返回，最后一行为 missing"""
+    cart_ids = list(dict.fromkeys(batch.cart_ids))
+    await quantity_buffer.flush(*cart_ids)
+    prefer_primary = prefers_primary(request, cart_ids)
+    if accept and "application/x-ndjson" in accept:
+        return StreamingResponse(_stream_cart_documents(cart_ids, prefer_primary), media_type="application/x-ndjson")
+
+    async with read_session(prefer_primary) as db:
+        documents = await CartService.get_cart_documents(db, cart_ids)
+    found = {document["id"] for document in documents}
+    payload = json_dumps({"carts": documents, "missing": [cart_id for cart_id in cart_ids if cart_id not in found]})
+    return Response(content=payload, media_type="application/json")
 
-@router.get("/{cart_id}", response_model=CartResponse)
-async def get_cart(cart_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
-    """获取购物车详情（包含所有商品项和计算后的总价）"""
-    cart = await CartService.get_cart(db, cart_id)
-    total_price = CartService.calculate_total(cart)
-    response = CartResponse.model_validate(cart)
-    response.total_price = total_price
-    return response
+
+@router.get(
+    "/{cart_id}/summary",
+    response_model=CartSummaryResponse,
+    dependencies=[Depends(flush_buffered_quantities)],
+)
+async def get_cart_summary(cart_id: uuid.UUID, response: Response, db: AsyncSession = Depends(get_read_db)):
+    """获取购物车摘要（商品件数和小计），只读取 carts 表"""
+    cart = await CartService.get_cart_summary(db, cart_id)
+    response.headers["ETag"] = format_etag(cart.version)
+    return CartSummaryResponse.model_validate(cart)
+
+
+@router.get(
+    "/{cart_id}/changes",
+    response_model=CartChangesResponse,
+    dependencies=[Depends(flush_buffered_quantities)],
+)
+async def get_cart_changes(
+    cart_id: uuid.UUID,
+    response: Response,
+    since: int = Query(ge=0),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """增量同步：返回 since 版本之后新增、修改和删除的商品。reset 为 true 时 upserted 为全量明细"""
+    changes = await CartService.get_changes(db, cart_id, since)
+    response.headers["ETag"] = format_etag(changes.version)
+    return changes
+
+
+@router.get("/{cart_id}/events", response_class=StreamingResponse)
+async def stream_cart_events(
+    cart_id: uuid.UUID,
+    request: Request,
+    last_event_id: str | None = Header(default=None)
+):
+    """购物车变更事件流 (Server-Sent Events)，替代轮询。
+
+    每次写操作提交后推送 cart.changed 事件 {cart_id, version}，id 为版本号，客户端据此调用 /changes 增量同步。
+    连接建立时先推送当前版本 (与 Last-Event-ID 相同时省略)，空闲时定期发送注释行作为心跳
+    """
+    async with read_session(prefers_primary(request, [cart_id])) as db:
+        await CartService.get_cart_version(db, cart_id)
+    return StreamingResponse(
+        _stream_cart_changes(cart_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("", response_model=CartResponse, status_code=201)
-async def create_cart(cart_data: CartCreate, db: AsyncSession = Depends(get_db)):
+async def create_cart(cart_data: CartCreate, response: Response, db: AsyncSession = Depends(get_db)):
     """创建新购物车"""
     cart = await CartService.create_cart(db, cart_data)
+    response.headers["ETag"] = format_etag(cart.version)
     return CartResponse.model_validate(cart)
 
 
-@router.post("/{cart_id}/items", response_model=CartItemResponse, status_code=201)
-async def add_item(cart_id: uuid.UUID, item_data: CartItemCreate, db: AsyncSession = Depends(get_db)):
+@router.post(
+    "/{cart_id}/items",
+    response_model=CartItemResponse,
+    status_code=201,
+    dependencies=[Depends(flush_buffered_quantities)],
+)
+async def add_item(
+    cart_id: uuid.UUID,
+    item_data: CartItemCreate,
+    response: Response,
+    if_match: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db)
+):
     """添加商品到购物车。如果商品已存在，则增加数量"""
-    item = await CartService.add_item(db, cart_id, item_data)
+    item, version = await CartService.add_item(db, cart_id, item_data, parse_if_match(if_match))
+    response.headers["ETag"] = format_etag(version)
     return CartItemResponse.model_validate(item)
 
 
+@router.post(
+    "/{cart_id}/items:batch",
+    response_model=CartBatchResponse,
+    dependencies=[Depends(flush_buffered_quantities)],
+)
+async def apply_batch(
+    cart_id: uuid.UUID,
+    batch: CartBatchRequest,
+    response: Response,
+    if_match: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db)
+):
+    """在一个事务内批量执行添加 / 修改数量 / 移除操作，返回最终购物车"""
+    cart, results = await CartService.apply_batch(db, cart_id, batch.operations, parse_if_match(if_match))
+    total_price = CartService.calculate_total(cart)
+    cart_response = CartResponse.model_validate(cart)
+    cart_response.total_price = total_price
+    response.headers["ETag"] = format_etag(cart.version)
+    return CartBatchResponse(cart=cart_response, results=results if batch.return_results else None)
+
+
 @router.patch("/{cart_id}/items/{item_id}", response_model=CartItemResponse)
-async def update_item(cart_id: uuid.UUID, item_id: uuid.UUID, item_data: CartItemUpdate, db: AsyncSession = Depends(get_db)):
-    """更新商品数量"""
-    item = await CartService.update_item(db, cart_id, item_id, item_data)
+async def update_item(
+    cart_id: uuid.UUID,
+    item_id: uuid.UUID,
+    item_data: CartItemUpdate,
+    response: Response,
+    if_match: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db)
+):
+    """更新商品数量。开启写缓冲且未带 If-Match 时只写入缓冲，短时间内的连续更新合并落库 (此时落库后的版本未知，不返回 ETag)"""
+    if quantity_buffer.enabled and if_match is None:
+        return CartItemResponse.model_validate(
+            await quantity_buffer.update(db, cart_id, item_id, item_data.quantity)
+        )
+    await quantity_buffer.flush(cart_id)
+    item, version = await CartService.update_item(db, cart_id, item_id, item_data, parse_if_match(if_match))
+    response.headers["ETag"] = format_etag(version)
     return CartItemResponse.model_validate(item)
 
 
-@router.delete("/{cart_id}/items/{item_id}", status_code=204)
-async def remove_item(cart_id: uuid.UUID, item_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
+@router.delete("/{cart_id}/items/{item_id}", status_code=204, dependencies=[Depends(flush_buffered_quantities)])
+async def remove_item(
+    cart_id: uuid.UUID,
+    item_id: uuid.UUID,
+    response: Response,
+    if_match: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db)
+):
     """移除单个商品"""
-    await CartService.remove_item(db, cart_id, item_id)
+    version = await CartService.remove_item(db, cart_id, item_id, parse_if_match(if_match))
+    response.headers["ETag"] = format_etag(version)
 
 
-@router.delete("/{cart_id}", status_code=204)
-async def clear_cart(cart_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
+@router.delete("/{cart_id}", status_code=204, dependencies=[Depends(flush_buffered_quantities)])
+async def clear_cart(
+    cart_id: uuid.UUID,
+    response: Response,
+    if_match: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db)
+):
     """清空购物车"""
-    await CartService.clear_cart(db, cart_id)
+    version = await CartService.clear_cart(db, cart_id, parse_if_match(if_match))
+    response.headers["ETag"] = format_etag(version)
 
 
-@router.post("/{cart_id}/merge", response_model=CartResponse)
-async def merge_carts(cart_id: uuid.UUID, merge_data: CartMergeRequest, db: AsyncSession = Depends(get_db)):
+@router.post("/{cart_id}/merge", response_model=CartResponse, dependencies=[Depends(flush_buffered_quantities)])
+async def merge_carts(
+    cart_id: uuid.UUID,
+    merge_data: CartMergeRequest,
+    response: Response,
+    if_match: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db)
+):
     """用户登录后，将匿名购物车合并到用户购物车"""
-    cart = await CartService.merge_carts(db, cart_id, merge_data.source_cart_id)
+    await quantity_buffer.flush(merge_data.source_cart_id)
+    cart = await CartService.merge_carts(db, cart_id, merge_data.source_cart_id, parse_if_match(if_match))
+    total_price = CartService.calculate_total(cart)
+    cart_response = CartResponse.model_validate(cart)
+    cart_response.total_price = total_price
+    response.headers["ETag"] = format_etag(cart.version)
+    return cart_response
+
+
+@router.put("/{cart_id}/user", response_model=CartResponse, dependencies=[Depends(flush_buffered_quantities)])
+async def attach_user(
+    cart_id: uuid.UUID,
+    attach_data: CartUserAttach,
+    response: Response,
+    if_match: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db)
+):
+    """用户登录后把匿名购物车绑定到该用户 (不合并到已有购物车时使用)"""
+    cart = await CartService.attach_user(db, cart_id, attach_data.user_id, parse_if_match(if_match))
     total_price = CartService.calculate_total(cart)
-    response = CartResponse.model_validate(cart)
-    response.total_price = total_price
-    return response
+    cart_response = CartResponse.model_validate(cart)
+    cart_response.total_price = total_price
+    response.headers["ETag"] = format_etag(cart.version)
+    return cart_response
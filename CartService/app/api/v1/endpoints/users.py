@@ -0,0 +1,43 @@
+import uuid
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cursor import encode_cursor, decode_cursor
+from app.core.etag import format_etag
+from app.core.serialization import json_dumps
+from app.db.session import get_read_db, read_session
+from app.schemas.cart import CartResponse, CartSummaryResponse, UserCartsPage
+from app.services.cart_service import CartService
+from app.services.quantity_buffer import quantity_buffer
+
+router = APIRouter(prefix="/users", tags=["users"])
+
+
+@router.get("/{user_id}/carts", response_model=UserCartsPage)
+async def list_user_carts(
+    user_id: uuid.UUID,
+    status: str | None = Query(default=None, description="按状态过滤：active / abandoned / merged"),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = Query(default=None, description="上一页返回的 next_cursor"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """按最近更新时间倒序列出用户的购物车 (keyset 分页)"""
+    after = decode_cursor(cursor) if cursor else None
+    carts, next_position = await CartService.list_user_carts(db, user_id, limit, status, after)
+    return UserCartsPage(
+        carts=[CartSummaryResponse.model_validate(cart) for cart in carts],
+        next_cursor=encode_cursor(*next_position) if next_position else None,
+    )
+
+
+@router.get("/{user_id}/active-cart", response_model=CartResponse)
+async def get_active_cart(user_id: uuid.UUID, db: AsyncSession = Depends(get_read_db)):
+    """获取用户当前的 active 购物车"""
+    document = await CartService.get_active_cart_document(db, user_id)
+    if quantity_buffer.has_pending(document["id"]):
+        # 有尚未落库的数量更新，刷新后在主库重新读取
+        await quantity_buffer.flush(document["id"])
+        async with read_session(prefer_primary=True) as primary:
+            document = await CartService.get_active_cart_document(primary, user_id)
+    return Response(
+        content=json_dumps(document), media_type="application/json", headers={"ETag": format_etag(document["version"])}
+    )
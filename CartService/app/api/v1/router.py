@@ -1,5 +1,7 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import cart
+from app.api.v1.endpoints import admin, cart, users
 
 api_router = APIRouter()
 api_router.include_router(cart.router)
+api_router.include_router(users.router)
+api_router.include_router(admin.router)
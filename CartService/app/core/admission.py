@@ -0,0 +1,159 @@
+"""准入控制：在请求进入路由、占用数据库连接之前按优先级提前拒绝多余负载
+
+- 每个用户一个令牌桶，超出速率返回 429；没有用户身份的请求和服务间的批量读取不按用户限流
+- 进程内并发请求数和主库连接池的近期等待时间超过阈值时返回 503，低优先级请求先被拒绝：
+  新建购物车 < 修改已有购物车 < 读取已有购物车
+
+拒绝响应都带 Retry-After。限流和计数都是进程内的，多 worker 部署时总量按 worker 数放大。
+"""
+import math
+import time
+from collections import OrderedDict
+import orjson
+from prometheus_client import Counter, Gauge
+from app.core.config import settings
+from app.core.metrics import pool_wait_tracker
+
+READ = "read"
+WRITE = "write"
+CREATE = "create"
+
+ADMISSION_REJECTED = Counter(
+    "cart_admission_rejected_total",
+    "准入控制拒绝的请求数",
+    ["reason", "priority"],
+)
+ADMISSION_IN_FLIGHT = Gauge("cart_admission_in_flight", "已准入、尚未完成的请求数")
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float) -> None:
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    """按用户的令牌桶，桶数量超过上限时淘汰最久未使用的用户"""
+
+    def __init__(self, max_buckets: int) -> None:
+        self.max_buckets = max_buckets
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+
+    def acquire(self, user: str, rate: float, burst: float) -> float:
+        """取一个令牌，成功返回 0，否则返回需要等待的秒数"""
+        now = time.monotonic()
+        bucket = self._buckets.get(user)
+        if bucket is None:
+            bucket = self._buckets[user] = TokenBucket(burst, now)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user)
+            bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated) * rate)
+            bucket.updated = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0.0
+        return (1 - bucket.tokens) / rate
+
+
+def classify(scope, path_prefix: str) -> str:
+    """按请求类型划分优先级：读 (含 batchGet) > 修改已有购物车 > 新建购物车"""
+    method = scope["method"]
+    path = scope["path"]
+    if method in ("GET", "HEAD") or is_service_call(scope):
+        return READ
+    if method == "POST" and path.rstrip("/") == f"{path_prefix}/carts":
+        return CREATE
+    return WRITE
+
+
+def is_event_stream(scope) -> bool:
+    """购物车变更事件流是长连接：建立时照常限流和过载检查，但不计入并发数，否则空闲连接会占满上限"""
+    return scope["method"] == "GET" and scope["path"].endswith("/events")
+
+
+def is_service_call(scope) -> bool:
+    """批量读取 (:batchGet) 供其他服务调用，不占用户的限流额度，只受过载保护约束"""
+    return scope["path"].endswith(":batchGet")
+
+
+def user_key(scope, path_prefix: str) -> str | None:
+    """限流主体：网关传入的 X-User-Id，其次是路径中的 user_id；都没有时返回 None，不按用户限流。
+
+    不退回客户端地址：部署在代理之后时所有请求的地址相同，会共用一个令牌桶
+    """
+    for name, value in scope["headers"]:
+        if name == b"x-user-id" and value:
+            return "user:" + value.decode("latin-1")
+    users_prefix = f"{path_prefix}/users/"
+    if scope["path"].startswith(users_prefix):
+        return "user:" + scope["path"][len(users_prefix):].split("/", 1)[0]
+    return None
+
+
+async def _reject(send, status: int, detail: str, retry_after: float) -> None:
+    body = orjson.dumps({"detail": detail})
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionControlMiddleware:
+    """纯 ASGI 中间件，只作用于 path_prefix 下的接口，健康检查和指标接口不受影响"""
+
+    def __init__(self, app, path_prefix: str, pool: str = "primary") -> None:
+        self.app = app
+        self.path_prefix = path_prefix
+        self.pool_wait = pool_wait_tracker(pool)
+        self.rate_limiter = RateLimiter(settings.ADMISSION_MAX_TRACKED_USERS)
+        self.in_flight = 0
+
+    def _overloaded(self, priority: str) -> bool:
+        max_in_flight = settings.ADMISSION_MAX_IN_FLIGHT
+        shed_wait = settings.ADMISSION_POOL_WAIT_SHED_MS / 1000
+        pool_wait = self.pool_wait.seconds
+        if priority == CREATE:
+            return self.in_flight >= max_in_flight * settings.ADMISSION_CREATE_IN_FLIGHT_RATIO or pool_wait >= shed_wait
+        if priority == WRITE:
+            return self.in_flight >= max_in_flight * settings.ADMISSION_WRITE_IN_FLIGHT_RATIO or pool_wait >= 2 * shed_wait
+        return self.in_flight >= max_in_flight
+
+    async def __call__(self, scope, receive, send) -> None:
+        if not settings.ADMISSION_ENABLED or scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        priority = classify(scope, self.path_prefix)
+        if self._overloaded(priority):
+            ADMISSION_REJECTED.labels("overloaded", priority).inc()
+            await _reject(send, 503, "Service overloaded, retry later", settings.ADMISSION_RETRY_AFTER_SECONDS)
+            return
+
+        rate = settings.ADMISSION_RATE_PER_SECOND
+        user = user_key(scope, self.path_prefix) if rate and not is_service_call(scope) else None
+        wait = user is not None and self.rate_limiter.acquire(user, rate, settings.ADMISSION_BURST)
+        if wait:
+            ADMISSION_REJECTED.labels("rate_limited", priority).inc()
+            await _reject(send, 429, "Too many requests", wait)
+            return
+        if is_event_stream(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            ADMISSION_IN_FLIGHT.dec()
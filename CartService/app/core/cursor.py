@@ -0,0 +1,19 @@
+import base64
+import uuid
+from datetime import datetime
+from fastapi import HTTPException, status
+
+
+def encode_cursor(updated_at: datetime, cart_id: uuid.UUID) -> str:
+    """keyset 分页游标：上一页最后一行的 (updated_at, id)，对客户端不透明"""
+    raw = f"{updated_at.isoformat()}|{cart_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_at, cart_id = raw.split("|")
+        return datetime.fromisoformat(updated_at), uuid.UUID(cart_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
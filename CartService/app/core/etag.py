@@ -0,0 +1,30 @@
+from fastapi import HTTPException, status
+
+
+def format_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def etag_matches(if_none_match: str | None, version: int) -> bool:
+    """If-None-Match 使用弱比较，允许逗号分隔的多个 ETag 和 *"""
+    if not if_none_match:
+        return False
+    current = format_etag(version)
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == current:
+            return True
+    return False
+
+
+def parse_if_match(if_match: str | None) -> int | None:
+    """解析 If-Match 为期望的购物车版本，未携带或为 * 时返回 None。
+
+    If-Match 要求强比较，弱 ETag 或无法识别的值永远不会匹配，直接返回 412。
+    """
+    if not if_match or if_match.strip() == "*":
+        return None
+    tag = if_match.strip()
+    if len(tag) > 2 and tag[0] == tag[-1] == '"' and tag[1:-1].isdigit():
+        return int(tag[1:-1])
+    raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Cart has been modified")
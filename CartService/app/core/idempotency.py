@@ -0,0 +1,337 @@
+import asyncio
+import base64
+import hashlib
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+import orjson
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+MUTATING_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+def caller_key(scope) -> bytes:
+    """Idempotency-Key 的作用域：网关传入的 X-User-Id，没有时退回客户端地址，不同调用方的同名 key 互不影响"""
+    for name, value in scope["headers"]:
+        if name == b"x-user-id" and value:
+            return b"user:" + value
+    client = scope.get("client")
+    return b"client:" + (client[0].encode() if client else b"")
+
+
+@dataclass
+class StoredResponse:
+    status: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+
+
+@dataclass
+class IdempotencyRecord:
+    fingerprint: str
+    # None 表示首个请求仍在处理中
+    response: StoredResponse | None = None
+
+
+class IdempotencyStore:
+    """Idempotency-Key 记录存储。claim 返回 None 表示当前请求获得执行权，否则返回已有记录"""
+
+    backend = "none"
+
+    async def claim(self, key: str, fingerprint: str) -> IdempotencyRecord | None:
+        return None
+
+    async def complete(self, key: str, record: IdempotencyRecord) -> None:
+        return None
+
+    async def release(self, key: str) -> None:
+        return None
+
+    async def wait(self, key: str, timeout: float) -> None:
+        await asyncio.sleep(timeout)
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """进程内存储，处理中的请求通过 asyncio.Event 唤醒等待者"""
+
+    backend = "memory"
+
+    def __init__(self, ttl_seconds: float, lock_seconds: float, max_entries: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.max_entries = max_entries
+        self._entries: dict[str, tuple[float, IdempotencyRecord]] = {}
+        self._events: dict[str, asyncio.Event] = {}
+
+    def _evict_expired(self, now: float) -> None:
+        self._entries = {key: entry for key, entry in self._entries.items() if entry[0] > now}
+
+    async def claim(self, key: str, fingerprint: str) -> IdempotencyRecord | None:
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        if len(self._entries) >= self.max_entries:
+            self._evict_expired(now)
+            # 仍然超限时淘汰最早的已完成记录。处理中的记录不淘汰，否则重试会再次抢到执行权；
+            # 处理中的记录数受并发请求数限制，只会短暂超出上限
+            excess = len(self._entries) - self.max_entries + 1
+            completed = (key for key, (_, record) in self._entries.items() if record.response is not None)
+            for evicted in list(itertools.islice(completed, max(excess, 0))):
+                del self._entries[evicted]
+        self._entries[key] = (now + self.lock_seconds, IdempotencyRecord(fingerprint))
+        self._events[key] = asyncio.Event()
+        return None
+
+    def _wake(self, key: str) -> None:
+        event = self._events.pop(key, None)
+        if event is not None:
+            event.set()
+
+    async def complete(self, key: str, record: IdempotencyRecord) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, record)
+        self._wake(key)
+
+    async def release(self, key: str) -> None:
+        self._entries.pop(key, None)
+        self._wake(key)
+
+    async def wait(self, key: str, timeout: float) -> None:
+        event = self._events.get(key)
+        if event is None:
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class RedisIdempotencyStore(IdempotencyStore):
+    """Redis 存储，多实例共享。SET NX 抢占执行权，等待者轮询结果"""
+
+    backend = "redis"
+    poll_interval = 0.05
+
+    def __init__(self, url: str, ttl_seconds: int, lock_seconds: int, key_prefix: str = "idem:") -> None:
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.key_prefix = key_prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.key_prefix}{key}"
+
+    @staticmethod
+    def _dumps(record: IdempotencyRecord) -> bytes:
+        data = {"fingerprint": record.fingerprint}
+        if record.response is not None:
+            data["status"] = record.response.status
+            data["headers"] = [[name.decode("latin-1"), value.decode("latin-1")] for name, value in record.response.headers]
+            data["body"] = base64.b64encode(record.response.body).decode()
+        return orjson.dumps(data)
+
+    @staticmethod
+    def _loads(value: bytes) -> IdempotencyRecord:
+        data = orjson.loads(value)
+        response = None
+        if "status" in data:
+            response = StoredResponse(
+                status=data["status"],
+                headers=[(name.encode("latin-1"), value.encode("latin-1")) for name, value in data["headers"]],
+                body=base64.b64decode(data["body"]),
+            )
+        return IdempotencyRecord(data["fingerprint"], response)
+
+    async def claim(self, key: str, fingerprint: str) -> IdempotencyRecord | None:
+        while True:
+            claimed = await self._redis.set(
+                self._key(key), self._dumps(IdempotencyRecord(fingerprint)), nx=True, ex=self.lock_seconds
+            )
+            if claimed:
+                return None
+            value = await self._redis.get(self._key(key))
+            if value is not None:
+                return self._loads(value)
+            # 记录恰好在两次调用之间过期，重新抢占
+
+    async def complete(self, key: str, record: IdempotencyRecord) -> None:
+        await self._redis.set(self._key(key), self._dumps(record), ex=self.ttl_seconds)
+
+    async def release(self, key: str) -> None:
+        await self._redis.delete(self._key(key))
+
+    async def wait(self, key: str, timeout: float) -> None:
+        await asyncio.sleep(min(self.poll_interval, timeout))
+
+
+def build_idempotency_store(backend: str) -> IdempotencyStore:
+    if backend == "memory":
+        return MemoryIdempotencyStore(
+            settings.IDEMPOTENCY_TTL_SECONDS, settings.IDEMPOTENCY_LOCK_SECONDS, settings.IDEMPOTENCY_MAX_ENTRIES
+        )
+    if backend == "redis":
+        return RedisIdempotencyStore(settings.REDIS_URL, settings.IDEMPOTENCY_TTL_SECONDS, settings.IDEMPOTENCY_LOCK_SECONDS)
+    if backend == "none":
+        return IdempotencyStore()
+    raise ValueError(f"Unknown idempotency backend: {backend}")
+
+
+idempotency_store = build_idempotency_store(settings.IDEMPOTENCY_BACKEND)
+
+
+async def _send_json(send, status: int, detail: str, headers: list[tuple[bytes, bytes]] = ()) -> None:
+    body = orjson.dumps({"detail": detail})
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """对带 Idempotency-Key 的写请求只执行一次：首个响应 (非 5xx) 被保存，
+    重复请求直接回放，不访问数据库；并发的重复请求等待首个请求完成。
+
+    同一个 key 用于不同请求 (方法、路径、If-Match 或请求体不同) 时返回 422。key 按调用方 (caller_key) 隔离。
+    """
+
+    def __init__(self, app, path_prefix: str, exclude_suffixes: tuple[str, ...] = (), store: IdempotencyStore | None = None) -> None:
+        self.app = app
+        self.path_prefix = path_prefix
+        self.exclude_suffixes = exclude_suffixes
+        self.store = store
+
+    def _applies(self, scope) -> bool:
+        return (
+            scope["type"] == "http"
+            and scope["method"] in MUTATING_METHODS
+            and scope["path"].startswith(self.path_prefix)
+            and not scope["path"].endswith(self.exclude_suffixes)
+        )
+
+    async def __call__(self, scope, receive, send) -> None:
+        store = self.store or idempotency_store
+        key = None
+        if store.backend != "none" and self._applies(scope):
+            key = dict(scope["headers"]).get(IDEMPOTENCY_HEADER)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > 255:
+            await _send_json(send, 400, "Invalid Idempotency-Key")
+            return
+
+        # 读取完整请求体用于计算指纹，随后原样交给下游
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        headers = dict(scope["headers"])
+        fingerprint = hashlib.sha256(
+            b"\0".join([scope["method"].encode(), scope["path"].encode(), headers.get(b"if-match", b""), body])
+        ).hexdigest()
+        # 请求头中不会出现 \0，拼接后取摘要作为存储的 key
+        store_key = hashlib.sha256(caller_key(scope) + b"\0" + key).hexdigest()
+
+        try:
+            record = await self._claim_or_wait(store, store_key, fingerprint)
+        except Exception:
+            # 存储不可用时放行，按无 Idempotency-Key 处理
+            logger.warning("idempotency store unavailable", exc_info=True)
+            await self.app(scope, self._replay_body(body), send)
+            return
+
+        if record is not None:
+            if record.fingerprint != fingerprint:
+                await _send_json(send, 422, "Idempotency-Key was used with a different request")
+            elif record.response is None:
+                await _send_json(
+                    send, 409, "A request with this Idempotency-Key is still in progress",
+                    [(b"retry-after", b"1")],
+                )
+            else:
+                await self._send_stored(send, record.response)
+            return
+
+        await self._execute(scope, body, send, store, store_key, fingerprint)
+
+    async def _claim_or_wait(self, store: IdempotencyStore, key: str, fingerprint: str) -> IdempotencyRecord | None:
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            record = await store.claim(key, fingerprint)
+            if record is None or record.response is not None or record.fingerprint != fingerprint:
+                return record
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return record
+            await store.wait(key, remaining)
+
+    @staticmethod
+    def _replay_body(body: bytes):
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if sent:
+                # 请求体已读完，之后只会等待断开
+                await asyncio.Event().wait()
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        return receive
+
+    async def _execute(self, scope, body: bytes, send, store: IdempotencyStore, key: str, fingerprint: str) -> None:
+        status = 500
+        response_headers: list[tuple[bytes, bytes]] = []
+        response_body = []
+
+        async def capture(message) -> None:
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                response_body.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, self._replay_body(body), capture)
+        except BaseException:
+            await self._release(store, key)
+            raise
+
+        # 5xx 视为未完成，释放 key 让客户端重试
+        if status >= 500:
+            await self._release(store, key)
+            return
+        record = IdempotencyRecord(fingerprint, StoredResponse(status, response_headers, b"".join(response_body)))
+        try:
+            await store.complete(key, record)
+        except Exception:
+            logger.warning("idempotency store complete failed", exc_info=True)
+
+    @staticmethod
+    async def _release(store: IdempotencyStore, key: str) -> None:
+        try:
+            await store.release(key)
+        except Exception:
+            logger.warning("idempotency store release failed", exc_info=True)
+
+    @staticmethod
+    async def _send_stored(send, response: StoredResponse) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": response.status,
+            "headers": [*response.headers, (b"idempotent-replayed", b"true")],
+        })
+        await send({"type": "http.response.body", "body": response.body})
@@ -0,0 +1,148 @@
+import time
+from contextvars import ContextVar
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# 当前请求的 ASGI scope，由 RequestScopeMiddleware 设置，路由匹配后 scope["route"] 可用
+_request_scope: ContextVar[dict | None] = ContextVar("request_scope", default=None)
+
+POOL_WAIT_SECONDS = Histogram(
+    "cart_db_pool_wait_seconds",
+    "从连接池获取连接的等待时间",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_STATEMENTS = Counter(
+    "cart_db_statements_total",
+    "按接口统计的 SQL 语句执行次数",
+    ["endpoint", "pool"],
+)
+
+
+def endpoint_label(scope: dict) -> str:
+    """请求的路由模板，例如 "GET /carts/{cart_id}"；未匹配到路由时返回 unmatched"""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    return f"{scope['method']} {route.path}"
+
+
+def current_endpoint() -> str:
+    """当前请求的路由模板；后台任务返回 background"""
+    scope = _request_scope.get()
+    if scope is None:
+        return "background"
+    return endpoint_label(scope)
+
+
+class RequestScopeMiddleware:
+    """纯 ASGI 中间件，把请求 scope 放入 ContextVar，供 SQL 事件按接口打标签"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+
+
+class PoolWaitTracker:
+    """最近获取连接的等待时间 (指数滑动平均)，没有新样本时按半衰期衰减，
+    避免在负载被拒绝、不再有请求取连接时一直保持高位"""
+
+    def __init__(self, alpha: float = 0.2, half_life: float = 1.0) -> None:
+        self.alpha = alpha
+        self.half_life = half_life
+        self._value = 0.0
+        self._updated = time.monotonic()
+
+    def _decayed(self, now: float) -> float:
+        return self._value * 0.5 ** ((now - self._updated) / self.half_life)
+
+    def observe(self, seconds: float) -> None:
+        now = time.monotonic()
+        self._value = self._decayed(now) * (1 - self.alpha) + seconds * self.alpha
+        self._updated = now
+
+    @property
+    def seconds(self) -> float:
+        return self._decayed(time.monotonic())
+
+
+_pool_waits: dict[str, PoolWaitTracker] = {}
+
+
+def pool_wait_tracker(name: str) -> PoolWaitTracker:
+    tracker = _pool_waits.get(name)
+    if tracker is None:
+        tracker = _pool_waits[name] = PoolWaitTracker()
+    return tracker
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """记录获取连接耗时的连接池，名称取自 create_engine 的 pool_logging_name"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            elapsed = time.perf_counter() - start
+            pool_wait_tracker(self.logging_name or "default").observe(elapsed)
+            POOL_WAIT_SECONDS.labels(self.logging_name or "default").observe(elapsed)
+
+
+_engines: dict[str, AsyncEngine] = {}
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    """登记引擎以导出连接池状态，并按接口统计语句数"""
+    _engines[name] = engine
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        DB_STATEMENTS.labels(current_endpoint(), name).inc()
+
+
+class PoolCollector:
+    """导出各连接池当前已借出、空闲和溢出的连接数"""
+
+    def collect(self):
+        checked_out = GaugeMetricFamily("cart_db_pool_checked_out", "已借出的连接数", labels=["pool"])
+        checked_in = GaugeMetricFamily("cart_db_pool_checked_in", "池中空闲的连接数", labels=["pool"])
+        overflow = GaugeMetricFamily("cart_db_pool_overflow", "超出 pool_size 的连接数", labels=["pool"])
+        size = GaugeMetricFamily("cart_db_pool_size", "配置的 pool_size", labels=["pool"])
+        for name, engine in _engines.items():
+            pool = engine.sync_engine.pool
+            if not isinstance(pool, AsyncAdaptedQueuePool):
+                continue
+            checked_out.add_metric([name], pool.checkedout())
+            checked_in.add_metric([name], pool.checkedin())
+            overflow.add_metric([name], max(pool.overflow(), 0))
+            size.add_metric([name], pool.size())
+        yield from (checked_out, checked_in, overflow, size)
+
+
+class CacheStatsCollector:
+    """把购物车缓存的命中统计导出为计数器"""
+
+    def __init__(self, cache) -> None:
+        self.cache = cache
+
+    def collect(self):
+        stats = self.cache.stats
+        for field in ("hits", "misses", "evictions", "invalidations", "stale_sets"):
+            counter = CounterMetricFamily(
+                f"cart_cache_{field}", f"购物车缓存 {field} 次数", labels=["backend"]
+            )
+            counter.add_metric([self.cache.backend], getattr(stats, field))
+            yield counter
@@ -0,0 +1,39 @@
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+# 没有小数位的货币；其余按 2 位小数处理。与迁移中的 SQL 函数 currency_exponent() 保持一致。
+# 三位小数的货币 (BHD / KWD 等) 超出 numeric(10, 2) 列的精度，暂不支持
+ZERO_DECIMAL_CURRENCIES = frozenset({"CLP", "ISK", "JPY", "KRW", "PYG", "UGX", "VND", "XAF", "XOF"})
+
+# API 与 numeric 列统一保留 2 位小数，两种存储模式的输出相同
+DECIMAL_PLACES = 2
+
+
+def currency_exponent(currency: str) -> int:
+    """最小货币单位对应的小数位数"""
+    return 0 if currency in ZERO_DECIMAL_CURRENCIES else 2
+
+
+def _hundredths(amount: int, currency: str) -> int:
+    return amount * 10 ** (DECIMAL_PLACES - currency_exponent(currency))
+
+
+def to_minor(amount: Decimal, currency: str) -> int:
+    """十进制金额换算为最小货币单位，舍入方式与 SQL 函数 money_to_minor() 的 round() 相同"""
+    return int(amount.scaleb(currency_exponent(currency)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(amount: int, currency: str) -> Decimal:
+    return Decimal(_hundredths(amount, currency)).scaleb(-DECIMAL_PLACES)
+
+
+@lru_cache(maxsize=16384)
+def format_minor(amount: int, currency: str) -> str:
+    """把最小货币单位的整数格式化为与 str(Decimal) 相同的字符串 (999 -> "9.99")，不构造 Decimal。
+
+    商品单价的取值很集中，缓存命中时只是一次字典查找，比 orjson 对每个 Decimal 回调 str() 更快
+    """
+    hundredths = _hundredths(amount, currency)
+    sign = "-" if hundredths < 0 else ""
+    whole, fraction = divmod(abs(hundredths), 10 ** DECIMAL_PLACES)
+    return f"{sign}{whole}.{fraction:0{DECIMAL_PLACES}d}"
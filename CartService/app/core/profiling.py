@@ -0,0 +1,190 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from prometheus_client import Histogram
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.core.config import settings
+from app.core.metrics import endpoint_label
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DB_STATEMENTS = Histogram(
+    "cart_request_db_statements",
+    "每个请求执行的 SQL 语句数",
+    ["endpoint"],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "cart_request_db_seconds",
+    "每个请求的数据库总耗时",
+    ["endpoint"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+REQUEST_SLOWEST_STATEMENT_SECONDS = Histogram(
+    "cart_request_slowest_statement_seconds",
+    "每个请求中最慢一条 SQL 的耗时",
+    ["endpoint"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+# 占位符及其后的类型转换，例如 $3::NUMERIC(10, 2)、$1::TIMESTAMP WITHOUT TIME ZONE
+_PLACEHOLDER = re.compile(
+    r"(?:\$\d+|%\(\w+\)s|\?)(?:::[A-Z]+(?: WITHOUT TIME ZONE| WITH TIME ZONE)?(?:\(\d+(?:, \d+)?\))?)?"
+)
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_VALUES_LIST = re.compile(r"\(\?, \.\.\.\)(?:, \(\?, \.\.\.\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """去掉占位符编号、类型转换以及展开后的 IN / VALUES 列表长度，得到用于比较的语句形状"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("?, ...", shape)
+    return _VALUES_LIST.sub("(?, ...), ...", shape)
+
+
+@dataclass
+class QueryProfile:
+    statements: int = 0
+    db_seconds: float = 0.0
+    slowest_seconds: float = 0.0
+    slowest_statement: str | None = None
+    shapes: Counter = field(default_factory=Counter)
+    # 外层记录，嵌套时语句同时计入各层
+    parent: "QueryProfile | None" = field(default=None, repr=False)
+
+    def record(self, statement: str, seconds: float) -> None:
+        shape = statement_shape(statement)
+        profile = self
+        while profile is not None:
+            profile.statements += 1
+            profile.db_seconds += seconds
+            profile.shapes[shape] += 1
+            if seconds > profile.slowest_seconds:
+                profile.slowest_seconds = seconds
+                profile.slowest_statement = statement
+            profile = profile.parent
+
+    def repeated_shapes(self, threshold: int) -> dict[str, int]:
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+
+_current_profile: ContextVar[QueryProfile | None] = ContextVar("current_query_profile", default=None)
+
+
+@contextmanager
+def profile_queries():
+    """在当前上下文内记录 SQL 语句，可嵌套，内层的语句也计入外层"""
+    profile = QueryProfile(parent=_current_profile.get())
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+@contextmanager
+def assert_query_budget(max_statements: int, max_repeated: int | None = None):
+    """断言代码块执行的 SQL 语句数不超过预算，供测试中按接口约束查询次数。
+
+        with assert_query_budget(3):
+            await client.post(f"/api/v1/carts/{cart_id}/items", json=...)
+    """
+    with profile_queries() as profile:
+        yield profile
+    check_query_budget(profile, max_statements, max_repeated)
+
+
+def check_query_budget(profile: QueryProfile, max_statements: int, max_repeated: int | None = None, label: str = "") -> None:
+    """语句数超过 max_statements 或同一语句形状出现超过 max_repeated 次时抛出 AssertionError"""
+    prefix = f"{label}: " if label else ""
+    assert profile.statements <= max_statements, (
+        f"{prefix}expected at most {max_statements} statements, got {profile.statements}: {dict(profile.shapes)}"
+    )
+    if max_repeated is not None:
+        repeated = profile.repeated_shapes(max_repeated + 1)
+        assert not repeated, f"{prefix}statements repeated more than {max_repeated} times: {repeated}"
+
+
+def profile_engine(engine: AsyncEngine) -> None:
+    """挂载语句计时事件，记录到当前上下文的 QueryProfile"""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def record(conn, statement: str) -> None:
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.record(statement, elapsed)
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        record(conn, statement)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def stop_timer_on_error(context):
+        # 语句执行失败时不会触发 after_cursor_execute，在这里出栈，否则计时栈随出错的语句增长、
+        # 之后的语句取到错误的开始时间；失败的语句同样计入。连接和 pre-ping 失败没有入栈，跳过
+        if context.execution_context is None or context.connection is None:
+            return
+        if context.connection.info.get("query_start"):
+            record(context.connection, context.statement)
+
+
+class ProfilingMiddleware:
+    """按请求统计语句数、数据库耗时和最慢语句，超过阈值或出现 N+1 时输出结构化告警"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not settings.SQL_PROFILING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        with profile_queries() as profile:
+            await self.app(scope, receive, send)
+
+        if not profile.statements:
+            return
+        endpoint = endpoint_label(scope)
+        REQUEST_DB_STATEMENTS.labels(endpoint).observe(profile.statements)
+        REQUEST_DB_SECONDS.labels(endpoint).observe(profile.db_seconds)
+        REQUEST_SLOWEST_STATEMENT_SECONDS.labels(endpoint).observe(profile.slowest_seconds)
+        self._check_thresholds(endpoint, scope, profile)
+
+    @staticmethod
+    def _check_thresholds(endpoint: str, scope: dict, profile: QueryProfile) -> None:
+        problems = []
+        if profile.statements > settings.SQL_PROFILE_MAX_STATEMENTS:
+            problems.append("too_many_statements")
+        if profile.db_seconds * 1000 > settings.SQL_PROFILE_SLOW_REQUEST_MS:
+            problems.append("slow_request")
+        if profile.slowest_seconds * 1000 > settings.SQL_PROFILE_SLOW_STATEMENT_MS:
+            problems.append("slow_statement")
+        repeated = profile.repeated_shapes(settings.SQL_PROFILE_REPEATED_STATEMENT_THRESHOLD)
+        if repeated:
+            problems.append("repeated_statement")
+        if not problems:
+            return
+
+        report = {
+            "endpoint": endpoint,
+            "path": scope["path"],
+            "problems": problems,
+            "statements": profile.statements,
+            "db_ms": round(profile.db_seconds * 1000, 2),
+            "slowest_ms": round(profile.slowest_seconds * 1000, 2),
+            "slowest_statement": profile.slowest_statement,
+            "repeated": repeated,
+        }
+        logger.warning("sql profile: %s", json.dumps(report, ensure_ascii=False), extra={"sql_profile": report})
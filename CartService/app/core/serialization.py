@@ -0,0 +1,16 @@
+import uuid
+from decimal import Decimal
+import orjson
+
+
+def _default(obj):
+    # 与 Pydantic 的 JSON 输出保持一致：Decimal 序列化为字符串；
+    # asyncpg 返回的 UUID 是 uuid.UUID 的子类，orjson 不会直接处理
+    if isinstance(obj, (Decimal, uuid.UUID)):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_dumps(obj) -> bytes:
+    """orjson 序列化，原生支持 uuid.UUID / datetime"""
+    return orjson.dumps(obj, default=_default)
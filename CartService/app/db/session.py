@@ -1,8 +1,41 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import asyncio
+import itertools
+import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from fastapi import Request
+from sqlalchemy import text, literal_column
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.core.config import settings
+from app.core.metrics import InstrumentedAsyncQueuePool, instrument_engine
+from app.core.profiling import profile_engine
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
+logger = logging.getLogger(__name__)
+
+
+def build_engine(url: str, name: str, pool_size: int, max_overflow: int) -> AsyncEngine:
+    """按 Settings 中的连接池参数创建引擎，并登记到 /metrics 和请求级 SQL 分析"""
+    db_engine = create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_logging_name=name,
+    )
+    instrument_engine(db_engine, name)
+    profile_engine(db_engine)
+    return db_engine
+
+
+engine = build_engine(settings.DATABASE_URL, "primary", settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -14,6 +47,90 @@ AsyncSessionLocal = async_sessionmaker(
 
 Base = declarative_base()
 
+# 当前快照中最早的未结束事务，txid 小于它的事务都已提交或回滚
+SNAPSHOT_XMIN = literal_column("(pg_snapshot_xmin(pg_current_snapshot())::text)::bigint")
+
+
+@dataclass
+class Replica:
+    name: str
+    engine: AsyncEngine
+    sessionmaker: async_sessionmaker
+    healthy: bool = True
+
+
+class ReplicaRouter:
+    """只读副本路由：在健康的副本之间轮询，全部不可用时回退主库"""
+
+    def __init__(self, urls: list[str]) -> None:
+        self.replicas = []
+        pool_size = settings.DB_REPLICA_POOL_SIZE or settings.DB_POOL_SIZE
+        max_overflow = settings.DB_REPLICA_MAX_OVERFLOW
+        if max_overflow is None:
+            max_overflow = settings.DB_MAX_OVERFLOW
+        for index, url in enumerate(urls):
+            name = f"replica-{index}"
+            replica_engine = build_engine(url, name, pool_size, max_overflow)
+            self.replicas.append(Replica(
+                name=name,
+                engine=replica_engine,
+                sessionmaker=async_sessionmaker(
+                    bind=replica_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
+                ),
+            ))
+        self._cursor = itertools.count()
+
+    def pick(self) -> Replica | None:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._cursor) % len(healthy)]
+
+    def mark_unhealthy(self, replica: Replica) -> None:
+        if replica.healthy:
+            logger.warning("read replica %s marked unhealthy", replica.name)
+        replica.healthy = False
+
+    async def check_health(self) -> None:
+        for replica in self.replicas:
+            try:
+                async with replica.engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            except Exception:
+                self.mark_unhealthy(replica)
+            else:
+                if not replica.healthy:
+                    logger.info("read replica %s is healthy again", replica.name)
+                replica.healthy = True
+
+    async def run_health_checks(self) -> None:
+        while True:
+            await self.check_health()
+            await asyncio.sleep(settings.DATABASE_REPLICA_HEALTH_INTERVAL_SECONDS)
+
+
+class RecentWrites:
+    """记录本进程最近写过的 key，窗口内的读请求走主库以保证读己之写"""
+
+    def __init__(self, window_seconds: float) -> None:
+        self.window_seconds = window_seconds
+        self._expires: dict[str, float] = {}
+
+    def mark(self, *keys: object) -> None:
+        now = time.monotonic()
+        if len(self._expires) > 10000:
+            self._expires = {key: expires for key, expires in self._expires.items() if expires > now}
+        for key in keys:
+            self._expires[str(key)] = now + self.window_seconds
+
+    def is_recent(self, key: object) -> bool:
+        expires = self._expires.get(str(key))
+        return expires is not None and expires > time.monotonic()
+
+
+replica_router = ReplicaRouter(settings.DATABASE_REPLICA_URLS)
+recent_writes = RecentWrites(settings.DATABASE_READ_YOUR_WRITES_SECONDS)
+
 
 async def get_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
@@ -21,3 +138,31 @@ async def get_db() -> AsyncSession:
             yield session
         finally:
             await session.close()
+
+
+def prefers_primary(request: Request, cart_ids) -> bool:
+    """请求头 X-Read-Consistency: strong，或任一购物车刚在本进程被写过时读主库"""
+    if request.headers.get("x-read-consistency") == "strong":
+        return True
+    return any(recent_writes.is_recent(cart_id) for cart_id in cart_ids)
+
+
+@asynccontextmanager
+async def read_session(prefer_primary: bool = False) -> AsyncIterator[AsyncSession]:
+    """只读会话：优先使用健康的副本，副本连接失败时将其摘除"""
+    replica = None if prefer_primary else replica_router.pick()
+    session_factory = replica.sessionmaker if replica else AsyncSessionLocal
+    async with session_factory() as session:
+        try:
+            yield session
+        except (DBAPIError, OSError) as exc:
+            if replica and (isinstance(exc, OSError) or exc.connection_invalidated):
+                replica_router.mark_unhealthy(replica)
+            raise
+
+
+async def get_read_db(request: Request) -> AsyncSession:
+    """只读接口使用的会话：优先路由到副本，路径中的 cart_id / user_id 需要读己之写时走主库"""
+    keys = [request.path_params[name] for name in ("cart_id", "user_id") if name in request.path_params]
+    async with read_session(prefers_primary(request, keys)) as session:
+        yield session
@@ -1,16 +1,82 @@
-from fastapi import FastAPI
+import asyncio
+import contextlib
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from prometheus_client import REGISTRY, CONTENT_TYPE_LATEST, generate_latest
 from app.api.v1.router import api_router
+from app.core.admission import AdmissionControlMiddleware
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.metrics import RequestScopeMiddleware, PoolCollector, CacheStatsCollector
+from app.core.profiling import ProfilingMiddleware
+from app.db.session import replica_router
+from app.services.cart_cache import cart_cache
+from app.services.cart_events import event_sink, run_event_relay
+from app.services.cart_notifier import cart_notifier
+from app.services.cart_sweeper import run_cart_sweeper
+from app.services.price_catalog import price_catalog, run_price_catalog_refresh
+from app.services.quantity_buffer import quantity_buffer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if price_catalog.enabled:
+        # 目录价格是加购的权威单价，加载完成之前不接收请求
+        await price_catalog.load()
+    tasks = [asyncio.create_task(run_cart_sweeper())]
+    if replica_router.replicas:
+        tasks.append(asyncio.create_task(replica_router.run_health_checks()))
+    if event_sink.backend != "none":
+        tasks.append(asyncio.create_task(run_event_relay(event_sink)))
+    if price_catalog.enabled:
+        tasks.append(asyncio.create_task(run_price_catalog_refresh(price_catalog)))
+
+    yield
+
+    for task in tasks:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    await quantity_buffer.close()
+    await event_sink.close()
+    await cart_notifier.close()
+
 
 app = FastAPI(
     title="E-commerce Shopping Cart API",
     description="高性能电商购物车微服务",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+app.add_middleware(IdempotencyMiddleware, path_prefix="/api/v1/carts", exclude_suffixes=(":batchGet",))
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestScopeMiddleware)
+app.add_middleware(AdmissionControlMiddleware, path_prefix="/api/v1")
 app.include_router(api_router, prefix="/api/v1")
 
+REGISTRY.register(PoolCollector())
+REGISTRY.register(CacheStatsCollector(cart_cache))
+
 
 @app.get("/health")
 async def health_check():
     """健康检查接口"""
     return {"status": "healthy"}
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """购物车缓存命中统计"""
+    return cart_cache.snapshot()
+
+
+@app.get("/catalog/stats")
+async def catalog_stats():
+    """价格目录的数据源、版本与最近一次刷新时间"""
+    return price_catalog.snapshot()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标：连接池状态与等待时间、按接口的语句数、缓存命中"""
+    return Response(content=generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -1,18 +1,40 @@
 import uuid
 from datetime import datetime
 from decimal import Decimal
-from sqlalchemy import String, DateTime, ForeignKey, Integer, Numeric, CheckConstraint, UniqueConstraint
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import (
+    String, DateTime, ForeignKey, Integer, BigInteger, Identity, Numeric, CheckConstraint, UniqueConstraint, Index,
+    PrimaryKeyConstraint, text
+)
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from app.core.ids import uuid7
 from app.db.session import Base
 
 
 class Cart(Base):
     __tablename__ = "carts"
+    __table_args__ = (
+        Index("ix_carts_status_updated_at", "status", "updated_at"),
+        Index("ix_carts_user_id_updated_at", "user_id", "updated_at", "id"),
+        # 每个用户最多一个 active 购物车
+        Index("uq_carts_user_id_active", "user_id", unique=True, postgresql_where=text("status = 'active'")),
+    )
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True, index=True)
+    # UUIDv7，按时间递增；数据库端默认值用于不经过 ORM 的插入
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid7, server_default=text("uuid_generate_v7()")
+    )
+    user_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True)
     status: Mapped[str] = mapped_column(String(20), default="active")
+    item_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    subtotal: Mapped[Decimal] = mapped_column(Numeric(12, 2), default=Decimal("0.00"), server_default="0", nullable=False)
+    # 以最小货币单位 (如分) 表示的 subtotal；与 subtotal 由触发器互相同步，写入任意一列即可
+    subtotal_minor: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    # ISO 4217 币种，明细单价与合计均以该币种计价
+    currency: Mapped[str] = mapped_column(String(3), default="USD", server_default="USD", nullable=False)
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1", nullable=False)
+    # 早于该版本的删除墓碑已被清理，增量同步需退回全量
+    changes_horizon: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
@@ -20,17 +42,75 @@ class Cart(Base):
 
 
 class CartItem(Base):
+    """按 cart_id 哈希分区 (16 个分区 cart_items_p00..p15，由迁移创建)。
+
+    主键和唯一约束都包含分区键；查询需带 cart_id 等值条件 (或 IN 列表) 才能裁剪到单个分区。
+    """
+
     __tablename__ = "cart_items"
     __table_args__ = (
+        PrimaryKeyConstraint("cart_id", "id", name="cart_items_pkey"),
         UniqueConstraint("cart_id", "product_id", name="uq_cart_product"),
         CheckConstraint("quantity > 0", name="ck_quantity_positive"),
+        # 价格目录变更后按商品查找需要重新定价的明细
+        Index("ix_cart_items_product_id", "product_id"),
+        {"postgresql_partition_by": "HASH (cart_id)"},
     )
 
-    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), default=uuid7, server_default=text("uuid_generate_v7()"))
     cart_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("carts.id", ondelete="CASCADE"), nullable=False)
     product_id: Mapped[str] = mapped_column(String(100), nullable=False)
     quantity: Mapped[int] = mapped_column(Integer, nullable=False)
     unit_price: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    # 由触发器按购物车币种从 unit_price 换算，插入时不需要提供
+    unit_price_minor: Mapped[int] = mapped_column(BigInteger, nullable=False)
     added_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_version: Mapped[int] = mapped_column(Integer, server_default="0", nullable=False)
 
     cart: Mapped["Cart"] = relationship("Cart", back_populates="items")
+
+
+class CartItemTombstone(Base):
+    __tablename__ = "cart_item_tombstones"
+    __table_args__ = (
+        Index("ix_cart_item_tombstones_removed_at", "removed_at"),
+    )
+
+    cart_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("carts.id", ondelete="CASCADE"), primary_key=True)
+    item_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    product_id: Mapped[str] = mapped_column(String(100), nullable=False)
+    removed_version: Mapped[int] = mapped_column(Integer, nullable=False)
+    removed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class CartEvent(Base):
+    """事务性 outbox：每个写操作在同一事务内追加一条事件，由中继按 (txid, id) 顺序投递"""
+
+    __tablename__ = "cart_events"
+    __table_args__ = (
+        Index("ix_cart_events_txid_id", "txid", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    # 写入事务的 ID。id 的分配顺序与提交顺序不一致，中继只读取 txid 早于当前快照 xmin 的事件，
+    # 这些事务都已结束，按 (txid, id) 推进的游标不会漏掉晚提交的事件
+    txid: Mapped[int] = mapped_column(
+        BigInteger, server_default=text("(pg_current_xact_id()::text)::bigint"), nullable=False
+    )
+    # 不设外键：购物车被清理后事件仍需投递
+    cart_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    event_type: Mapped[str] = mapped_column(String(40), nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class CartEventOffset(Base):
+    """每个消费者已投递到的 (txid, id) 位置"""
+
+    __tablename__ = "cart_event_offsets"
+
+    consumer: Mapped[str] = mapped_column(String(100), primary_key=True)
+    txid: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    event_id: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
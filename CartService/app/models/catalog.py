@@ -0,0 +1,26 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import String, DateTime, BigInteger, Boolean, Numeric, Index, text
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.session import Base
+
+
+class ProductPrice(Base):
+    """商品目录价格快照，由定价系统写入，价格目录按 txid 增量加载"""
+
+    __tablename__ = "product_prices"
+    __table_args__ = (
+        Index("ix_product_prices_txid", "txid"),
+    )
+
+    product_id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    currency: Mapped[str] = mapped_column(String(3), primary_key=True)
+    unit_price: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    # 下架不删除行，增量刷新据此从内存索引中移除
+    discontinued: Mapped[bool] = mapped_column(Boolean, server_default=text("false"), nullable=False)
+    # 最后一次写入的事务 ID，插入和更新时由触发器设置；与 cart_events.txid 一样，
+    # 只读取早于快照 xmin 的事务，增量游标不会漏掉晚提交的修改
+    txid: Mapped[int] = mapped_column(
+        BigInteger, server_default=text("(pg_current_xact_id()::text)::bigint"), nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=text("now()"), nullable=False)
@@ -1,13 +1,15 @@
 import uuid
 from datetime import datetime
 from decimal import Decimal
+from typing import Annotated, Literal
 from pydantic import BaseModel, Field, ConfigDict
 
 
 class CartItemCreate(BaseModel):
     product_id: str
     quantity: int = Field(gt=0, default=1)
-    unit_price: Decimal = Field(gt=0)
+    # 启用价格目录时以目录价格为准，可以不传
+    unit_price: Decimal | None = Field(default=None, gt=0)
 
 
 class CartItemUpdate(BaseModel):
@@ -27,6 +29,7 @@ class CartItemResponse(BaseModel):
 
 class CartCreate(BaseModel):
     user_id: uuid.UUID | None = None
+    currency: str = Field(default="USD", pattern="^[A-Z]{3}$")
 
 
 class CartResponse(BaseModel):
@@ -35,11 +38,102 @@ class CartResponse(BaseModel):
     id: uuid.UUID
     user_id: uuid.UUID | None
     status: str
+    version: int
+    currency: str
     created_at: datetime
     updated_at: datetime
     items: list[CartItemResponse] = []
     total_price: Decimal = Decimal("0.00")
 
 
+class CartSummaryResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: uuid.UUID
+    status: str
+    item_count: int
+    subtotal: Decimal
+    currency: str
+    version: int
+    updated_at: datetime
+
+
+class UserCartsPage(BaseModel):
+    carts: list[CartSummaryResponse]
+    next_cursor: str | None = None
+
+
+class CartItemRemoval(BaseModel):
+    id: uuid.UUID
+    product_id: str
+    version: int
+
+
+class CartChangesResponse(BaseModel):
+    cart_id: uuid.UUID
+    status: str
+    version: int
+    since: int
+    reset: bool = False
+    item_count: int
+    subtotal: Decimal
+    upserted: list[CartItemResponse] = []
+    removed: list[CartItemRemoval] = []
+
+
+class CartBatchGetRequest(BaseModel):
+    cart_ids: list[uuid.UUID] = Field(min_length=1, max_length=5000)
+
+
+class CartBatchGetResponse(BaseModel):
+    carts: list[CartResponse]
+    missing: list[uuid.UUID] = []
+
+
 class CartMergeRequest(BaseModel):
     source_cart_id: uuid.UUID
+
+
+class CartUserAttach(BaseModel):
+    user_id: uuid.UUID
+
+
+class CartBatchAdd(BaseModel):
+    op: Literal["add"]
+    product_id: str
+    quantity: int = Field(gt=0, default=1)
+    unit_price: Decimal | None = Field(default=None, gt=0)
+
+
+class CartBatchSetQuantity(BaseModel):
+    op: Literal["set_quantity"]
+    product_id: str
+    quantity: int = Field(gt=0)
+
+
+class CartBatchRemove(BaseModel):
+    op: Literal["remove"]
+    product_id: str
+
+
+CartBatchOperation = Annotated[
+    CartBatchAdd | CartBatchSetQuantity | CartBatchRemove,
+    Field(discriminator="op"),
+]
+
+
+class CartBatchRequest(BaseModel):
+    operations: list[CartBatchOperation] = Field(min_length=1, max_length=500)
+    return_results: bool = False
+
+
+class CartBatchResult(BaseModel):
+    index: int
+    op: str
+    product_id: str
+    quantity: int
+
+
+class CartBatchResponse(BaseModel):
+    cart: CartResponse
+    results: list[CartBatchResult] | None = None
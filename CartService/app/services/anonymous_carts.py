@@ -0,0 +1,434 @@
+"""匿名购物车层
+
+未登录用户创建的购物车 (user_id 为空) 大多只是浏览会话，不会下单。开启后这些购物车只保存在
+带 TTL 的 KV 层 (进程内或 Redis)，不写 carts / cart_items / cart_events；直到合并 (merge_carts)
+或绑定用户时才提升 (promote) 到 PostgreSQL。过期未提升的购物车直接丢弃，不需要清理任务。
+
+AnonymousCart / AnonymousCartItem 与 ORM 的 Cart / CartItem 字段一致，CartService 的调用方
+(Pydantic 校验、calculate_total) 无需区分两者。
+"""
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, TypeVar
+import orjson
+from fastapi import HTTPException, status
+from app.core.config import settings
+from app.core.ids import uuid7
+from app.core.money import from_minor, to_minor
+from app.core.serialization import json_dumps
+
+T = TypeVar("T")
+
+# 提升期间 KV 中保留的占位值，其他请求看到后等待提升完成再读数据库
+PROMOTING = b"promoting"
+PROMOTION_LOCK_SECONDS = 30
+PROMOTION_WAIT_SECONDS = 5
+
+
+@dataclass
+class AnonymousCartItem:
+    id: uuid.UUID
+    cart_id: uuid.UUID
+    product_id: str
+    quantity: int
+    unit_price: Decimal
+    unit_price_minor: int
+    added_at: datetime
+    updated_version: int
+
+
+@dataclass
+class AnonymousCart:
+    id: uuid.UUID
+    currency: str
+    created_at: datetime
+    updated_at: datetime
+    version: int = 1
+    status: str = "active"
+    user_id: uuid.UUID | None = None
+    items: list[AnonymousCartItem] = field(default_factory=list)
+
+    @classmethod
+    def new(cls, currency: str) -> "AnonymousCart":
+        now = datetime.utcnow()
+        return cls(id=uuid7(), currency=currency, created_at=now, updated_at=now)
+
+    @property
+    def item_count(self) -> int:
+        return sum(item.quantity for item in self.items)
+
+    @property
+    def subtotal(self) -> Decimal:
+        return from_minor(self.subtotal_minor, self.currency)
+
+    @property
+    def subtotal_minor(self) -> int:
+        return sum(item.quantity * item.unit_price_minor for item in self.items)
+
+    def dumps(self) -> bytes:
+        return json_dumps(self)
+
+    @classmethod
+    def loads(cls, value: bytes) -> "AnonymousCart":
+        data = orjson.loads(value)
+        items = [
+            AnonymousCartItem(
+                id=uuid.UUID(item["id"]),
+                cart_id=uuid.UUID(item["cart_id"]),
+                product_id=item["product_id"],
+                quantity=item["quantity"],
+                unit_price=Decimal(item["unit_price"]),
+                unit_price_minor=item["unit_price_minor"],
+                added_at=datetime.fromisoformat(item["added_at"]),
+                updated_version=item["updated_version"],
+            )
+            for item in data["items"]
+        ]
+        return cls(
+            id=uuid.UUID(data["id"]),
+            currency=data["currency"],
+            created_at=datetime.fromisoformat(data["created_at"]),
+            updated_at=datetime.fromisoformat(data["updated_at"]),
+            version=data["version"],
+            status=data["status"],
+            user_id=uuid.UUID(data["user_id"]) if data["user_id"] else None,
+            items=items,
+        )
+
+    def document(self) -> dict:
+        """与 CartService.get_cart_document 返回的字段一致"""
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "status": self.status,
+            "version": self.version,
+            "currency": self.currency,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "items": [
+                {
+                    "id": item.id,
+                    "cart_id": item.cart_id,
+                    "product_id": item.product_id,
+                    "quantity": item.quantity,
+                    "unit_price": item.unit_price,
+                    "added_at": item.added_at,
+                }
+                for item in self.items
+            ],
+            "total_price": self.subtotal,
+        }
+
+    def touch(self) -> int:
+        self.version += 1
+        self.updated_at = datetime.utcnow()
+        return self.version
+
+    def find_item(self, item_id: uuid.UUID) -> AnonymousCartItem:
+        for item in self.items:
+            if item.id == item_id:
+                return item
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart item not found")
+
+    def set_line(self, product_id: str, quantity: int, unit_price: Decimal) -> AnonymousCartItem:
+        """新增或覆盖一个商品的数量和单价，调用方负责先 touch()"""
+        # 与数据库触发器一致：单价按币种舍入，两种表示的金额相同
+        unit_price_minor = to_minor(unit_price, self.currency)
+        unit_price = from_minor(unit_price_minor, self.currency)
+        for item in self.items:
+            if item.product_id == product_id:
+                item.quantity, item.unit_price, item.unit_price_minor = quantity, unit_price, unit_price_minor
+                item.updated_version = self.version
+                return item
+        item = AnonymousCartItem(
+            id=uuid7(),
+            cart_id=self.id,
+            product_id=product_id,
+            quantity=quantity,
+            unit_price=unit_price,
+            unit_price_minor=unit_price_minor,
+            added_at=datetime.utcnow(),
+            updated_version=self.version,
+        )
+        self.items.append(item)
+        return item
+
+    def add_item(self, product_id: str, quantity: int, unit_price: Decimal) -> AnonymousCartItem:
+        current = next((item.quantity for item in self.items if item.product_id == product_id), 0)
+        self.touch()
+        return self.set_line(product_id, current + quantity, unit_price)
+
+    def set_quantities(self, quantities: dict[uuid.UUID, int]) -> int:
+        items = [item for item in self.items if item.id in quantities]
+        if items:
+            self.touch()
+        for item in items:
+            item.quantity = quantities[item.id]
+            item.updated_version = self.version
+        return len(items)
+
+    def update_item(self, item_id: uuid.UUID, quantity: int) -> AnonymousCartItem:
+        item = self.find_item(item_id)
+        self.set_quantities({item_id: quantity})
+        return item
+
+    def remove_item(self, item_id: uuid.UUID) -> AnonymousCartItem:
+        item = self.find_item(item_id)
+        self.touch()
+        self.items.remove(item)
+        return item
+
+    def remove_items(self, product_ids: set[str]) -> None:
+        self.items = [item for item in self.items if item.product_id not in product_ids]
+
+    def clear(self) -> "AnonymousCart":
+        self.touch()
+        self.status = "abandoned"
+        self.items = []
+        return self
+
+
+def _apply(value: bytes, mutate: Callable[[AnonymousCart], T], expected_version: int | None) -> tuple[AnonymousCart, T]:
+    cart = AnonymousCart.loads(value)
+    if expected_version is not None and cart.version != expected_version:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Cart has been modified")
+    return cart, mutate(cart)
+
+
+class AnonymousCartStore:
+    """匿名购物车存储。backend none：不启用，所有购物车直接写入数据库。
+
+    update / take 在购物车不在本层 (从未存在、已过期或已提升) 时返回 None，调用方改走数据库；
+    mutate 抛出异常时不保存任何修改。
+    """
+
+    backend = "none"
+    enabled = False
+
+    async def create(self, cart: AnonymousCart) -> None:
+        """只在 enabled 时调用；未启用时购物车直接写入数据库"""
+        return None
+
+    async def get(self, cart_id: uuid.UUID) -> AnonymousCart | None:
+        return None
+
+    async def get_many(self, cart_ids: list[uuid.UUID]) -> dict[uuid.UUID, AnonymousCart]:
+        return {}
+
+    async def update(
+        self, cart_id: uuid.UUID, mutate: Callable[[AnonymousCart], T], expected_version: int | None = None
+    ) -> T | None:
+        return None
+
+    async def take(self, cart_id: uuid.UUID, expected_version: int | None = None) -> AnonymousCart | None:
+        """开始提升：取出购物车并留下占位值，之后调用 finish (已写入数据库) 或 restore (提升失败)"""
+        return None
+
+    async def finish(self, cart_id: uuid.UUID) -> None:
+        return None
+
+    async def restore(self, cart: AnonymousCart) -> None:
+        return None
+
+
+class MemoryAnonymousCartStore(AnonymousCartStore):
+    """进程内存储，只适用于单个 worker。条目数超过上限时淘汰最久未访问的购物车"""
+
+    backend = "memory"
+    enabled = True
+
+    def __init__(self, ttl_seconds: float, max_entries: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[uuid.UUID, tuple[float, bytes]] = OrderedDict()
+        self._promotions: dict[uuid.UUID, asyncio.Event] = {}
+
+    async def _read(self, cart_id: uuid.UUID) -> bytes | None:
+        """读取未过期的值；正在提升时等待其结束 (提升失败会恢复原值)"""
+        for _ in range(2):
+            entry = self._entries.get(cart_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[cart_id]
+                return None
+            if entry[1] != PROMOTING:
+                self._entries.move_to_end(cart_id)
+                return entry[1]
+            event = self._promotions.get(cart_id)
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), PROMOTION_WAIT_SECONDS)
+                except asyncio.TimeoutError:
+                    return None
+        return None
+
+    def _write(self, cart_id: uuid.UUID, value: bytes, ttl_seconds: float) -> None:
+        self._entries[cart_id] = (time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end(cart_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _wake(self, cart_id: uuid.UUID) -> None:
+        event = self._promotions.pop(cart_id, None)
+        if event is not None:
+            event.set()
+
+    async def create(self, cart: AnonymousCart) -> None:
+        self._write(cart.id, cart.dumps(), self.ttl_seconds)
+
+    async def get(self, cart_id: uuid.UUID) -> AnonymousCart | None:
+        value = await self._read(cart_id)
+        return AnonymousCart.loads(value) if value is not None else None
+
+    async def get_many(self, cart_ids: list[uuid.UUID]) -> dict[uuid.UUID, AnonymousCart]:
+        carts = {}
+        for cart_id in cart_ids:
+            cart = await self.get(cart_id)
+            if cart is not None:
+                carts[cart_id] = cart
+        return carts
+
+    async def update(
+        self, cart_id: uuid.UUID, mutate: Callable[[AnonymousCart], T], expected_version: int | None = None
+    ) -> T | None:
+        value = await self._read(cart_id)
+        if value is None:
+            return None
+        # 读取之后没有 await，同一事件循环内的读改写是原子的
+        cart, result = _apply(value, mutate, expected_version)
+        self._write(cart_id, cart.dumps(), self.ttl_seconds)
+        return result
+
+    async def take(self, cart_id: uuid.UUID, expected_version: int | None = None) -> AnonymousCart | None:
+        value = await self._read(cart_id)
+        if value is None:
+            return None
+        cart, _ = _apply(value, lambda cart: None, expected_version)
+        self._write(cart_id, PROMOTING, PROMOTION_LOCK_SECONDS)
+        self._promotions[cart_id] = asyncio.Event()
+        return cart
+
+    async def finish(self, cart_id: uuid.UUID) -> None:
+        self._entries.pop(cart_id, None)
+        self._wake(cart_id)
+
+    async def restore(self, cart: AnonymousCart) -> None:
+        self._write(cart.id, cart.dumps(), self.ttl_seconds)
+        self._wake(cart.id)
+
+
+class RedisAnonymousCartStore(AnonymousCartStore):
+    """Redis 存储，多个 worker / 实例共享。读改写用 WATCH / MULTI 乐观重试，每次写入刷新 TTL"""
+
+    backend = "redis"
+    enabled = True
+    poll_interval = 0.02
+
+    def __init__(self, url: str, ttl_seconds: int, key_prefix: str = "anon-cart:") -> None:
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+
+    def _key(self, cart_id: uuid.UUID) -> str:
+        return f"{self.key_prefix}{cart_id}"
+
+    async def _wait_promotion(self, key: str) -> bytes | None:
+        deadline = time.monotonic() + PROMOTION_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            value = await self._redis.get(key)
+            if value != PROMOTING:
+                return value
+        return None
+
+    async def create(self, cart: AnonymousCart) -> None:
+        await self._redis.set(self._key(cart.id), cart.dumps(), ex=self.ttl_seconds)
+
+    async def get(self, cart_id: uuid.UUID) -> AnonymousCart | None:
+        key = self._key(cart_id)
+        value = await self._redis.get(key)
+        if value == PROMOTING:
+            value = await self._wait_promotion(key)
+        return AnonymousCart.loads(value) if value is not None else None
+
+    async def get_many(self, cart_ids: list[uuid.UUID]) -> dict[uuid.UUID, AnonymousCart]:
+        values = await self._redis.mget([self._key(cart_id) for cart_id in cart_ids])
+        carts = {}
+        for cart_id, value in zip(cart_ids, values):
+            if value == PROMOTING:
+                value = await self._wait_promotion(self._key(cart_id))
+            if value is not None:
+                carts[cart_id] = AnonymousCart.loads(value)
+        return carts
+
+    async def _transact(
+        self, cart_id: uuid.UUID, mutate: Callable[[AnonymousCart], T], expected_version: int | None, promote: bool
+    ) -> tuple[AnonymousCart, T] | None:
+        from redis.exceptions import WatchError
+
+        key = self._key(cart_id)
+        async with self._redis.pipeline() as pipe:
+            while True:
+                await pipe.watch(key)
+                value = await pipe.get(key)
+                if value == PROMOTING:
+                    await pipe.reset()
+                    if await self._wait_promotion(key) is None:
+                        return None
+                    continue
+                if value is None:
+                    return None
+                cart, result = _apply(value, mutate, expected_version)
+                pipe.multi()
+                if promote:
+                    pipe.set(key, PROMOTING, ex=PROMOTION_LOCK_SECONDS)
+                else:
+                    pipe.set(key, cart.dumps(), ex=self.ttl_seconds)
+                try:
+                    await pipe.execute()
+                except WatchError:
+                    # 其他请求在读取之后修改了该购物车，重新读取后再执行
+                    continue
+                return cart, result
+
+    async def update(
+        self, cart_id: uuid.UUID, mutate: Callable[[AnonymousCart], T], expected_version: int | None = None
+    ) -> T | None:
+        # 大部分写请求针对数据库中的购物车，先用一次 EXISTS 排除，省去 WATCH / UNWATCH 往返
+        if not await self._redis.exists(self._key(cart_id)):
+            return None
+        applied = await self._transact(cart_id, mutate, expected_version, promote=False)
+        return applied[1] if applied is not None else None
+
+    async def take(self, cart_id: uuid.UUID, expected_version: int | None = None) -> AnonymousCart | None:
+        if not await self._redis.exists(self._key(cart_id)):
+            return None
+        applied = await self._transact(cart_id, lambda cart: None, expected_version, promote=True)
+        return applied[0] if applied is not None else None
+
+    async def finish(self, cart_id: uuid.UUID) -> None:
+        await self._redis.delete(self._key(cart_id))
+
+    async def restore(self, cart: AnonymousCart) -> None:
+        await self._redis.set(self._key(cart.id), cart.dumps(), ex=self.ttl_seconds)
+
+
+def build_anonymous_cart_store(backend: str) -> AnonymousCartStore:
+    if backend == "memory":
+        return MemoryAnonymousCartStore(settings.CART_ANONYMOUS_TTL_SECONDS, settings.CART_ANONYMOUS_MAX_ENTRIES)
+    if backend == "redis":
+        return RedisAnonymousCartStore(settings.REDIS_URL, settings.CART_ANONYMOUS_TTL_SECONDS)
+    if backend == "none":
+        return AnonymousCartStore()
+    raise ValueError(f"Unknown anonymous cart backend: {backend}")
+
+
+anonymous_carts = build_anonymous_cart_store(settings.CART_ANONYMOUS_BACKEND)
@@ -0,0 +1,44 @@
+"""分批在线任务 (回填、重新定价) 的公共部分：命令行参数、批循环和退出时释放连接池。
+
+各任务只提供单批的短事务，返回是否还有下一批：
+
+    async def next_batch() -> bool:
+        ...
+
+    parser = job_parser("...", batch_size=1000)
+    run_job(lambda args: run_batches(next_batch, args.pause), parser)
+"""
+import argparse
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from app.db.session import engine
+
+
+def job_parser(description: str, batch_size: int, batch_help: str | None = None) -> argparse.ArgumentParser:
+    """带 --batch-size 和 --pause 的命令行参数，任务在此基础上添加自己的参数"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--batch-size", type=int, default=batch_size, help=batch_help)
+    parser.add_argument("--pause", type=float, default=0.05, help="两批之间暂停的秒数")
+    return parser
+
+
+async def run_batches(next_batch: Callable[[], Awaitable[bool]], pause: float) -> None:
+    """反复执行 next_batch，直到它返回 False (本批不满，已经处理完)"""
+    while await next_batch():
+        # 两批之间暂停，给主库的正常写入和复制让出资源
+        await asyncio.sleep(pause)
+
+
+def run_job(job: Callable[[argparse.Namespace], Awaitable[None]], parser: argparse.ArgumentParser) -> None:
+    """配置日志、解析命令行参数并运行任务，结束时释放主库连接池"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    args = parser.parse_args()
+
+    async def main() -> None:
+        try:
+            await job(args)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
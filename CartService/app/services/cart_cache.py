@@ -0,0 +1,223 @@
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    # 版本号早于已失效版本或已缓存版本而被拒绝的写入
+    stale_sets: int = 0
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        data = asdict(self)
+        data["hit_ratio"] = round(self.hits / lookups, 4) if lookups else 0.0
+        return data
+
+
+@dataclass
+class CachedCart:
+    version: int
+    payload: bytes
+
+
+class CartCache:
+    """购物车读缓存，按 cart_id 存放序列化后的 CartResponse JSON 及其版本号。
+
+    写操作提交后以 {cart_id: 新版本号} 失效，缓存记住该版本作为下限：从滞后的副本或旧快照读到的
+    更早版本不会再写入缓存，已缓存的条目也不会被更早的版本覆盖，ETag 不会倒退
+    """
+
+    backend = "none"
+
+    def __init__(self) -> None:
+        self.stats = CacheStats()
+
+    async def get(self, cart_id: uuid.UUID) -> CachedCart | None:
+        return None
+
+    async def set(self, cart_id: uuid.UUID, entry: CachedCart) -> None:
+        return None
+
+    async def invalidate(self, versions: dict[uuid.UUID, int]) -> None:
+        return None
+
+    def snapshot(self) -> dict:
+        return {"backend": self.backend, **self.stats.as_dict()}
+
+
+class MemoryCartCache(CartCache):
+    """进程内 LRU + TTL 缓存，失效时记下的版本下限与条目使用相同的 TTL 和容量上限"""
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[uuid.UUID, tuple[float, CachedCart]] = OrderedDict()
+        # cart_id -> (过期时间, 最近一次失效的版本号)
+        self._fences: OrderedDict[uuid.UUID, tuple[float, int]] = OrderedDict()
+
+    async def get(self, cart_id: uuid.UUID) -> CachedCart | None:
+        entry = self._entries.get(cart_id)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        expires_at, cached = entry
+        if expires_at <= time.monotonic():
+            del self._entries[cart_id]
+            self.stats.evictions += 1
+            self.stats.misses += 1
+            return None
+
+        self._entries.move_to_end(cart_id)
+        self.stats.hits += 1
+        return cached
+
+    def _min_version(self, cart_id: uuid.UUID, now: float) -> int:
+        fence = self._fences.get(cart_id)
+        if fence is not None and fence[0] <= now:
+            del self._fences[cart_id]
+            fence = None
+        current = self._entries.get(cart_id)
+        return max(fence[1] if fence else 0, current[1].version if current else 0)
+
+    async def set(self, cart_id: uuid.UUID, entry: CachedCart) -> None:
+        now = time.monotonic()
+        if entry.version < self._min_version(cart_id, now):
+            self.stats.stale_sets += 1
+            return
+        self._entries[cart_id] = (now + self.ttl_seconds, entry)
+        self._entries.move_to_end(cart_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def invalidate(self, versions: dict[uuid.UUID, int]) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds
+        for cart_id, version in versions.items():
+            if self._entries.pop(cart_id, None) is not None:
+                self.stats.invalidations += 1
+            fence = self._fences.pop(cart_id, None)
+            self._fences[cart_id] = (expires_at, max(version, fence[1]) if fence else version)
+        while len(self._fences) > self.max_entries:
+            self._fences.popitem(last=False)
+
+    def snapshot(self) -> dict:
+        return {**super().snapshot(), "size": len(self._entries), "max_entries": self.max_entries}
+
+
+# KEYS: 缓存键, 版本下限键；ARGV: 版本号, 缓存值 (b"<version>:<payload>"), TTL
+_SET_IF_NEWER = """
+local version = tonumber(ARGV[1])
+if version < tonumber(redis.call('GET', KEYS[2]) or '0') then
+    return 0
+end
+local current = redis.call('GET', KEYS[1])
+if current and version < tonumber(string.match(current, '^%d+')) then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+# KEYS: 缓存键, 版本下限键；ARGV: 失效后的版本号, TTL。返回删除的缓存条目数
+_INVALIDATE = """
+local deleted = redis.call('DEL', KEYS[1])
+if tonumber(ARGV[1]) > tonumber(redis.call('GET', KEYS[2]) or '0') then
+    redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[2])
+end
+return deleted
+"""
+
+
+class RedisCartCache(CartCache):
+    """基于 Redis 协议的共享缓存，过期由服务端 TTL 负责，因此 evictions 不在本地统计。
+
+    失效时把版本号写入 <key>:fence，写入和失效都用 Lua 脚本在服务端比较版本号，
+    多个 worker 并发时不会用更早的版本覆盖。Redis 不可用时按未命中处理，请求回落到数据库。
+    """
+
+    backend = "redis"
+
+    def __init__(self, url: str, ttl_seconds: int, key_prefix: str = "cart:") -> None:
+        super().__init__()
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._error = redis.RedisError
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self._set_script = self._redis.register_script(_SET_IF_NEWER)
+        self._invalidate_script = self._redis.register_script(_INVALIDATE)
+
+    def _key(self, cart_id: uuid.UUID) -> str:
+        return f"{self.key_prefix}{cart_id}"
+
+    def _keys(self, cart_id: uuid.UUID) -> list[str]:
+        key = self._key(cart_id)
+        return [key, f"{key}:fence"]
+
+    async def get(self, cart_id: uuid.UUID) -> CachedCart | None:
+        try:
+            value = await self._redis.get(self._key(cart_id))
+        except self._error:
+            logger.warning("cart cache get failed", exc_info=True)
+            value = None
+
+        if value is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        # 存储格式: b"<version>:<payload>"，一次 GET 同时取回版本号和响应体
+        version, _, payload = value.partition(b":")
+        return CachedCart(int(version), payload)
+
+    async def set(self, cart_id: uuid.UUID, entry: CachedCart) -> None:
+        value = b"%d:%s" % (entry.version, entry.payload)
+        try:
+            stored = await self._set_script(keys=self._keys(cart_id), args=[entry.version, value, self.ttl_seconds])
+        except self._error:
+            logger.warning("cart cache set failed", exc_info=True)
+            return
+        if not stored:
+            self.stats.stale_sets += 1
+
+    async def invalidate(self, versions: dict[uuid.UUID, int]) -> None:
+        if not versions:
+            return
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for cart_id, version in versions.items():
+                    await self._invalidate_script(
+                        keys=self._keys(cart_id), args=[version, self.ttl_seconds], client=pipe
+                    )
+                deleted = await pipe.execute()
+        except self._error:
+            logger.warning("cart cache invalidate failed", exc_info=True)
+            return
+        self.stats.invalidations += sum(deleted)
+
+
+def build_cart_cache(backend: str) -> CartCache:
+    if backend == "memory":
+        return MemoryCartCache(settings.CART_CACHE_MAX_ENTRIES, settings.CART_CACHE_TTL_SECONDS)
+    if backend == "redis":
+        return RedisCartCache(settings.REDIS_URL, settings.CART_CACHE_TTL_SECONDS)
+    if backend == "none":
+        return CartCache()
+    raise ValueError(f"Unknown cart cache backend: {backend}")
+
+
+cart_cache = build_cart_cache(settings.CART_CACHE_BACKEND)
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from app.core.config import settings
+from app.core.serialization import json_dumps
+from app.db.session import AsyncSessionLocal, SNAPSHOT_XMIN
+from app.models.cart import CartEvent, CartEventOffset
+
+logger = logging.getLogger(__name__)
+
+
+class EventSink:
+    """outbox 事件的投递目标。publish 抛出异常时本批不推进偏移量，下一轮重试 (至少一次投递)"""
+
+    backend = "none"
+
+    async def publish(self, events: list[dict]) -> None:
+        return None
+
+    async def close(self) -> None:
+        return None
+
+
+class MemoryQueueSink(EventSink):
+    """进程内队列，队列满时阻塞中继形成背压"""
+
+    backend = "memory"
+
+    def __init__(self, maxsize: int = 10000) -> None:
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize)
+
+    async def publish(self, events: list[dict]) -> None:
+        for event in events:
+            await self.queue.put(event)
+
+
+class FileSink(EventSink):
+    """追加写入 NDJSON 文件，一行一个事件"""
+
+    backend = "file"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def _append(self, data: bytes) -> None:
+        with open(self.path, "ab") as output:
+            output.write(data)
+
+    async def publish(self, events: list[dict]) -> None:
+        await asyncio.to_thread(self._append, b"".join(json_dumps(event) + b"\n" for event in events))
+
+
+class RedisStreamSink(EventSink):
+    """通过 XADD 写入 Redis Stream，下游以消费者组增量读取"""
+
+    backend = "redis"
+
+    def __init__(self, url: str, stream: str, maxlen: int) -> None:
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self.stream = stream
+        self.maxlen = maxlen
+
+    async def publish(self, events: list[dict]) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for event in events:
+                pipe.xadd(self.stream, {"event": json_dumps(event)}, maxlen=self.maxlen, approximate=True)
+            await pipe.execute()
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def build_event_sink(backend: str) -> EventSink:
+    if backend == "memory":
+        return MemoryQueueSink()
+    if backend == "file":
+        return FileSink(settings.CART_EVENTS_FILE_PATH)
+    if backend == "redis":
+        return RedisStreamSink(settings.REDIS_URL, settings.CART_EVENTS_REDIS_STREAM, settings.CART_EVENTS_REDIS_MAXLEN)
+    if backend == "none":
+        return EventSink()
+    raise ValueError(f"Unknown cart event sink: {backend}")
+
+
+event_sink = build_event_sink(settings.CART_EVENTS_SINK)
+
+
+def _event_message(event: CartEvent) -> dict:
+    return {
+        "id": event.id,
+        "cart_id": event.cart_id,
+        "event_type": event.event_type,
+        "version": event.version,
+        "payload": event.payload,
+        "created_at": event.created_at,
+    }
+
+
+async def relay_once(sink: EventSink, consumer: str, batch_size: int) -> int:
+    """投递一批事件并推进消费者偏移量，返回投递的事件数。
+
+    偏移量行以 FOR UPDATE 锁定，同一消费者的多个中继实例串行执行，不会重复投递同一批。
+    """
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            insert(CartEventOffset)
+            .values(consumer=consumer, txid=0, event_id=0, updated_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=[CartEventOffset.consumer])
+        )
+        offset = await db.scalar(
+            select(CartEventOffset).where(CartEventOffset.consumer == consumer).with_for_update()
+        )
+        result = await db.execute(
+            select(CartEvent)
+            .where(
+                tuple_(CartEvent.txid, CartEvent.id) > tuple_(offset.txid, offset.event_id),
+                CartEvent.txid < SNAPSHOT_XMIN,
+            )
+            .order_by(CartEvent.txid, CartEvent.id)
+            .limit(batch_size)
+        )
+        events = result.scalars().all()
+        if not events:
+            await db.rollback()
+            return 0
+
+        await sink.publish([_event_message(event) for event in events])
+        offset.txid = events[-1].txid
+        offset.event_id = events[-1].id
+        offset.updated_at = datetime.utcnow()
+        await db.commit()
+        return len(events)
+
+
+async def run_event_relay(sink: EventSink) -> None:
+    while True:
+        try:
+            relayed = await relay_once(sink, settings.CART_EVENTS_CONSUMER, settings.CART_EVENTS_BATCH_SIZE)
+        except Exception:
+            logger.exception("cart event relay failed")
+            relayed = 0
+        if relayed < settings.CART_EVENTS_BATCH_SIZE:
+            await asyncio.sleep(settings.CART_EVENTS_POLL_INTERVAL_SECONDS)
+
+
+async def prune_events(older_than: timedelta, batch_size: int) -> int:
+    """分批删除超过保留期、且所有消费者都已投递过的事件"""
+    cutoff = datetime.utcnow() - older_than
+    pruned = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            doomed = select(CartEvent.id).where(CartEvent.created_at < cutoff)
+            slowest = (
+                await db.execute(
+                    select(CartEventOffset.txid, CartEventOffset.event_id)
+                    .order_by(CartEventOffset.txid, CartEventOffset.event_id)
+                    .limit(1)
+                )
+            ).one_or_none()
+            if slowest is not None:
+                doomed = doomed.where(tuple_(CartEvent.txid, CartEvent.id) <= tuple_(*slowest))
+            doomed = doomed.order_by(CartEvent.txid, CartEvent.id).limit(batch_size)
+            result = await db.execute(delete(CartEvent).where(CartEvent.id.in_(doomed)).returning(CartEvent.id))
+            deleted = len(result.all())
+            await db.commit()
+
+        pruned += deleted
+        if deleted < batch_size:
+            return pruned
@@ -0,0 +1,169 @@
+"""购物车导出：以 NDJSON 或 CSV 流式输出购物车及明细，供分析任务使用
+
+按状态逐个导出，每个状态内以 (updated_at, id) keyset 分块：每块在独立的短事务中通过服务端游标
+(stream + yield_per) 读取，内存占用与总量无关，也不会在热表上持有长事务。优先读取只读副本。
+
+导出不是一致性快照：导出期间被修改的购物车会按新的 updated_at 排序，可能出现在后续块中。
+
+    python -m app.services.cart_export --format csv --status abandoned --output carts.csv
+"""
+import argparse
+import asyncio
+import csv
+import io
+import sys
+from collections.abc import AsyncIterator
+from datetime import datetime
+from sqlalchemy import select, tuple_
+from app.core.serialization import json_dumps
+from app.db.session import read_session
+from app.models.cart import Cart, CartItem
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_STATUSES = ("active", "abandoned", "merged")
+
+CSV_COLUMNS = (
+    "cart_id", "user_id", "status", "version", "created_at", "updated_at", "item_count", "subtotal",
+    "item_id", "product_id", "quantity", "unit_price", "added_at",
+)
+
+
+def _export_query(status: str, after, updated_from: datetime | None, updated_to: datetime | None, chunk_size: int):
+    carts = Cart.__table__
+    items = CartItem.__table__
+    chunk = select(carts).where(carts.c.status == status)
+    if updated_from is not None:
+        chunk = chunk.where(carts.c.updated_at >= updated_from)
+    if updated_to is not None:
+        chunk = chunk.where(carts.c.updated_at < updated_to)
+    if after is not None:
+        chunk = chunk.where(tuple_(carts.c.updated_at, carts.c.id) > after)
+    chunk = chunk.order_by(carts.c.updated_at, carts.c.id).limit(chunk_size).subquery("chunk")
+
+    return (
+        select(
+            chunk.c.id, chunk.c.user_id, chunk.c.status, chunk.c.version, chunk.c.created_at,
+            chunk.c.updated_at, chunk.c.item_count, chunk.c.subtotal,
+            items.c.id, items.c.product_id, items.c.quantity, items.c.unit_price, items.c.added_at,
+        )
+        .select_from(chunk.outerjoin(items, items.c.cart_id == chunk.c.id))
+        .order_by(chunk.c.updated_at, chunk.c.id)
+    )
+
+
+async def iter_export_rows(
+    statuses: tuple[str, ...] = EXPORT_STATUSES,
+    updated_from: datetime | None = None,
+    updated_to: datetime | None = None,
+    chunk_size: int = 1000,
+    yield_per: int = 2000,
+) -> AsyncIterator[tuple]:
+    """逐行产出 (购物车列..., 明细列...)，同一购物车的行相邻；空购物车的明细列为 None"""
+    for status in statuses:
+        after = None
+        while True:
+            carts_in_chunk = 0
+            last = None
+            async with read_session() as db:
+                result = await db.stream(
+                    _export_query(status, after, updated_from, updated_to, chunk_size),
+                    execution_options={"yield_per": yield_per},
+                )
+                async for row in result:
+                    if last is None or row[0] != last[0]:
+                        carts_in_chunk += 1
+                    last = row
+                    yield row
+                # 每块结束即提交，释放快照和游标
+                await db.commit()
+            if carts_in_chunk < chunk_size:
+                break
+            after = (last.updated_at, last[0])
+
+
+def _csv_value(value):
+    return "" if value is None else value
+
+
+async def export_csv(rows: AsyncIterator[tuple], flush_rows: int = 1000) -> AsyncIterator[bytes]:
+    """一行一个商品，空购物车输出一行且明细列为空"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    pending = 0
+    async for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        pending += 1
+        if pending >= flush_rows:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode()
+
+
+async def export_ndjson(rows: AsyncIterator[tuple], flush_carts: int = 100) -> AsyncIterator[bytes]:
+    """一行一个购物车，明细嵌套在 items 中"""
+    chunks: list[bytes] = []
+    current = None
+    async for row in rows:
+        (cart_id, user_id, status, version, created_at, updated_at, item_count, subtotal,
+         item_id, product_id, quantity, unit_price, added_at) = row
+        if current is None or current["id"] != cart_id:
+            if current is not None:
+                chunks.append(json_dumps(current) + b"\n")
+                if len(chunks) >= flush_carts:
+                    yield b"".join(chunks)
+                    chunks = []
+            current = {
+                "id": cart_id, "user_id": user_id, "status": status, "version": version,
+                "created_at": created_at, "updated_at": updated_at,
+                "item_count": item_count, "subtotal": subtotal, "items": [],
+            }
+        if item_id is not None:
+            current["items"].append({
+                "id": item_id, "product_id": product_id, "quantity": quantity,
+                "unit_price": unit_price, "added_at": added_at,
+            })
+    if current is not None:
+        chunks.append(json_dumps(current) + b"\n")
+    if chunks:
+        yield b"".join(chunks)
+
+
+def export_carts(
+    export_format: str,
+    statuses: tuple[str, ...] = EXPORT_STATUSES,
+    updated_from: datetime | None = None,
+    updated_to: datetime | None = None,
+    chunk_size: int = 1000,
+) -> AsyncIterator[bytes]:
+    rows = iter_export_rows(statuses, updated_from, updated_to, chunk_size)
+    if export_format == "csv":
+        return export_csv(rows)
+    if export_format == "ndjson":
+        return export_ndjson(rows)
+    raise ValueError(f"Unknown export format: {export_format}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        async for chunk in export_carts(
+            args.format, tuple(args.status or EXPORT_STATUSES), args.updated_from, args.updated_to, args.chunk_size
+        ):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export carts and items as NDJSON or CSV")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--status", choices=EXPORT_STATUSES, action="append")
+    parser.add_argument("--updated-from", type=datetime.fromisoformat)
+    parser.add_argument("--updated-to", type=datetime.fromisoformat)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--output", help="输出文件，默认写到标准输出")
+    asyncio.run(main(parser.parse_args()))
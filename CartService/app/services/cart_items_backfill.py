@@ -0,0 +1,81 @@
+"""cart_items 分区迁移的在线回填
+
+在迁移 f3c8a1d6e2b9 (创建分区影子表和同步触发器) 之后、a7d4e2f9c1b3 (切换) 之前运行。
+按主键顺序分批把 cart_items 中的存量行复制到 cart_items_partitioned，每批一个短事务，
+进度记录在 cart_items_backfill 中，中断后重新运行会从上次的位置继续。
+
+每批以 FOR SHARE 锁住被复制的源行：复制期间这些行上的并发修改 / 删除会等待本批提交，
+随后由触发器同步到影子表，不会用旧值覆盖新值，也不会复制已删除的行。
+
+    python -m app.services.cart_items_backfill --batch-size 5000 --pause 0.05
+"""
+import logging
+from sqlalchemy import text
+from app.db.session import AsyncSessionLocal
+from app.services.batch_jobs import job_parser, run_batches, run_job
+
+logger = logging.getLogger(__name__)
+
+ITEM_COLUMNS = "id, cart_id, product_id, quantity, unit_price, added_at, updated_version"
+
+_COPY_BATCH = text(
+    f"""
+    WITH batch AS (
+        SELECT {ITEM_COLUMNS} FROM cart_items
+        WHERE CAST(:last_id AS uuid) IS NULL OR id > CAST(:last_id AS uuid)
+        ORDER BY id
+        LIMIT :batch_size
+        FOR SHARE
+    ), copied AS (
+        INSERT INTO cart_items_partitioned ({ITEM_COLUMNS})
+        SELECT {ITEM_COLUMNS} FROM batch
+        ON CONFLICT DO NOTHING
+    )
+    SELECT count(*) AS rows, (SELECT id FROM batch ORDER BY id DESC LIMIT 1) AS last_id FROM batch
+    """
+)
+
+
+async def copy_batch(batch_size: int) -> int:
+    """复制一批并推进进度，返回本批读取的源行数；全部完成时记录 completed_at"""
+    async with AsyncSessionLocal() as db:
+        progress = (
+            await db.execute(text("SELECT last_id, completed_at FROM cart_items_backfill WHERE id = 1 FOR UPDATE"))
+        ).one()
+        if progress.completed_at is not None:
+            return 0
+        result = (await db.execute(_COPY_BATCH, {"last_id": progress.last_id, "batch_size": batch_size})).one()
+        await db.execute(
+            text(
+                """
+                UPDATE cart_items_backfill
+                SET last_id = coalesce(:last_id, last_id), copied = copied + :rows,
+                    completed_at = CASE WHEN :rows < :batch_size THEN now() ELSE NULL END
+                WHERE id = 1
+                """
+            ),
+            {"last_id": result.last_id, "rows": result.rows, "batch_size": batch_size},
+        )
+        await db.commit()
+        return result.rows
+
+
+async def backfill(batch_size: int, pause: float) -> None:
+    total = 0
+
+    async def next_batch() -> bool:
+        nonlocal total
+        rows = await copy_batch(batch_size)
+        total += rows
+        if rows < batch_size:
+            return False
+        logger.info("cart_items backfill copied %d rows", total)
+        return True
+
+    await run_batches(next_batch, pause)
+    logger.info("cart_items backfill completed, copied %d rows", total)
+
+
+if __name__ == "__main__":
+    parser = job_parser("Backfill cart_items into the hash-partitioned table", batch_size=5000)
+    run_job(lambda args: backfill(args.batch_size, args.pause), parser)
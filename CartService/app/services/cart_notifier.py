@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from prometheus_client import Gauge
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CART_STREAM_SUBSCRIPTIONS = Gauge("cart_stream_subscriptions", "本进程打开的购物车变更事件流数")
+
+
+class CartSubscription:
+    """一个事件流连接的信箱，只保留最新的版本号：消费慢的连接不会积压通知，空闲时只是一个 Event"""
+
+    def __init__(self) -> None:
+        self._version: int | None = None
+        self._changed = asyncio.Event()
+
+    def offer(self, version: int) -> None:
+        if self._version is None or version > self._version:
+            self._version = version
+            self._changed.set()
+
+    async def wait(self, timeout: float) -> int | None:
+        """等待下一次变更，返回最新的版本号；超时返回 None"""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._changed.clear()
+        version, self._version = self._version, None
+        return version
+
+
+class CartNotifier:
+    """购物车变更通知的发布 / 订阅。写操作提交后发布 {cart_id: 版本号}，本进程内的订阅者按购物车分发。
+
+    memory 只在同一 worker 内可见，用于测试和单进程部署
+    """
+
+    backend = "memory"
+
+    def __init__(self) -> None:
+        self._subscribers: dict[uuid.UUID, set[CartSubscription]] = {}
+
+    async def publish(self, versions: dict[uuid.UUID, int]) -> None:
+        for cart_id, version in versions.items():
+            self._dispatch(cart_id, version)
+
+    def _dispatch(self, cart_id: uuid.UUID, version: int) -> None:
+        for subscription in self._subscribers.get(cart_id, ()):
+            subscription.offer(version)
+
+    @asynccontextmanager
+    async def subscribe(self, cart_id: uuid.UUID):
+        subscription = CartSubscription()
+        self._subscribers.setdefault(cart_id, set()).add(subscription)
+        CART_STREAM_SUBSCRIPTIONS.inc()
+        try:
+            await self._sync(cart_id)
+            yield subscription
+        finally:
+            CART_STREAM_SUBSCRIPTIONS.dec()
+            subscribers = self._subscribers.get(cart_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[cart_id]
+            await self._sync(cart_id)
+
+    async def _sync(self, cart_id: uuid.UUID) -> None:
+        """购物车的本地订阅者从无到有或从有到无时调用，由跨进程的实现订阅 / 退订"""
+        return None
+
+    async def close(self) -> None:
+        return None
+
+
+class RedisCartNotifier(CartNotifier):
+    """通过 Redis PUBLISH 在 worker / 实例之间广播。
+
+    每个进程只用一条 pub/sub 连接，只订阅本进程有连接在监听的购物车频道，
+    没有订阅者的购物车不会收到消息；发布失败只记录日志，不影响已提交的写操作
+    """
+
+    backend = "redis"
+
+    def __init__(self, url: str, channel_prefix: str) -> None:
+        import redis.asyncio as redis
+
+        super().__init__()
+        self._redis = redis.from_url(url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self.channel_prefix = channel_prefix
+        self._channels: set[uuid.UUID] = set()
+        self._lock = asyncio.Lock()
+        self._listener: asyncio.Task | None = None
+
+    def _channel(self, cart_id: uuid.UUID) -> str:
+        return f"{self.channel_prefix}{cart_id}"
+
+    async def publish(self, versions: dict[uuid.UUID, int]) -> None:
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for cart_id, version in versions.items():
+                    pipe.publish(self._channel(cart_id), str(version))
+                await pipe.execute()
+        except Exception:
+            logger.exception("cart change notification failed")
+
+    async def _sync(self, cart_id: uuid.UUID) -> None:
+        # 并发的订阅和退订在锁内按当前的本地订阅者决定最终状态
+        async with self._lock:
+            wanted = cart_id in self._subscribers
+            if wanted and cart_id not in self._channels:
+                await self._pubsub.subscribe(self._channel(cart_id))
+                self._channels.add(cart_id)
+            elif not wanted and cart_id in self._channels:
+                await self._pubsub.unsubscribe(self._channel(cart_id))
+                self._channels.discard(cart_id)
+            if self._channels and (self._listener is None or self._listener.done()):
+                self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        # 没有订阅的频道时退出，下一次订阅时重新启动
+        while self._channels:
+            try:
+                message = await self._pubsub.get_message(timeout=None)
+            except Exception:
+                logger.exception("cart change subscription failed")
+                await asyncio.sleep(1)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            channel = message["channel"].decode()
+            self._dispatch(uuid.UUID(channel[len(self.channel_prefix):]), int(message["data"]))
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+        await self._pubsub.aclose()
+        await self._redis.aclose()
+
+
+def build_cart_notifier(backend: str) -> CartNotifier:
+    if backend == "memory":
+        return CartNotifier()
+    if backend == "redis":
+        return RedisCartNotifier(settings.REDIS_URL, settings.CART_STREAM_REDIS_CHANNEL_PREFIX)
+    raise ValueError(f"Unknown cart notifier backend: {backend}")
+
+
+cart_notifier = build_cart_notifier(settings.CART_STREAM_BACKEND)
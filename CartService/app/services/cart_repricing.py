@@ -0,0 +1,107 @@
+"""价格目录变更后批量重新定价 active 购物车
+
+从价格目录 (PRICE_CATALOG_SOURCE 指定的文件或 product_prices 表) 加载快照，按 --chunk-size 个价格
+一段，借助 ix_cart_items_product_id 找出单价与目录不一致的明细，每批 --batch-size 个购物车一个短事务：
+按购物车主键顺序 FOR UPDATE 加锁 (与应用写路径相同的先购物车后明细)，更新明细单价并把明细标记为
+新版本，再递增购物车版本号、重算合计并写入 cart.repriced 事件，客户端的 ETag 和增量同步随之更新。
+
+任务只更新不一致的明细，可重复运行；中断后直接重跑即可。匿名层中的购物车不在数据库中，
+在下一次加购时使用目录价格。
+
+    python -m app.services.cart_repricing --batch-size 200 --pause 0.05
+    python -m app.services.cart_repricing --products SKU-1 SKU-2
+"""
+import argparse
+import logging
+from sqlalchemy import select, update, values, column, and_, String, Numeric
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.cart import Cart, CartItem
+from app.services.batch_jobs import job_parser, run_batches, run_job
+from app.services.cart_service import CartService
+from app.services.price_catalog import PriceCatalog, build_price_catalog
+
+logger = logging.getLogger(__name__)
+
+
+async def reprice_batch(chunk: list[tuple], batch_size: int, catalog_version: int) -> tuple[int, int]:
+    """重新定价一批购物车，返回 (购物车数, 明细数)"""
+    prices = values(
+        column("product_id", String), column("currency", String), column("unit_price", Numeric(10, 2)),
+        name="prices",
+    ).data(chunk)
+    matches = and_(
+        Cart.id == CartItem.cart_id,
+        Cart.status == "active",
+        prices.c.product_id == CartItem.product_id,
+        prices.c.currency == Cart.currency,
+        CartItem.unit_price != prices.c.unit_price,
+    )
+    stale = select(CartItem.cart_id).where(matches).distinct().limit(batch_size).correlate(None)
+    async with AsyncSessionLocal() as db:
+        locked = await db.scalars(
+            select(Cart.id).where(Cart.id.in_(stale)).order_by(Cart.id).with_for_update()
+        )
+        cart_ids = locked.all()
+        if not cart_ids:
+            return 0, 0
+        # 加锁之后重新按条件更新，期间被用户修改或合并的明细以最新状态为准
+        result = await db.execute(
+            update(CartItem)
+            .where(CartItem.cart_id.in_(cart_ids), matches)
+            .values(unit_price=prices.c.unit_price, updated_version=Cart.version + 1)
+            .returning(CartItem.cart_id)
+        )
+        repriced = result.scalars().all()
+        versions = {}
+        if repriced:
+            touch = update(Cart).where(Cart.id.in_(set(repriced))).values(**CartService._touch_values(Cart.id))
+            result = await db.execute(
+                CartService._with_event(touch, "cart.repriced", {"catalog_version": catalog_version})
+            )
+            versions = {cart_id: version for version, cart_id in result}
+        await db.commit()
+
+    # 失效缓存并通知事件流的订阅者 (CART_STREAM_BACKEND=redis 时跨进程可见)
+    await CartService._after_commit(versions)
+    return len(versions), len(repriced)
+
+
+async def reprice(catalog: PriceCatalog, products: set[str] | None, chunk_size: int, batch_size: int, pause: float) -> None:
+    entries = catalog.entries()
+    if products:
+        entries = [entry for entry in entries if entry[0] in products]
+    carts = items = 0
+    for start in range(0, len(entries), chunk_size):
+        chunk = entries[start:start + chunk_size]
+
+        async def next_batch() -> bool:
+            nonlocal carts, items
+            batch_carts, batch_items = await reprice_batch(chunk, batch_size, catalog.version)
+            carts += batch_carts
+            items += batch_items
+            if batch_carts < batch_size:
+                return False
+            logger.info("repriced %d carts, %d items", carts, items)
+            return True
+
+        await run_batches(next_batch, pause)
+    logger.info("repricing completed at catalog version %d, repriced %d carts, %d items", catalog.version, carts, items)
+
+
+async def main(args: argparse.Namespace) -> None:
+    catalog = build_price_catalog(args.source)
+    if not catalog.enabled:
+        raise SystemExit("PRICE_CATALOG_SOURCE is none, nothing to reprice against")
+    await catalog.load()
+    await reprice(catalog, set(args.products or ()), args.chunk_size, args.batch_size, args.pause)
+
+
+if __name__ == "__main__":
+    parser = job_parser(
+        "Reprice active cart items against the product price catalog", batch_size=200, batch_help="每个事务处理的购物车数"
+    )
+    parser.add_argument("--source", default=settings.PRICE_CATALOG_SOURCE, help="file | table")
+    parser.add_argument("--products", nargs="*", help="只处理这些商品")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="每次查找的目录价格数")
+    run_job(main, parser)
@@ -1,18 +1,328 @@
 import uuid
 from decimal import Decimal
 from datetime import datetime
-from sqlalchemy import select
+from sqlalchemy import (
+    select, update, delete, literal, literal_column, bindparam, case, cast, func, and_, or_, tuple_, values, column,
+    String, Integer, Numeric, Uuid
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, joinedload
 from fastapi import HTTPException, status
-from app.models.cart import Cart, CartItem
-from app.schemas.cart import CartCreate, CartItemCreate, CartItemUpdate
+from app.core.config import settings
+from app.core.ids import uuid7
+from app.core.money import format_minor, from_minor
+from app.models.cart import Cart, CartItem, CartItemTombstone, CartEvent
+from app.schemas.cart import (
+    CartCreate, CartItemCreate, CartItemUpdate, CartItemResponse, CartBatchOperation, CartBatchResult,
+    CartChangesResponse, CartItemRemoval
+)
+from app.db.session import recent_writes
+from app.services.anonymous_carts import AnonymousCart, AnonymousCartItem, anonymous_carts
+from app.services.cart_cache import cart_cache
+from app.services.cart_notifier import cart_notifier
+from app.services.price_catalog import price_catalog
+
+
+def _minor_units() -> bool:
+    """CART_MONEY_MODE=minor_units：金额读取和合计使用 BIGINT 最小货币单位列"""
+    return settings.CART_MONEY_MODE == "minor_units"
 
 
 class CartService:
 
     @staticmethod
-    async def get_cart(db: AsyncSession, cart_id: uuid.UUID) -> Cart:
+    def _cart_matches(cart_id: uuid.UUID, expected_version: int | None):
+        condition = Cart.id == cart_id
+        if expected_version is not None:
+            condition = and_(condition, Cart.version == expected_version)
+        return condition
+
+    @staticmethod
+    def _lock_cart(cart_id: uuid.UUID, expected_version: int | None = None):
+        # 写操作先锁 carts 行再修改 cart_items，保证并发写入的加锁顺序一致；
+        # 携带 If-Match 时版本号不符的购物车不会被选中。
+        # 与 locked 关联的 cart_items 条件需同时写出 CartItem.cart_id == cart_id，否则无法裁剪分区
+        return (
+            select(Cart.id, Cart.version, Cart.currency)
+            .where(CartService._cart_matches(cart_id, expected_version))
+            .with_for_update()
+            .cte("locked_cart")
+        )
+
+    @staticmethod
+    def _tombstone(removed, cart_id: uuid.UUID, removed_version):
+        """把 DELETE ... RETURNING 删除的明细写入墓碑表，供增量同步下发删除"""
+        return insert(CartItemTombstone).from_select(
+            ["cart_id", "item_id", "product_id", "removed_version", "removed_at"],
+            select(
+                literal(cart_id),
+                removed.c.id,
+                removed.c.product_id,
+                removed_version,
+                literal(datetime.utcnow()),
+            ),
+        ).add_cte(removed)
+
+    @staticmethod
+    def _with_event(touch, event_type: str, payload: dict | None = None):
+        """把 UPDATE carts 与 outbox 事件写入合并为一条语句，返回更新后的版本号。
+
+        事件携带更新后的 status / item_count / subtotal，payload 为 JSON 可序列化的附加字段。
+        """
+        touched = touch.returning(
+            Cart.id, Cart.user_id, Cart.status, Cart.version, Cart.item_count, Cart.subtotal
+        ).cte("touched")
+        event_payload = func.jsonb_build_object(
+            "user_id", touched.c.user_id,
+            "status", touched.c.status,
+            "item_count", touched.c.item_count,
+            "subtotal", cast(touched.c.subtotal, String),
+        )
+        if payload:
+            event_payload = event_payload.op("||")(literal(payload, JSONB))
+        return (
+            insert(CartEvent)
+            .from_select(
+                ["cart_id", "event_type", "version", "payload", "created_at"],
+                select(
+                    touched.c.id, literal(event_type), touched.c.version, event_payload, literal(datetime.utcnow())
+                ),
+            )
+            .add_cte(touched)
+            .returning(CartEvent.version, CartEvent.cart_id)
+        )
+
+    @staticmethod
+    async def _after_commit(versions: dict[uuid.UUID, int]) -> None:
+        # 写操作提交后：失效读缓存，让本进程随后的读请求走主库，并通知订阅了变更事件流的客户端
+        recent_writes.mark(*versions)
+        await cart_cache.invalidate(versions)
+        await cart_notifier.publish(versions)
+
+    @staticmethod
+    async def _update_anonymous(cart_id: uuid.UUID, mutate, expected_version: int | None = None):
+        """在匿名购物车层执行写操作，返回 mutate 的结果；购物车不在该层时返回 None，由调用方写数据库"""
+        versions = []
+
+        def tracked(cart: AnonymousCart):
+            result = mutate(cart)
+            versions.append(cart.version)
+            return result
+
+        result = await anonymous_carts.update(cart_id, tracked, expected_version)
+        if result is not None:
+            await cart_cache.invalidate({cart_id: versions[-1]})
+            await cart_notifier.publish({cart_id: versions[-1]})
+        return result
+
+    @staticmethod
+    async def _promote_anonymous(
+        db: AsyncSession, cart_id: uuid.UUID, user_id: uuid.UUID | None = None, expected_version: int | None = None
+    ) -> bool:
+        """把匿名购物车写入数据库并记录 cart.promoted 事件；购物车不在匿名层时返回 False。
+
+        版本号和明细 ID 保持不变，客户端持有的 ETag 和明细 ID 继续有效
+        """
+        cart = await anonymous_carts.take(cart_id, expected_version)
+        if cart is None:
+            return False
+        try:
+            await db.execute(insert(Cart).values(
+                id=cart.id,
+                user_id=user_id,
+                status=cart.status,
+                version=cart.version,
+                currency=cart.currency,
+                item_count=cart.item_count,
+                subtotal=cart.subtotal,
+                subtotal_minor=cart.subtotal_minor,
+                # 匿名期间的删除没有墓碑，更早版本的增量同步需退回全量
+                changes_horizon=cart.version,
+                created_at=cart.created_at,
+                updated_at=cart.updated_at,
+            ))
+            if cart.items:
+                await db.execute(insert(CartItem).values([
+                    {
+                        "id": item.id,
+                        "cart_id": cart.id,
+                        "product_id": item.product_id,
+                        "quantity": item.quantity,
+                        "unit_price": item.unit_price,
+                        "added_at": item.added_at,
+                        "updated_version": item.updated_version,
+                    }
+                    for item in cart.items
+                ]))
+            db.add(CartEvent(
+                cart_id=cart.id,
+                event_type="cart.promoted",
+                version=cart.version,
+                payload={
+                    "user_id": str(user_id) if user_id else None,
+                    "status": cart.status,
+                    "currency": cart.currency,
+                    "item_count": cart.item_count,
+                    "subtotal": str(cart.subtotal),
+                },
+            ))
+            await db.commit()
+        except IntegrityError:
+            # uq_carts_user_id_active：用户已有 active 购物车
+            await db.rollback()
+            await anonymous_carts.restore(cart)
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User already has an active cart")
+        except BaseException:
+            await db.rollback()
+            await anonymous_carts.restore(cart)
+            raise
+        await anonymous_carts.finish(cart_id)
+        if user_id is not None:
+            recent_writes.mark(user_id)
+        await CartService._after_commit({cart_id: cart.version})
+        return True
+
+    @staticmethod
+    async def _raise_not_found(
+        db: AsyncSession, cart_id: uuid.UUID, expected_version: int | None, detail: str = "Cart not found"
+    ) -> None:
+        """写操作未命中时回滚，并区分版本冲突 (412) 与不存在 (404)"""
+        await db.rollback()
+        if expected_version is not None:
+            current = await db.scalar(select(Cart.version).where(Cart.id == cart_id))
+            if current is not None and current != expected_version:
+                raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Cart has been modified")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
+
+    @staticmethod
+    async def _raise_merge_conflict(
+        db: AsyncSession, target_cart_id: uuid.UUID, source_cart_id: uuid.UUID, expected_version: int | None
+    ) -> None:
+        """合并未锁定到两个购物车时回滚，区分不存在 (404)、版本冲突 (412) 与已不是 active (409)"""
+        await db.rollback()
+        result = await db.execute(select(Cart.id, Cart.status).where(Cart.id.in_([target_cart_id, source_cart_id])))
+        statuses = dict(result.all())
+        if target_cart_id not in statuses:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart not found")
+        if source_cart_id not in statuses:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Source cart not found")
+        for cart_id, label in ((target_cart_id, "Cart"), (source_cart_id, "Source cart")):
+            if statuses[cart_id] != "active":
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"{label} is {statuses[cart_id]}")
+        await CartService._raise_not_found(db, target_cart_id, expected_version)
+
+    @staticmethod
+    def _catalog_unit_price(item_data: CartItemCreate, currency):
+        """加购单价的 SQL 表达式。启用价格目录时按被锁定购物车的币种 (currency 列) 选取目录单价，
+        不需要为读取币种多一次往返；商品不在目录中时直接返回 422
+        """
+        if not price_catalog.enabled:
+            return literal(price_catalog.resolve(item_data.product_id, None, item_data.unit_price))
+        prices = price_catalog.prices(item_data.product_id)
+        if not prices:
+            price_catalog.resolve(item_data.product_id, None, None)
+        return case({code: literal(unit_price) for code, unit_price in prices.items()}, value=currency)
+
+    @staticmethod
+    def _priced_operations(operations: list[CartBatchOperation], currency: str) -> list[CartBatchOperation]:
+        """按价格目录 (未启用时为客户端单价) 确定 add 操作的单价"""
+        return [
+            operation.model_copy(update={
+                "unit_price": price_catalog.resolve(operation.product_id, currency, operation.unit_price),
+            }) if operation.op == "add" else operation
+            for operation in operations
+        ]
+
+    @staticmethod
+    def _price_column(table):
+        """合计使用的单价列：minor_units 模式为整数列，另一种表示由触发器换算"""
+        return table.c.unit_price_minor if _minor_units() else table.c.unit_price
+
+    @staticmethod
+    def _previous_line(locked, cart_id: uuid.UUID, item_matches):
+        """附加在单明细写语句 RETURNING 中的修改前数量、单价和 fresh 标记，供 _line_delta 计算合计的差值。
+
+        子查询读取语句开始时的快照。所有写操作都先锁购物车并递增版本号，快照中的版本号等于加锁后的版本号时，
+        期间没有其他事务提交过修改，快照里的明细就是修改前的值
+        """
+        previous = CartItem.__table__.alias("previous")
+        snapshot = Cart.__table__.alias("snapshot")
+
+        def before(column):
+            return select(column).where(previous.c.cart_id == cart_id, item_matches(previous)).scalar_subquery()
+
+        return (
+            before(previous.c.quantity).label("previous_quantity"),
+            before(CartService._price_column(previous)).label("previous_price"),
+            (
+                select(locked.c.version).scalar_subquery()
+                == select(snapshot.c.version).where(snapshot.c.id == cart_id).scalar_subquery()
+            ).label("fresh"),
+        )
+
+    @staticmethod
+    def _item_price(item: CartItem) -> Decimal | int:
+        return item.unit_price_minor if _minor_units() else item.unit_price
+
+    @staticmethod
+    def _line_delta(rows) -> tuple[int, Decimal | int] | None:
+        """按每个明细的 (修改前数量, 修改前单价, 修改后数量, 修改后单价) 计算 item_count / subtotal 的差值"""
+        quantity = amount = 0
+        for previous_quantity, previous_price, new_quantity, new_price in rows:
+            previous_quantity = previous_quantity or 0
+            quantity += new_quantity - previous_quantity
+            amount += new_quantity * new_price - previous_quantity * (previous_price or 0)
+        return quantity, amount
+
+    @staticmethod
+    def _touch_values(cart_id, delta: tuple[int, Decimal | int] | None = None) -> dict:
+        """递增版本号并维护 item_count / subtotal 的 SET 子句。
+
+        单明细写操作传入 delta (件数差, 金额差) 在原值上加减；批量操作不传，按明细重新求和，
+        cart_id 为 Cart.id 时按行关联，可一次更新多个购物车
+        """
+        values = {"version": Cart.version + 1, "updated_at": datetime.utcnow()}
+        subtotal = "subtotal_minor" if _minor_units() else "subtotal"
+        if delta is not None:
+            values["item_count"] = Cart.item_count + delta[0]
+            values[subtotal] = getattr(Cart, subtotal) + delta[1]
+            return values
+
+        def items_sum(expression):
+            return select(func.coalesce(func.sum(expression), 0)).where(CartItem.cart_id == cart_id).scalar_subquery()
+
+        values["item_count"] = items_sum(CartItem.quantity)
+        values[subtotal] = items_sum(CartItem.quantity * CartService._price_column(CartItem.__table__))
+        return values
+
+    @staticmethod
+    async def _touch_cart(
+        db: AsyncSession, cart_id: uuid.UUID, event_type: str, payload: dict | None = None,
+        delta: tuple[int, Decimal | int] | None = None
+    ) -> int:
+        """在同一事务内递增版本号、更新 item_count / subtotal 和 updated_at 并写入 outbox 事件"""
+        touch = update(Cart).where(Cart.id == cart_id).values(**CartService._touch_values(cart_id, delta))
+        return await db.scalar(CartService._with_event(touch, event_type, payload))
+
+    @staticmethod
+    async def _reload_cart(db: AsyncSession, cart_id: uuid.UUID) -> Cart:
+        # 单条 JOIN 查询取回最新的购物车及明细
+        result = await db.execute(
+            select(Cart)
+            .where(Cart.id == cart_id)
+            .options(joinedload(Cart.items))
+            .execution_options(populate_existing=True)
+        )
+        return result.unique().scalar_one()
+
+    @staticmethod
+    async def get_cart(db: AsyncSession, cart_id: uuid.UUID) -> Cart | AnonymousCart:
+        anonymous = await anonymous_carts.get(cart_id)
+        if anonymous is not None:
+            return anonymous
         result = await db.execute(
             select(Cart).where(Cart.id == cart_id).options(selectinload(Cart.items))
         )
@@ -22,103 +332,749 @@ class CartService:
         return cart
 
     @staticmethod
-    async def create_cart(db: AsyncSession, cart_data: CartCreate) -> Cart:
-        cart = Cart(user_id=cart_data.user_id)
+    def _document_columns():
+        carts = Cart.__table__
+        items = CartItem.__table__
+        # minor_units 模式读取 BIGINT 列，省去 asyncpg 的 numeric 解码和 Decimal 构造
+        if _minor_units():
+            subtotal, unit_price = carts.c.subtotal_minor.label("subtotal"), items.c.unit_price_minor.label("unit_price")
+        else:
+            subtotal, unit_price = carts.c.subtotal, items.c.unit_price
+        cart_columns = (
+            carts.c.id, carts.c.user_id, carts.c.status, carts.c.version, carts.c.currency,
+            carts.c.created_at, carts.c.updated_at, carts.c.item_count, subtotal,
+        )
+        item_columns = (
+            items.c.cart_id, items.c.id, items.c.product_id, items.c.quantity, unit_price, items.c.added_at
+        )
+        return cart_columns, item_columns
+
+    @staticmethod
+    def _cart_document(cart, item_rows) -> dict:
+        # minor_units 模式下金额为整数，直接格式化为与 Decimal 相同的字符串
+        minor_units = _minor_units()
+        return {
+            "id": cart.id,
+            "user_id": cart.user_id,
+            "status": cart.status,
+            "version": cart.version,
+            "currency": cart.currency,
+            "created_at": cart.created_at,
+            "updated_at": cart.updated_at,
+            "items": [
+                {
+                    "id": item_id,
+                    "cart_id": cart_id,
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "unit_price": format_minor(unit_price, cart.currency) if minor_units else unit_price,
+                    "added_at": added_at,
+                }
+                for cart_id, item_id, product_id, quantity, unit_price, added_at in item_rows
+            ],
+            # subtotal 与明细在同一事务内维护，等于 calculate_total 的结果
+            "total_price": format_minor(cart.subtotal, cart.currency) if minor_units else cart.subtotal,
+        }
+
+    @staticmethod
+    async def _load_cart_document(db: AsyncSession, condition, detail: str) -> dict:
+        cart_columns, item_columns = CartService._document_columns()
+        result = await db.execute(select(*cart_columns).where(condition))
+        cart = result.one_or_none()
+        if cart is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
+
+        item_rows = []
+        if cart.item_count:
+            # 空购物车不再查询明细
+            result = await db.execute(select(*item_columns).where(CartItem.__table__.c.cart_id == cart.id))
+            item_rows = result.all()
+        return CartService._cart_document(cart, item_rows)
+
+    @staticmethod
+    async def get_cart_document(db: AsyncSession, cart_id: uuid.UUID) -> dict:
+        """读路径：直接查询 Core 行并组装与 CartResponse 字段一致的 dict，不构建 ORM 对象"""
+        anonymous = await anonymous_carts.get(cart_id)
+        if anonymous is not None:
+            return anonymous.document()
+        return await CartService._load_cart_document(db, Cart.__table__.c.id == cart_id, "Cart not found")
+
+    @staticmethod
+    async def get_active_cart_document(db: AsyncSession, user_id: uuid.UUID) -> dict:
+        """通过 uq_carts_user_id_active 部分索引一次探测找到用户的 active 购物车"""
+        carts = Cart.__table__
+        return await CartService._load_cart_document(
+            db, and_(carts.c.user_id == user_id, carts.c.status == "active"), "Active cart not found"
+        )
+
+    @staticmethod
+    async def get_cart_documents(db: AsyncSession, cart_ids: list[uuid.UUID]) -> list[dict]:
+        """批量读取：购物车和明细各一条 IN 查询，按 cart_ids 的顺序返回存在的购物车"""
+        documents = {cart_id: cart.document() for cart_id, cart in (await anonymous_carts.get_many(cart_ids)).items()}
+        cart_columns, item_columns = CartService._document_columns()
+        stored_ids = [cart_id for cart_id in cart_ids if cart_id not in documents]
+        result = await db.execute(select(*cart_columns).where(Cart.__table__.c.id.in_(stored_ids)))
+        carts = {cart.id: cart for cart in result.all()}
+
+        items_by_cart: dict[uuid.UUID, list] = {cart_id: [] for cart_id in carts}
+        non_empty = [cart_id for cart_id, cart in carts.items() if cart.item_count]
+        if non_empty:
+            result = await db.execute(select(*item_columns).where(CartItem.__table__.c.cart_id.in_(non_empty)))
+            for row in result.all():
+                items_by_cart[row.cart_id].append(row)
+
+        for cart_id, cart in carts.items():
+            documents[cart_id] = CartService._cart_document(cart, items_by_cart[cart_id])
+        return [documents[cart_id] for cart_id in cart_ids if cart_id in documents]
+
+    @staticmethod
+    async def list_user_carts(
+        db: AsyncSession,
+        user_id: uuid.UUID,
+        limit: int,
+        cart_status: str | None = None,
+        after: tuple[datetime, uuid.UUID] | None = None,
+    ) -> tuple[list[Cart], tuple[datetime, uuid.UUID] | None]:
+        """按 (updated_at, id) 倒序 keyset 分页，沿 ix_carts_user_id_updated_at 扫描，不使用 OFFSET。
+
+        返回本页购物车和下一页的游标位置，没有下一页时为 None。
+        """
+        query = select(Cart).where(Cart.user_id == user_id)
+        if cart_status is not None:
+            query = query.where(Cart.status == cart_status)
+        if after is not None:
+            query = query.where(tuple_(Cart.updated_at, Cart.id) < after)
+        # 多取一行判断是否还有下一页
+        result = await db.execute(query.order_by(Cart.updated_at.desc(), Cart.id.desc()).limit(limit + 1))
+        carts = result.scalars().all()
+        if len(carts) <= limit:
+            return carts, None
+        carts = carts[:limit]
+        return carts, (carts[-1].updated_at, carts[-1].id)
+
+    @staticmethod
+    async def get_cart_summary(db: AsyncSession, cart_id: uuid.UUID) -> Cart | AnonymousCart:
+        anonymous = await anonymous_carts.get(cart_id)
+        if anonymous is not None:
+            return anonymous
+        result = await db.execute(select(Cart).where(Cart.id == cart_id))
+        cart = result.scalar_one_or_none()
+        if not cart:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart not found")
+        return cart
+
+    @staticmethod
+    async def get_cart_version(db: AsyncSession, cart_id: uuid.UUID) -> int:
+        anonymous = await anonymous_carts.get(cart_id)
+        if anonymous is not None:
+            return anonymous.version
+        version = await db.scalar(select(Cart.version).where(Cart.id == cart_id))
+        if version is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart not found")
+        return version
+
+    @staticmethod
+    async def get_changes(db: AsyncSession, cart_id: uuid.UUID, since: int) -> CartChangesResponse:
+        cart = await CartService.get_cart_summary(db, cart_id)
+        changes = CartChangesResponse(
+            cart_id=cart.id,
+            status=cart.status,
+            version=cart.version,
+            since=since,
+            item_count=cart.item_count,
+            subtotal=cart.subtotal,
+        )
+        if since >= cart.version:
+            return changes
+        if isinstance(cart, AnonymousCart):
+            # 匿名购物车不记录删除墓碑，总是下发全量明细
+            changes.reset = True
+            changes.upserted = [CartItemResponse.model_validate(item) for item in cart.items]
+            return changes
+
+        # 所需的删除墓碑已被清理，只能下发全量明细
+        changes.reset = since < cart.changes_horizon
+        items = select(CartItem).where(CartItem.cart_id == cart_id)
+        if not changes.reset:
+            items = items.where(CartItem.updated_version > since)
+        result = await db.execute(items)
+        changes.upserted = [CartItemResponse.model_validate(item) for item in result.scalars()]
+
+        if not changes.reset:
+            result = await db.execute(
+                select(CartItemTombstone).where(
+                    CartItemTombstone.cart_id == cart_id, CartItemTombstone.removed_version > since
+                )
+            )
+            changes.removed = [
+                CartItemRemoval(id=tombstone.item_id, product_id=tombstone.product_id, version=tombstone.removed_version)
+                for tombstone in result.scalars()
+            ]
+        return changes
+
+    @staticmethod
+    async def create_cart(db: AsyncSession, cart_data: CartCreate) -> Cart | AnonymousCart:
+        if cart_data.user_id is None and anonymous_carts.enabled:
+            # 匿名购物车只写入 KV 层，合并或绑定用户时才提升到数据库
+            cart = AnonymousCart.new(cart_data.currency)
+            await anonymous_carts.create(cart)
+            return cart
+        cart = Cart(id=uuid7(), user_id=cart_data.user_id, currency=cart_data.currency, items=[])
         db.add(cart)
-        await db.commit()
-        await db.refresh(cart)
+        db.add(CartEvent(
+            cart_id=cart.id,
+            event_type="cart.created",
+            version=1,
+            payload={
+                "user_id": str(cart.user_id) if cart.user_id else None,
+                "status": "active",
+                "currency": cart.currency,
+                "item_count": 0,
+                "subtotal": "0.00",
+            },
+        ))
+        try:
+            await db.commit()
+        except IntegrityError:
+            # uq_carts_user_id_active：用户已有 active 购物车
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User already has an active cart")
+        if cart.user_id is not None:
+            recent_writes.mark(cart.user_id)
         return cart
 
     @staticmethod
-    async def add_item(db: AsyncSession, cart_id: uuid.UUID, item_data: CartItemCreate) -> CartItem:
-        cart = await CartService.get_cart(db, cart_id)
-        
+    async def add_item(
+        db: AsyncSession, cart_id: uuid.UUID, item_data: CartItemCreate, expected_version: int | None = None
+    ) -> tuple[CartItem | AnonymousCartItem, int]:
+        """返回明细和购物车的新版本号"""
+        added = await CartService._update_anonymous(
+            cart_id,
+            lambda cart: (
+                cart.add_item(
+                    item_data.product_id,
+                    item_data.quantity,
+                    price_catalog.resolve(item_data.product_id, cart.currency, item_data.unit_price),
+                ),
+                cart.version,
+            ),
+            expected_version,
+        )
+        if added is not None:
+            return added
+
+        # 校验购物车存在并加锁，与插入/累加数量在同一条语句中完成
+        locked = CartService._lock_cart(cart_id, expected_version)
+        priced = select(
+            literal(uuid7()),
+            locked.c.id,
+            literal(item_data.product_id),
+            literal(item_data.quantity),
+            CartService._catalog_unit_price(item_data, locked.c.currency),
+            literal(datetime.utcnow()),
+            locked.c.version + 1,
+        )
+        if price_catalog.enabled:
+            # 购物车币种没有目录价格时不插入，下面按 422 处理
+            priced = priced.where(locked.c.currency.in_(price_catalog.prices(item_data.product_id)))
+        stmt = insert(CartItem).from_select(
+            ["id", "cart_id", "product_id", "quantity", "unit_price", "added_at", "updated_version"], priced
+        ).add_cte(locked)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CartItem.cart_id, CartItem.product_id],
+            set_={
+                "quantity": CartItem.quantity + stmt.excluded.quantity,
+                "unit_price": stmt.excluded.unit_price,
+                "updated_version": stmt.excluded.updated_version,
+            },
+        ).returning(CartItem, *CartService._previous_line(
+            locked, cart_id, lambda previous: previous.c.product_id == item_data.product_id
+        ))
+
         result = await db.execute(
-            select(CartItem).where(
-                CartItem.cart_id == cart_id,
-                CartItem.product_id == item_data.product_id
-            )
+            select(CartItem, column("previous_quantity"), column("previous_price"), column("fresh"))
+            .from_statement(stmt)
+            .execution_options(populate_existing=True)
         )
-        existing_item = result.scalar_one_or_none()
+        row = result.one_or_none()
+        if not row:
+            if price_catalog.enabled:
+                currency = await db.scalar(
+                    select(Cart.currency).where(CartService._cart_matches(cart_id, expected_version))
+                )
+                if currency is not None:
+                    price_catalog.resolve(item_data.product_id, currency, None)
+            await CartService._raise_not_found(db, cart_id, expected_version)
 
-        if existing_item:
-            existing_item.quantity += item_data.quantity
-            existing_item.unit_price = item_data.unit_price
-            await db.commit()
-            await db.refresh(existing_item)
-            return existing_item
+        item = row.CartItem
+        # 同一商品再次加购时单价可能随目录变化，差值按修改前后的数量和单价计算
+        delta = CartService._line_delta([
+            (row.previous_quantity, row.previous_price, item.quantity, CartService._item_price(item))
+        ]) if row.fresh else None
+        version = await CartService._touch_cart(db, cart_id, "item.added", {
+            "item_id": str(item.id),
+            "product_id": item.product_id,
+            "added_quantity": item_data.quantity,
+            "quantity": item.quantity,
+            "unit_price": str(item.unit_price),
+        }, delta)
+        await db.commit()
+        await CartService._after_commit({cart_id: version})
+        return item, version
 
-        new_item = CartItem(
-            cart_id=cart_id,
-            product_id=item_data.product_id,
-            quantity=item_data.quantity,
-            unit_price=item_data.unit_price
+    @staticmethod
+    async def update_item(
+        db: AsyncSession, cart_id: uuid.UUID, item_id: uuid.UUID, item_data: CartItemUpdate,
+        expected_version: int | None = None
+    ) -> tuple[CartItem | AnonymousCartItem, int]:
+        """返回明细和购物车的新版本号"""
+        updated = await CartService._update_anonymous(
+            cart_id, lambda cart: (cart.update_item(item_id, item_data.quantity), cart.version), expected_version
+        )
+        if updated is not None:
+            return updated
+
+        locked = CartService._lock_cart(cart_id, expected_version)
+        stmt = (
+            update(CartItem)
+            .where(CartItem.id == item_id, CartItem.cart_id == cart_id, CartItem.cart_id == locked.c.id)
+            .values(quantity=item_data.quantity, updated_version=locked.c.version + 1)
+            .returning(CartItem, *CartService._previous_line(locked, cart_id, lambda previous: previous.c.id == item_id))
+            .add_cte(locked)
+        )
+        result = await db.execute(
+            select(CartItem, column("previous_quantity"), column("previous_price"), column("fresh"))
+            .from_statement(stmt)
+            .execution_options(populate_existing=True)
         )
-        db.add(new_item)
-        cart.updated_at = datetime.utcnow()
+        row = result.one_or_none()
+        if not row:
+            await CartService._raise_not_found(db, cart_id, expected_version, "Cart item not found")
+
+        item = row.CartItem
+        delta = CartService._line_delta([
+            (row.previous_quantity, row.previous_price, item.quantity, CartService._item_price(item))
+        ]) if row.fresh else None
+        version = await CartService._touch_cart(db, cart_id, "item.updated", {
+            "item_id": str(item.id),
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+        }, delta)
         await db.commit()
-        await db.refresh(new_item)
-        return new_item
+        await CartService._after_commit({cart_id: version})
+        return item, version
 
     @staticmethod
-    async def update_item(db: AsyncSession, cart_id: uuid.UUID, item_id: uuid.UUID, item_data: CartItemUpdate) -> CartItem:
+    async def get_item(db: AsyncSession, cart_id: uuid.UUID, item_id: uuid.UUID) -> dict:
+        anonymous = await anonymous_carts.get(cart_id)
+        if anonymous is not None:
+            item = anonymous.find_item(item_id)
+            return {
+                "cart_id": item.cart_id,
+                "id": item.id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price,
+                "added_at": item.added_at,
+            }
+        items = CartItem.__table__
+        # 响应中的单价是 Decimal，两种金额模式都读取 numeric 列 (由触发器与 unit_price_minor 保持一致)
         result = await db.execute(
-            select(CartItem).where(CartItem.id == item_id, CartItem.cart_id == cart_id)
+            select(
+                items.c.cart_id, items.c.id, items.c.product_id, items.c.quantity, items.c.unit_price, items.c.added_at
+            ).where(items.c.id == item_id, items.c.cart_id == cart_id)
         )
-        item = result.scalar_one_or_none()
-        if not item:
+        row = result.one_or_none()
+        if row is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart item not found")
+        return dict(row._mapping)
+
+    @staticmethod
+    async def set_quantities(db: AsyncSession, cart_id: uuid.UUID, quantities: dict[uuid.UUID, int]) -> int:
+        """写缓冲刷新：一条 UPDATE ... FROM (VALUES ...) 把多个明细的数量设为最终值，返回更新的明细数。
+
+        购物车或明细已被删除时对应的值被丢弃。
+        """
+        updated = await CartService._update_anonymous(cart_id, lambda cart: cart.set_quantities(quantities))
+        if updated is not None:
+            return updated
 
-        item.quantity = item_data.quantity
+        locked = CartService._lock_cart(cart_id)
+        final = values(column("id", Uuid), column("quantity", Integer), name="final").data(list(quantities.items()))
+        stmt = (
+            update(CartItem)
+            .where(CartItem.id == final.c.id, CartItem.cart_id == cart_id, CartItem.cart_id == locked.c.id)
+            .values(quantity=final.c.quantity, updated_version=locked.c.version + 1)
+            .returning(
+                CartItem.id, CartItem.product_id, CartItem.quantity,
+                CartService._price_column(CartItem.__table__).label("price"),
+                *CartService._previous_line(locked, cart_id, lambda previous: previous.c.id == final.c.id),
+            )
+            .add_cte(locked)
+        )
+        rows = (await db.execute(stmt)).all()
+        if not rows:
+            await db.rollback()
+            return 0
+
+        delta = CartService._line_delta([
+            (row.previous_quantity, row.previous_price, row.quantity, row.price) for row in rows
+        ]) if rows[0].fresh else None
+        if len(rows) == 1:
+            version = await CartService._touch_cart(db, cart_id, "item.updated", {
+                "item_id": str(rows[0].id),
+                "product_id": rows[0].product_id,
+                "quantity": rows[0].quantity,
+            }, delta)
+        else:
+            version = await CartService._touch_cart(db, cart_id, "items.batch_applied", {
+                "operations": len(rows),
+                "changed": [row.product_id for row in rows],
+                "removed": [],
+            }, delta)
         await db.commit()
-        await db.refresh(item)
-        return item
+        await CartService._after_commit({cart_id: version})
+        return len(rows)
 
     @staticmethod
-    async def remove_item(db: AsyncSession, cart_id: uuid.UUID, item_id: uuid.UUID) -> None:
+    async def remove_item(
+        db: AsyncSession, cart_id: uuid.UUID, item_id: uuid.UUID, expected_version: int | None = None
+    ) -> int:
+        """返回购物车的新版本号"""
+        def remove_anonymous(cart: AnonymousCart) -> int:
+            cart.remove_item(item_id)
+            return cart.version
+
+        version = await CartService._update_anonymous(cart_id, remove_anonymous, expected_version)
+        if version is not None:
+            return version
+
+        locked = CartService._lock_cart(cart_id, expected_version)
+        removed = (
+            delete(CartItem)
+            .where(CartItem.id == item_id, CartItem.cart_id == cart_id, CartItem.cart_id == locked.c.id)
+            .returning(
+                CartItem.id, CartItem.product_id, CartItem.quantity,
+                CartService._price_column(CartItem.__table__).label("price"), locked.c.version,
+            )
+            .add_cte(locked)
+            .cte("removed")
+        )
+        # DELETE ... RETURNING 返回的是被删除的最新行，直接按其数量和单价扣减合计
         result = await db.execute(
-            select(CartItem).where(CartItem.id == item_id, CartItem.cart_id == cart_id)
+            CartService._tombstone(removed, cart_id, removed.c.version + 1)
+            .returning(
+                CartItemTombstone.item_id,
+                CartItemTombstone.product_id,
+                select(removed.c.quantity).scalar_subquery().label("quantity"),
+                select(removed.c.price).scalar_subquery().label("price"),
+            )
         )
-        item = result.scalar_one_or_none()
-        if not item:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart item not found")
+        tombstone = result.one_or_none()
+        if tombstone is None:
+            await CartService._raise_not_found(db, cart_id, expected_version, "Cart item not found")
 
-        await db.delete(item)
+        version = await CartService._touch_cart(db, cart_id, "item.removed", {
+            "item_id": str(tombstone.item_id),
+            "product_id": tombstone.product_id,
+        }, CartService._line_delta([(tombstone.quantity, tombstone.price, 0, 0)]))
         await db.commit()
+        await CartService._after_commit({cart_id: version})
+        return version
 
     @staticmethod
-    async def clear_cart(db: AsyncSession, cart_id: uuid.UUID) -> None:
-        cart = await CartService.get_cart(db, cart_id)
-        cart.status = "abandoned"
-        for item in cart.items:
-            await db.delete(item)
+    async def clear_cart(db: AsyncSession, cart_id: uuid.UUID, expected_version: int | None = None) -> int:
+        """返回购物车的新版本号"""
+        version = await CartService._update_anonymous(cart_id, lambda cart: cart.clear().version, expected_version)
+        if version is not None:
+            return version
+
+        clear = (
+            update(Cart)
+            .where(CartService._cart_matches(cart_id, expected_version))
+            .values(
+                status="abandoned",
+                item_count=0,
+                subtotal=0,
+                version=Cart.version + 1,
+                updated_at=datetime.utcnow(),
+            )
+        )
+        result = await db.execute(CartService._with_event(clear, "cart.cleared"))
+        version = result.scalar_one_or_none()
+        if version is None:
+            await CartService._raise_not_found(db, cart_id, expected_version)
+
+        removed = (
+            delete(CartItem)
+            .where(CartItem.cart_id == cart_id)
+            .returning(CartItem.id, CartItem.product_id)
+            .cte("removed")
+        )
+        await db.execute(CartService._tombstone(removed, cart_id, literal(version)))
         await db.commit()
+        await CartService._after_commit({cart_id: version})
+        return version
 
     @staticmethod
-    async def merge_carts(db: AsyncSession, target_cart_id: uuid.UUID, source_cart_id: uuid.UUID) -> Cart:
-        target_cart = await CartService.get_cart(db, target_cart_id)
-        source_cart = await CartService.get_cart(db, source_cart_id)
+    async def merge_carts(
+        db: AsyncSession, target_cart_id: uuid.UUID, source_cart_id: uuid.UUID, expected_version: int | None = None
+    ) -> Cart:
+        if target_cart_id == source_cart_id:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot merge a cart into itself")
+        # 匿名层中的购物车先提升到数据库，再由下面的语句统一合并
+        await CartService._promote_anonymous(db, target_cart_id, expected_version=expected_version)
+        await CartService._promote_anonymous(db, source_cart_id)
 
-        for source_item in source_cart.items:
-            existing = next(
-                (i for i in target_cart.items if i.product_id == source_item.product_id), None
+        now = datetime.utcnow()
+        # 两个购物车按 id 顺序加锁，同时进行的 A→B 和 B→A 合并按相同顺序等待，不会死锁；
+        # 两个购物车都需是 active：已合并的源再次合并 (包括重放的请求) 会重复累加数量，合并到已合并的购物车会丢失明细
+        locked = (
+            select(Cart.id)
+            .where(
+                or_(CartService._cart_matches(target_cart_id, expected_version), Cart.id == source_cart_id),
+                Cart.status == "active",
             )
-            if existing:
-                existing.quantity += source_item.quantity
-            else:
-                new_item = CartItem(
-                    cart_id=target_cart_id,
-                    product_id=source_item.product_id,
-                    quantity=source_item.quantity,
-                    unit_price=source_item.unit_price
+            .order_by(Cart.id)
+            .with_for_update()
+            .cte("locked_carts")
+        )
+        result = await db.execute(
+            update(Cart)
+            .where(Cart.id.in_(select(locked.c.id)))
+            .values(
+                status=case((Cart.id == source_cart_id, "merged"), else_=Cart.status),
+                version=case((Cart.id == source_cart_id, Cart.version + 1), else_=Cart.version),
+                updated_at=now,
+            )
+            .returning(Cart.id, Cart.version, Cart.currency)
+        )
+        rows = result.all()
+        if len(rows) != 2:
+            await CartService._raise_merge_conflict(db, target_cart_id, source_cart_id, expected_version)
+        if rows[0].currency != rows[1].currency:
+            # 单价按目标购物车的币种解释，不能直接合并
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Cannot merge carts with different currencies")
+        versions = {row.id: row.version for row in rows}
+
+        prices = {}
+        if price_catalog.enabled:
+            # 合并的明细按目录价格重新定价，目录中已没有的商品保留原单价
+            product_ids = await db.scalars(select(CartItem.product_id).where(CartItem.cart_id == source_cart_id))
+            prices = {
+                product_id: price
+                for product_id in product_ids
+                if (price := price_catalog.price(product_id, rows[0].currency)) is not None
+            }
+        source_items = CartItem.__table__
+        unit_price = CartItem.unit_price
+        catalog = None
+        if prices:
+            # 目录价格作为两个数组参数传入，用 unnest 展开后关联，参数个数与商品数无关
+            catalog = (
+                select(
+                    func.unnest(bindparam("catalog_product_ids", list(prices), ARRAY(String))).label("product_id"),
+                    func.unnest(bindparam("catalog_prices", list(prices.values()), ARRAY(Numeric(10, 2)))).label("unit_price"),
+                )
+                .cte("catalog_prices")
+            )
+            source_items = source_items.outerjoin(catalog, catalog.c.product_id == CartItem.product_id)
+            unit_price = func.coalesce(catalog.c.unit_price, CartItem.unit_price)
+
+        # 目标购物车稍后由 _touch_cart 递增版本号，变更的明细提前标记为该版本
+        stmt = insert(CartItem).from_select(
+            ["id", "cart_id", "product_id", "quantity", "unit_price", "added_at", "updated_version"],
+            select(
+                func.uuid_generate_v7(),
+                literal(target_cart_id),
+                CartItem.product_id,
+                CartItem.quantity,
+                unit_price,
+                literal(now),
+                literal(versions[target_cart_id] + 1),
+            ).select_from(source_items).where(CartItem.cart_id == source_cart_id),
+        )
+        merged = {
+            "quantity": CartItem.quantity + stmt.excluded.quantity,
+            "updated_version": stmt.excluded.updated_version,
+        }
+        if catalog is not None:
+            # 目标购物车已有的商品同样按目录重新定价。SQLAlchemy 不会把 SET 子句中的子查询关联到冲突的目标行，
+            # 这里按表名引用 cart_items
+            conflicting = literal_column(f"{CartItem.__tablename__}.product_id")
+            merged["unit_price"] = func.coalesce(
+                select(catalog.c.unit_price).where(catalog.c.product_id == conflicting).scalar_subquery(),
+                CartItem.unit_price,
+            )
+            stmt = stmt.add_cte(catalog)
+        stmt = stmt.on_conflict_do_update(index_elements=[CartItem.cart_id, CartItem.product_id], set_=merged)
+        # 源购物车的 merged 事件随明细合并语句一起写入
+        source_event = insert(CartEvent).values(
+            cart_id=source_cart_id,
+            event_type="cart.merged",
+            version=versions[source_cart_id],
+            payload={"status": "merged", "target_cart_id": str(target_cart_id)},
+            created_at=now,
+        ).cte("source_event")
+        await db.execute(stmt.add_cte(source_event))
+        version = await CartService._touch_cart(db, target_cart_id, "cart.merge_received", {
+            "source_cart_id": str(source_cart_id),
+        })
+        await db.commit()
+        await CartService._after_commit({target_cart_id: version, source_cart_id: versions[source_cart_id]})
+        return await CartService._reload_cart(db, target_cart_id)
+
+    @staticmethod
+    async def attach_user(
+        db: AsyncSession, cart_id: uuid.UUID, user_id: uuid.UUID, expected_version: int | None = None
+    ) -> Cart:
+        """把购物车绑定到登录用户。匿名层中的购物车在此提升到数据库"""
+        if not await CartService._promote_anonymous(db, cart_id, user_id, expected_version):
+            attach = (
+                update(Cart)
+                .where(
+                    CartService._cart_matches(cart_id, expected_version),
+                    or_(Cart.user_id.is_(None), Cart.user_id == user_id),
+                )
+                .values(user_id=user_id, version=Cart.version + 1, updated_at=datetime.utcnow())
+            )
+            try:
+                result = await db.execute(CartService._with_event(attach, "cart.user_attached"))
+            except IntegrityError:
+                # uq_carts_user_id_active：用户已有 active 购物车
+                await db.rollback()
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User already has an active cart")
+            version = result.scalar_one_or_none()
+            if version is None:
+                owner = await db.scalar(select(Cart.user_id).where(Cart.id == cart_id))
+                if owner is not None and owner != user_id:
+                    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Cart belongs to another user")
+                await CartService._raise_not_found(db, cart_id, expected_version)
+            await db.commit()
+            recent_writes.mark(user_id)
+            await CartService._after_commit({cart_id: version})
+        return await CartService._reload_cart(db, cart_id)
+
+    @staticmethod
+    def _fold_operations(
+        current: dict[str, tuple[int, Decimal]], operations: list[CartBatchOperation]
+    ) -> tuple[dict[str, tuple[int, Decimal] | None], list[CartBatchResult]]:
+        """在内存中按顺序折叠所有操作，得到每个商品的最终 (数量, 单价)，None 表示移除"""
+        state: dict[str, tuple[int, Decimal] | None] = dict(current)
+        results = []
+        for index, operation in enumerate(operations):
+            line = state.get(operation.product_id)
+            if operation.op == "add":
+                quantity = (line[0] if line else 0) + operation.quantity
+                line = (quantity, operation.unit_price)
+            elif line is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Cart item not found: {operation.product_id}",
                 )
-                db.add(new_item)
+            elif operation.op == "set_quantity":
+                line = (operation.quantity, line[1])
+            else:
+                line = None
+            state[operation.product_id] = line
+            results.append(CartBatchResult(
+                index=index, op=operation.op, product_id=operation.product_id, quantity=line[0] if line else 0
+            ))
+        return state, results
+
+    @staticmethod
+    async def apply_batch(
+        db: AsyncSession, cart_id: uuid.UUID, operations: list[CartBatchOperation],
+        expected_version: int | None = None
+    ) -> tuple[Cart | AnonymousCart, list[CartBatchResult]]:
+        def apply_anonymous(cart: AnonymousCart):
+            current = {item.product_id: (item.quantity, item.unit_price) for item in cart.items}
+            state, results = CartService._fold_operations(
+                current, CartService._priced_operations(operations, cart.currency)
+            )
+            cart.touch()
+            cart.remove_items({pid for pid, line in state.items() if line is None})
+            for pid, line in state.items():
+                if line is not None and line != current.get(pid):
+                    cart.set_line(pid, *line)
+            return cart, results
+
+        applied = await CartService._update_anonymous(cart_id, apply_anonymous, expected_version)
+        if applied is not None:
+            return applied
+
+        result = await db.execute(
+            select(Cart.version, Cart.currency)
+            .where(CartService._cart_matches(cart_id, expected_version))
+            .with_for_update()
+        )
+        locked = result.one_or_none()
+        if locked is None:
+            await CartService._raise_not_found(db, cart_id, expected_version)
+        new_version = locked.version + 1
+
+        product_ids = {operation.product_id for operation in operations}
+        result = await db.execute(
+            select(CartItem.product_id, CartItem.quantity, CartItem.unit_price).where(
+                CartItem.cart_id == cart_id, CartItem.product_id.in_(product_ids)
+            )
+        )
+        current = {row.product_id: (row.quantity, row.unit_price) for row in result}
+        try:
+            state, results = CartService._fold_operations(
+                current, CartService._priced_operations(operations, locked.currency)
+            )
+        except HTTPException:
+            await db.rollback()
+            raise
+
+        removed = [pid for pid, line in state.items() if line is None and pid in current]
+        changed = [pid for pid, line in state.items() if line is not None and line != current.get(pid)]
+
+        if removed:
+            deleted = (
+                delete(CartItem)
+                .where(CartItem.cart_id == cart_id, CartItem.product_id.in_(removed))
+                .returning(CartItem.id, CartItem.product_id)
+                .cte("removed")
+            )
+            await db.execute(CartService._tombstone(deleted, cart_id, literal(new_version)))
+        if changed:
+            now = datetime.utcnow()
+            stmt = insert(CartItem).values([
+                {
+                    "id": uuid7(),
+                    "cart_id": cart_id,
+                    "product_id": pid,
+                    "quantity": state[pid][0],
+                    "unit_price": state[pid][1],
+                    "added_at": now,
+                    "updated_version": new_version,
+                }
+                for pid in changed
+            ])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[CartItem.cart_id, CartItem.product_id],
+                set_={
+                    "quantity": stmt.excluded.quantity,
+                    "unit_price": stmt.excluded.unit_price,
+                    "updated_version": stmt.excluded.updated_version,
+                },
+            )
+            await db.execute(stmt)
 
-        source_cart.status = "merged"
-        target_cart.updated_at = datetime.utcnow()
+        version = await CartService._touch_cart(db, cart_id, "items.batch_applied", {
+            "operations": len(operations),
+            "changed": changed,
+            "removed": removed,
+        })
         await db.commit()
-        return await CartService.get_cart(db, target_cart_id)
+        await CartService._after_commit({cart_id: version})
+        return await CartService._reload_cart(db, cart_id), results
 
     @staticmethod
     def calculate_total(cart: Cart) -> Decimal:
-        return sum(item.quantity * item.unit_price for item in cart.items)
+        if _minor_units():
+            return from_minor(sum(item.quantity * item.unit_price_minor for item in cart.items), cart.currency)
+        return sum((item.quantity * item.unit_price for item in cart.items), Decimal("0.00"))
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, update, tuple_, func, bindparam
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.cart import Cart, CartItemTombstone
+from app.services.cart_cache import cart_cache
+from app.services.cart_events import prune_events
+
+logger = logging.getLogger(__name__)
+
+PURGEABLE_STATUSES = ("abandoned", "merged")
+
+
+async def purge_stale_carts(older_than: timedelta, batch_size: int) -> int:
+    """分批删除超过保留期的 abandoned / merged 购物车，明细由外键级联删除。
+
+    每批单独提交，并以 FOR UPDATE SKIP LOCKED 选取，跳过正在被其他事务修改的购物车，
+    多个 worker 同时运行也不会互相阻塞。
+    """
+    cutoff = datetime.utcnow() - older_than
+    purged = 0
+    while True:
+        doomed = (
+            select(Cart.id)
+            .where(Cart.status.in_(PURGEABLE_STATUSES), Cart.updated_at < cutoff)
+            .order_by(Cart.updated_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(delete(Cart).where(Cart.id.in_(doomed)).returning(Cart.id, Cart.version))
+            # 已删除的购物车在副本上仍可能读到最后一个版本，也不能再写入缓存
+            purged_versions = {cart_id: version + 1 for cart_id, version in result}
+            await db.commit()
+
+        await cart_cache.invalidate(purged_versions)
+        purged += len(purged_versions)
+        if len(purged_versions) < batch_size:
+            return purged
+
+
+async def prune_tombstones(older_than: timedelta, batch_size: int) -> int:
+    """分批清理过期的删除墓碑，并把被清理的最大版本记入 carts.changes_horizon，
+    since 早于该版本的增量同步请求会收到全量明细。
+    """
+    cutoff = datetime.utcnow() - older_than
+    pruned = 0
+    while True:
+        doomed = (
+            select(CartItemTombstone.cart_id, CartItemTombstone.item_id)
+            .where(CartItemTombstone.removed_at < cutoff)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(CartItemTombstone)
+                .where(tuple_(CartItemTombstone.cart_id, CartItemTombstone.item_id).in_(doomed))
+                .returning(CartItemTombstone.cart_id, CartItemTombstone.removed_version)
+            )
+            rows = result.all()
+            horizons: dict = {}
+            for cart_id, removed_version in rows:
+                horizons[cart_id] = max(removed_version, horizons.get(cart_id, 0))
+            if horizons:
+                await db.execute(
+                    update(Cart.__table__)
+                    .where(Cart.__table__.c.id == bindparam("cart_id"))
+                    .values(
+                        changes_horizon=func.greatest(Cart.__table__.c.changes_horizon, bindparam("horizon")),
+                        # 清理墓碑不是购物车的修改，不能触发 updated_at 的 onupdate，否则会重置清理判断的闲置时间
+                        updated_at=Cart.__table__.c.updated_at,
+                    ),
+                    [{"cart_id": cart_id, "horizon": horizon} for cart_id, horizon in horizons.items()],
+                )
+            await db.commit()
+
+        pruned += len(rows)
+        if len(rows) < batch_size:
+            return pruned
+
+
+async def run_cart_sweeper() -> None:
+    older_than = timedelta(days=settings.CART_PURGE_AFTER_DAYS)
+    tombstone_retention = timedelta(hours=settings.CART_TOMBSTONE_RETENTION_HOURS)
+    event_retention = timedelta(hours=settings.CART_EVENTS_RETENTION_HOURS)
+    while True:
+        try:
+            if settings.CART_PURGE_ENABLED:
+                purged = await purge_stale_carts(older_than, settings.CART_PURGE_BATCH_SIZE)
+                if purged:
+                    logger.info("purged %d stale carts", purged)
+            pruned = await prune_tombstones(tombstone_retention, settings.CART_PURGE_BATCH_SIZE)
+            if pruned:
+                logger.info("pruned %d cart item tombstones", pruned)
+            pruned = await prune_events(event_retention, settings.CART_PURGE_BATCH_SIZE)
+            if pruned:
+                logger.info("pruned %d relayed cart events", pruned)
+        except Exception:
+            logger.exception("cart sweeper run failed")
+        await asyncio.sleep(settings.CART_PURGE_INTERVAL_SECONDS)
@@ -0,0 +1,71 @@
+"""以 UUID 开头的索引重建
+
+切换到 UUIDv7 之后新键只追加到 B-tree 右侧，但 uuid4 时期随机插入留下的半空页面不会自动回收。
+切换后运行一次，用 REINDEX INDEX CONCURRENTLY 逐个重建这些索引 (分区表逐个分区)，
+重建期间不阻塞读写，需要额外一份索引大小的磁盘空间。
+
+    python -m app.services.index_maintenance --dry-run
+    python -m app.services.index_maintenance
+"""
+import argparse
+import asyncio
+import logging
+from sqlalchemy import text
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+# 首列为随机 UUID 的索引；分区表上的索引会展开为各分区的索引
+UUID_LEADING_INDEXES = ("carts_pkey", "cart_items_pkey", "uq_cart_product", "cart_item_tombstones_pkey")
+
+_LEAF_INDEXES = text(
+    """
+    SELECT tree.relid::regclass::text AS name, pg_relation_size(tree.relid) AS size
+    FROM pg_partition_tree(CAST(:index AS regclass)) AS tree
+    WHERE tree.isleaf
+    ORDER BY tree.relid::regclass::text
+    """
+)
+
+
+async def leaf_indexes(conn, index: str) -> list[tuple[str, int]]:
+    leaves = [(row.name, row.size) for row in await conn.execute(_LEAF_INDEXES, {"index": index})]
+    if leaves:
+        return leaves
+    # 普通索引在 pg_partition_tree 中没有行
+    size = await conn.scalar(text("SELECT pg_relation_size(CAST(:name AS regclass))"), {"name": index})
+    return [(index, size)]
+
+
+async def rebuild(dry_run: bool) -> None:
+    async with engine.connect() as conn:
+        # REINDEX CONCURRENTLY 不能在事务块中执行
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        total_before = total_after = 0
+        for index in UUID_LEADING_INDEXES:
+            for name, size in await leaf_indexes(conn, index):
+                total_before += size
+                if dry_run:
+                    logger.info("%s: %.1f MB", name, size / 1024 / 1024)
+                    continue
+                # 中断后会留下 INVALID 的 <name>_ccnew 索引，需要手动 DROP INDEX CONCURRENTLY 后重跑
+                await conn.execute(text(f"REINDEX INDEX CONCURRENTLY {name}"))
+                after = await conn.scalar(text("SELECT pg_relation_size(CAST(:name AS regclass))"), {"name": name})
+                total_after += after
+                logger.info("%s: %.1f MB -> %.1f MB", name, size / 1024 / 1024, after / 1024 / 1024)
+        if not dry_run:
+            logger.info("total: %.1f MB -> %.1f MB", total_before / 1024 / 1024, total_after / 1024 / 1024)
+
+
+async def main(args: argparse.Namespace) -> None:
+    try:
+        await rebuild(args.dry_run)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    parser = argparse.ArgumentParser(description="Rebuild UUID-leading indexes after switching to UUIDv7")
+    parser.add_argument("--dry-run", action="store_true", help="只列出索引及其大小")
+    asyncio.run(main(parser.parse_args()))
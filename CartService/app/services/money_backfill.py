@@ -0,0 +1,81 @@
+"""最小货币单位列的在线回填
+
+在迁移 b9e3d7a1f4c6 (增加 BIGINT 列和同步触发器) 之后、d4a8c2e6f1b7 (NOT NULL) 之前运行。
+按购物车主键顺序分批，把 carts.subtotal_minor 和 cart_items.unit_price_minor 中仍为空的值
+按购物车币种从十进制列换算，每批一个短事务。
+
+每批先以 FOR UPDATE 锁住这批购物车，与应用写路径相同的先购物车后明细的加锁顺序，
+不会与并发写入死锁；迁移之后的新写入已由触发器填好，回填只更新为空的行。
+中断后用日志中最后的 --start-after 值重新运行即可继续。
+
+    python -m app.services.money_backfill --batch-size 1000 --pause 0.05
+"""
+import logging
+import uuid
+from sqlalchemy import text
+from app.db.session import AsyncSessionLocal
+from app.services.batch_jobs import job_parser, run_batches, run_job
+
+logger = logging.getLogger(__name__)
+
+_FILL_BATCH = text(
+    """
+    WITH batch AS (
+        SELECT id, currency FROM carts
+        WHERE CAST(:last_id AS uuid) IS NULL OR id > CAST(:last_id AS uuid)
+        ORDER BY id
+        LIMIT :batch_size
+        FOR UPDATE
+    ), filled_carts AS (
+        UPDATE carts SET subtotal_minor = money_to_minor(carts.subtotal, carts.currency)
+        FROM batch
+        WHERE carts.id = batch.id AND carts.subtotal_minor IS NULL
+        RETURNING 1
+    ), filled_items AS (
+        -- cart_id = ANY(...) 在每个分区上走 uq_cart_product 索引，不会扫描整个分区
+        UPDATE cart_items SET unit_price_minor = money_to_minor(cart_items.unit_price, batch.currency)
+        FROM batch
+        WHERE cart_items.cart_id = ANY(ARRAY(SELECT id FROM batch))
+            AND cart_items.cart_id = batch.id AND cart_items.unit_price_minor IS NULL
+        RETURNING 1
+    )
+    SELECT
+        count(*) AS carts,
+        (SELECT count(*) FROM filled_carts) AS filled_carts,
+        (SELECT count(*) FROM filled_items) AS filled_items,
+        (SELECT id FROM batch ORDER BY id DESC LIMIT 1) AS last_id
+    FROM batch
+    """
+)
+
+
+async def fill_batch(last_id: uuid.UUID | None, batch_size: int):
+    async with AsyncSessionLocal() as db:
+        result = (await db.execute(_FILL_BATCH, {"last_id": last_id, "batch_size": batch_size})).one()
+        await db.commit()
+        return result
+
+
+async def backfill(start_after: uuid.UUID | None, batch_size: int, pause: float) -> None:
+    last_id = start_after
+    carts = items = 0
+
+    async def next_batch() -> bool:
+        nonlocal last_id, carts, items
+        result = await fill_batch(last_id, batch_size)
+        carts += result.filled_carts
+        items += result.filled_items
+        if result.carts < batch_size:
+            return False
+        last_id = result.last_id
+        logger.info("money backfill filled %d carts, %d items, --start-after %s", carts, items, last_id)
+        return True
+
+    await run_batches(next_batch, pause)
+    logger.info("money backfill completed, filled %d carts, %d items", carts, items)
+
+
+if __name__ == "__main__":
+    parser = job_parser("Backfill minor-unit money columns", batch_size=1000, batch_help="每批处理的购物车数")
+    parser.add_argument("--start-after", type=uuid.UUID, default=None, help="从该购物车 ID 之后继续")
+    run_job(lambda args: backfill(args.start_after, args.batch_size, args.pause), parser)
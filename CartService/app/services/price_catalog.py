@@ -0,0 +1,186 @@
+import asyncio
+import csv
+import logging
+import os
+from datetime import datetime
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.money import from_minor, to_minor
+from app.db.session import AsyncSessionLocal, SNAPSHOT_XMIN
+from app.models.catalog import ProductPrice
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(unit_price: Decimal, currency: str) -> Decimal:
+    # 与 cart_items 触发器相同，按币种的最小单位舍入，重新定价时比较的是落库后的值
+    return from_minor(to_minor(unit_price, currency), currency)
+
+
+class PriceCatalog:
+    """进程内商品价格索引 product_id -> {币种: 单价}，加购时查价只是字典查找，不访问网络。
+
+    启动时加载完整快照，之后周期性增量刷新；version 单调递增，标识索引对应的数据源位置。
+    source 为 none 时不启用，单价由客户端提供。
+    """
+
+    source = "none"
+
+    def __init__(self) -> None:
+        self._prices: dict[str, dict[str, Decimal]] = {}
+        self.version = 0
+        self.loaded_at: datetime | None = None
+        self.refreshed_at: datetime | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.source != "none"
+
+    def prices(self, product_id: str) -> dict[str, Decimal]:
+        return self._prices.get(product_id, {})
+
+    def price(self, product_id: str, currency: str) -> Decimal | None:
+        return self.prices(product_id).get(currency)
+
+    def entries(self) -> list[tuple[str, str, Decimal]]:
+        return [
+            (product_id, currency, unit_price)
+            for product_id, prices in self._prices.items()
+            for currency, unit_price in prices.items()
+        ]
+
+    def resolve(self, product_id: str, currency: str | None, requested: Decimal | None) -> Decimal:
+        """加购使用的单价：启用目录时以目录价格为准，忽略客户端单价；否则使用客户端提供的单价"""
+        if not self.enabled:
+            if requested is None:
+                raise HTTPException(status_code=422, detail="unit_price is required")
+            return requested
+        unit_price = self.price(product_id, currency) if currency else None
+        if unit_price is None:
+            raise HTTPException(status_code=422, detail=f"No catalog price for product: {product_id}")
+        return unit_price
+
+    def _replace(self, rows, version: int) -> None:
+        prices: dict[str, dict[str, Decimal]] = {}
+        for product_id, currency, unit_price in rows:
+            prices.setdefault(product_id, {})[currency] = _normalize(unit_price, currency)
+        # 整体替换，请求不会看到加载到一半的索引
+        self._prices = prices
+        self.version = version
+        self.loaded_at = self.refreshed_at = datetime.utcnow()
+
+    def _apply(self, product_id: str, currency: str, unit_price: Decimal | None) -> None:
+        prices = self._prices.setdefault(product_id, {})
+        if unit_price is None:
+            prices.pop(currency, None)
+            if not prices:
+                del self._prices[product_id]
+        else:
+            prices[currency] = _normalize(unit_price, currency)
+
+    async def load(self) -> None:
+        """加载完整快照"""
+        return None
+
+    async def refresh(self) -> int:
+        """应用自上次加载以来的变更，返回变更的价格数"""
+        return 0
+
+    def snapshot(self) -> dict:
+        return {
+            "source": self.source,
+            "version": self.version,
+            "products": len(self._prices),
+            "loaded_at": self.loaded_at,
+            "refreshed_at": self.refreshed_at,
+        }
+
+
+class FilePriceCatalog(PriceCatalog):
+    """CSV 快照 (表头 product_id,currency,unit_price)，文件修改时间变化时整体重新加载。
+
+    version 为文件修改时间 (纳秒)。发布新快照时应先写临时文件再 rename，避免读到写了一半的文件
+    """
+
+    source = "file"
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+
+    def _read(self) -> list[tuple[str, str, Decimal]]:
+        with open(self.path, newline="") as snapshot:
+            return [
+                (row["product_id"], row["currency"], Decimal(row["unit_price"]))
+                for row in csv.DictReader(snapshot)
+            ]
+
+    async def load(self) -> None:
+        version = os.stat(self.path).st_mtime_ns
+        self._replace(await asyncio.to_thread(self._read), version)
+
+    async def refresh(self) -> int:
+        if os.stat(self.path).st_mtime_ns == self.version:
+            self.refreshed_at = datetime.utcnow()
+            return 0
+        await self.load()
+        return sum(len(prices) for prices in self._prices.values())
+
+
+class TablePriceCatalog(PriceCatalog):
+    """product_prices 表。增量刷新读取 txid 在 [version, 快照 xmin) 之间的行，
+    这些事务都已结束，按 xmin 推进的 version 不会漏掉晚提交的修改；下架的行从索引中移除
+    """
+
+    source = "table"
+
+    async def load(self) -> None:
+        async with AsyncSessionLocal() as db:
+            # 先取 xmin 再读快照：两条语句之间提交的修改会在下一次增量刷新中重复应用，结果相同
+            version = await db.scalar(select(SNAPSHOT_XMIN))
+            result = await db.execute(
+                select(ProductPrice.product_id, ProductPrice.currency, ProductPrice.unit_price)
+                .where(ProductPrice.discontinued.is_(False))
+            )
+            self._replace(result.all(), version)
+
+    async def refresh(self) -> int:
+        async with AsyncSessionLocal() as db:
+            version = await db.scalar(select(SNAPSHOT_XMIN))
+            result = await db.execute(
+                select(
+                    ProductPrice.product_id, ProductPrice.currency, ProductPrice.unit_price, ProductPrice.discontinued
+                ).where(ProductPrice.txid >= self.version, ProductPrice.txid < version)
+            )
+            rows = result.all()
+        for product_id, currency, unit_price, discontinued in rows:
+            self._apply(product_id, currency, None if discontinued else unit_price)
+        self.version = max(self.version, version)
+        self.refreshed_at = datetime.utcnow()
+        return len(rows)
+
+
+def build_price_catalog(source: str) -> PriceCatalog:
+    if source == "file":
+        return FilePriceCatalog(settings.PRICE_CATALOG_FILE_PATH)
+    if source == "table":
+        return TablePriceCatalog()
+    if source == "none":
+        return PriceCatalog()
+    raise ValueError(f"Unknown price catalog source: {source}")
+
+
+price_catalog = build_price_catalog(settings.PRICE_CATALOG_SOURCE)
+
+
+async def run_price_catalog_refresh(catalog: PriceCatalog) -> None:
+    while True:
+        await asyncio.sleep(settings.PRICE_CATALOG_REFRESH_SECONDS)
+        try:
+            changed = await catalog.refresh()
+            if changed:
+                logger.info("price catalog applied %d price changes, version %d", changed, catalog.version)
+        except Exception:
+            logger.exception("price catalog refresh failed")
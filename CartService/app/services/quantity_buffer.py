@@ -0,0 +1,118 @@
+"""商品数量写缓冲 (write-behind)
+
+连续点击 +/- 时同一明细会收到一串 PATCH。开启后不带 If-Match 的数量更新只写入进程内缓冲，
+每个购物车在第一次缓冲后 CART_WRITE_BEHIND_WINDOW_MS 内的更新合并为最后的值，
+到期后用一条语句落库。该购物车的其他读写请求会先刷新缓冲，因此读到的总是最新值，
+后续写操作也按请求顺序生效。应用关闭时 lifespan 调用 close 刷新全部缓冲。
+
+缓冲是进程内的：同一购物车的请求应路由到同一进程，进程被强制杀死时未刷新的更新会丢失。
+"""
+import asyncio
+import contextlib
+import logging
+import uuid
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services.cart_service import CartService
+
+logger = logging.getLogger(__name__)
+
+
+class QuantityBuffer:
+
+    def __init__(self, enabled: bool, window_seconds: float) -> None:
+        self.enabled = enabled
+        self.window_seconds = window_seconds
+        # cart_id -> {item_id: 最后一次请求的数量}
+        self._pending: dict[uuid.UUID, dict[uuid.UUID, int]] = {}
+        # 首次缓冲时读取的明细行，用于构造 PATCH 响应
+        self._items: dict[tuple[uuid.UUID, uuid.UUID], dict] = {}
+        self._timers: dict[uuid.UUID, asyncio.Task] = {}
+        self._writes: dict[uuid.UUID, asyncio.Task] = {}
+
+    def has_pending(self, cart_id: uuid.UUID) -> bool:
+        return cart_id in self._pending or cart_id in self._writes
+
+    async def update(self, db: AsyncSession, cart_id: uuid.UUID, item_id: uuid.UUID, quantity: int) -> dict:
+        """缓冲一次数量更新，返回带新数量的明细；明细不存在时抛出 404"""
+        key = (cart_id, item_id)
+        item = self._items.get(key)
+        if item is None:
+            item = await CartService.get_item(db, cart_id, item_id)
+            # 只读查询，立即结束事务归还连接
+            await db.rollback()
+            if cart_id in self._pending and key in self._items:
+                # 等待查询期间已有并发请求缓冲了同一明细
+                item = self._items[key]
+            self._items[key] = item
+
+        self._pending.setdefault(cart_id, {})[item_id] = quantity
+        if cart_id not in self._timers:
+            self._timers[cart_id] = asyncio.create_task(self._flush_later(cart_id))
+        return {**item, "quantity": quantity}
+
+    async def _flush_later(self, cart_id: uuid.UUID) -> None:
+        await asyncio.sleep(self.window_seconds)
+        self._timers.pop(cart_id, None)
+        await self.flush(cart_id)
+
+    async def flush(self, *cart_ids: uuid.UUID) -> None:
+        """落库指定购物车的缓冲，并等待进行中的刷新完成"""
+        for cart_id in cart_ids:
+            if not self.has_pending(cart_id):
+                continue
+            timer = self._timers.pop(cart_id, None)
+            if timer is not None and timer is not asyncio.current_task():
+                timer.cancel()
+
+            quantities = self._pending.pop(cart_id, None)
+            if quantities is not None:
+                for item_id in quantities:
+                    self._items.pop((cart_id, item_id), None)
+                previous = self._writes.get(cart_id)
+                self._writes[cart_id] = asyncio.create_task(self._write(cart_id, quantities, previous))
+
+            write = self._writes[cart_id]
+            try:
+                # 调用方被取消时不中断落库
+                await asyncio.shield(write)
+            except Exception:
+                logger.exception("flushing buffered quantities failed for cart %s", cart_id)
+            finally:
+                if self._writes.get(cart_id) is write and write.done():
+                    del self._writes[cart_id]
+
+    async def _write(self, cart_id: uuid.UUID, quantities: dict[uuid.UUID, int], previous: asyncio.Task | None) -> None:
+        if previous is not None:
+            # 同一购物车的刷新按顺序执行
+            with contextlib.suppress(Exception):
+                await previous
+        try:
+            async with AsyncSessionLocal() as db:
+                await CartService.set_quantities(db, cart_id, quantities)
+        except HTTPException:
+            # 购物车已被删除
+            return
+        except Exception:
+            # 放回缓冲等待下个窗口重试，期间更新的值优先
+            self._pending[cart_id] = {**quantities, **self._pending.get(cart_id, {})}
+            if cart_id not in self._timers:
+                self._timers[cart_id] = asyncio.create_task(self._flush_later(cart_id))
+            raise
+
+    async def close(self) -> None:
+        """应用关闭时刷新全部缓冲"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        await self.flush(*list({*self._pending, *self._writes}))
+        if self._pending:
+            # 关闭时刷新失败的更新无法再重试
+            logger.error("dropping buffered quantities for %d carts", len(self._pending))
+            for timer in self._timers.values():
+                timer.cancel()
+
+
+quantity_buffer = QuantityBuffer(settings.CART_WRITE_BEHIND_ENABLED, settings.CART_WRITE_BEHIND_WINDOW_MS / 1000)
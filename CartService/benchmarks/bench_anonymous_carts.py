@@ -0,0 +1,108 @@
+"""匿名购物车层对主库写入量的影响
+
+在进程内 (httpx ASGITransport) 模拟 N 个匿名浏览会话：创建购物车、添加 3 个商品、修改一次数量、
+读取两次；其中 --convert 比例的会话最后绑定到新用户 (PUT /carts/{id}/user)。
+分别在 CART_ANONYMOUS_BACKEND=none 和 memory 下运行，输出总耗时、主库写入的行数 (pg_stat 的
+插入 + 更新 + 删除) 和产生的 WAL，结束后删除生成的购物车。
+
+    SQL_PROFILING_ENABLED=false ADMISSION_ENABLED=false \\
+        python -m benchmarks.bench_anonymous_carts --sessions 2000 --convert 0.05
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+import httpx
+from sqlalchemy import delete, text
+
+import app.services.cart_service as cart_service
+from app.db.session import AsyncSessionLocal, engine
+from app.main import app
+from app.models.cart import Cart
+from app.services.anonymous_carts import build_anonymous_cart_store
+
+BACKENDS = ("none", "memory")
+
+_ROW_WRITES = text(
+    """
+    SELECT coalesce(sum(n_tup_ins + n_tup_upd + n_tup_del), 0)
+    FROM pg_stat_user_tables WHERE relname IN ('carts', 'cart_events', 'cart_item_tombstones')
+        OR relname LIKE 'cart\\_items\\_p%'
+    """
+)
+
+
+async def session(client: httpx.AsyncClient, convert: bool, created: list[str]) -> None:
+    cart_id = (await client.post("/api/v1/carts", json={})).json()["id"]
+    created.append(cart_id)
+    item_id = None
+    for n in range(3):
+        response = await client.post(
+            f"/api/v1/carts/{cart_id}/items",
+            json={"product_id": f"SKU-{random.randrange(1000)}-{n}", "quantity": 1, "unit_price": "9.99"},
+        )
+        item_id = response.json()["id"]
+    await client.get(f"/api/v1/carts/{cart_id}")
+    await client.patch(f"/api/v1/carts/{cart_id}/items/{item_id}", json={"quantity": 2})
+    await client.get(f"/api/v1/carts/{cart_id}/summary")
+    if convert:
+        response = await client.put(f"/api/v1/carts/{cart_id}/user", json={"user_id": str(uuid.uuid4())})
+        response.raise_for_status()
+
+
+async def counters(conn) -> tuple[int, int]:
+    # pg_stat 计数在事务内会被缓存，先清空快照
+    await conn.execute(text("SELECT pg_stat_clear_snapshot()"))
+    rows = await conn.scalar(_ROW_WRITES)
+    lsn = await conn.scalar(text("SELECT pg_current_wal_lsn()"))
+    await conn.commit()
+    return int(rows), lsn
+
+
+async def run(client: httpx.AsyncClient, sessions: int, convert: float, concurrency: int, created: list[str]) -> float:
+    queue = [random.random() < convert for _ in range(sessions)]
+
+    async def worker() -> None:
+        while queue:
+            await session(client, queue.pop(), created)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+async def main(sessions: int, convert: float, concurrency: int) -> None:
+    engine.echo = False
+    created: list[str] = []
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client, engine.connect() as conn:
+            print(f"{'backend':>8} {'seconds':>8} {'row writes':>11} {'WAL MB':>8}")
+            for backend in BACKENDS:
+                cart_service.anonymous_carts = build_anonymous_cart_store(backend)
+                rows_before, lsn_before = await counters(conn)
+                elapsed = await run(client, sessions, convert, concurrency, created)
+                # 统计信息由后端进程异步上报
+                await asyncio.sleep(1)
+                rows_after, _ = await counters(conn)
+                wal = await conn.scalar(
+                    text("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), CAST(:start AS pg_lsn))"), {"start": lsn_before}
+                )
+                await conn.commit()
+                print(f"{backend:>8} {elapsed:>8.2f} {rows_after - rows_before:>11} {int(wal) / 1024 / 1024:>8.1f}")
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Cart).where(Cart.id.in_(created)))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure primary write volume with and without the anonymous cart tier")
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--convert", type=float, default=0.05, help="绑定到用户的会话比例")
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.convert, args.concurrency))
@@ -0,0 +1,96 @@
+"""购物车导出基准测试
+
+在 DATABASE_URL 指向的数据库中用 generate_series 生成 N 个商品的数据集 (updated_at 位于 2001 年，
+与真实数据隔离)，分别以 NDJSON 和 CSV 导出并统计吞吐量与进程峰值内存，结束后清理生成的数据。
+
+    python -m benchmarks.bench_cart_export --items 1000000 --items-per-cart 50
+"""
+import argparse
+import asyncio
+import resource
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.db.session import AsyncSessionLocal, engine
+from app.services.cart_export import export_carts
+
+RANGE_START = datetime(2001, 1, 1)
+RANGE_END = datetime(2002, 1, 1)
+
+
+async def generate_dataset(items: int, items_per_cart: int) -> None:
+    carts = max(1, items // items_per_cart)
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            text(
+                """
+                INSERT INTO carts (id, status, item_count, subtotal, version, created_at, updated_at)
+                SELECT gen_random_uuid(), 'abandoned', p.per_cart, p.per_cart * 9.99, 1,
+                       p.start, p.start + g * interval '1 second'
+                FROM (SELECT CAST(:per_cart AS integer) AS per_cart, CAST(:start AS timestamp) AS start) AS p
+                CROSS JOIN generate_series(1, :carts) AS g
+                """
+            ),
+            {"carts": carts, "per_cart": items_per_cart, "start": RANGE_START},
+        )
+        await db.execute(
+            text(
+                """
+                INSERT INTO cart_items (id, cart_id, product_id, quantity, unit_price, added_at, updated_version)
+                SELECT gen_random_uuid(), c.id, 'SKU-' || g, 1, 9.99, c.updated_at, 1
+                FROM carts c CROSS JOIN generate_series(1, CAST(:per_cart AS integer)) AS g
+                WHERE c.updated_at >= :start AND c.updated_at < :end
+                """
+            ),
+            {"per_cart": items_per_cart, "start": RANGE_START, "end": RANGE_END},
+        )
+        await db.commit()
+
+
+async def cleanup() -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            text("DELETE FROM carts WHERE updated_at >= :start AND updated_at < :end"),
+            {"start": RANGE_START, "end": RANGE_END},
+        )
+        await db.commit()
+
+
+def peak_rss_mb() -> float:
+    # Linux 上 ru_maxrss 的单位是 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run_export(export_format: str, items: int, chunk_size: int) -> None:
+    total_bytes = 0
+    started = time.perf_counter()
+    async for chunk in export_carts(export_format, ("abandoned",), RANGE_START, RANGE_END, chunk_size):
+        total_bytes += len(chunk)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{export_format:>7} {elapsed:>9.2f} {items / elapsed:>12.0f} "
+        f"{total_bytes / 1024 / 1024:>9.1f} {peak_rss_mb():>12.1f}"
+    )
+
+
+async def main(items: int, items_per_cart: int, chunk_size: int) -> None:
+    engine.echo = False
+    await generate_dataset(items, items_per_cart)
+    try:
+        print(f"{'format':>7} {'seconds':>9} {'items/s':>12} {'MB out':>9} {'peak RSS MB':>12}")
+        for export_format in ("ndjson", "csv"):
+            await run_export(export_format, items, chunk_size)
+    finally:
+        await cleanup()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark streaming cart export")
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--items-per-cart", type=int, default=50)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.items_per_cart, args.chunk_size))
@@ -0,0 +1,135 @@
+"""cart_items 分区前后对比基准测试
+
+在独立的 bench_partitioning schema 中生成两份相同的数据：普通表 (主键 id，迁移前的结构) 和
+按 cart_id 哈希分区的表 (主键 (cart_id, id)，迁移后的结构)，分别测量：
+
+- insert: 与 add_item 相同的 INSERT ... ON CONFLICT (cart_id, product_id) DO UPDATE
+- lookup: 读取一个购物车的全部明细 (WHERE cart_id = $1)
+- update: 按 (cart_id, id) 修改单个明细的数量
+
+每条语句单独提交，输出延迟中位数、p99 以及表和索引的总大小，结束后删除 schema。
+
+    python -m benchmarks.bench_cart_items_partitioning --items 2000000 --samples 2000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import text
+
+from app.db.session import engine
+
+SCHEMA = "bench_partitioning"
+PARTITIONS = 16
+
+TABLE_COLUMNS = """
+    id uuid NOT NULL,
+    cart_id uuid NOT NULL,
+    product_id varchar(100) NOT NULL,
+    quantity integer NOT NULL CHECK (quantity > 0),
+    unit_price numeric(10, 2) NOT NULL,
+    added_at timestamp without time zone NOT NULL,
+    updated_version integer DEFAULT 0 NOT NULL
+"""
+
+
+async def setup(conn, items: int, items_per_cart: int) -> None:
+    await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    await conn.execute(text(
+        f"CREATE TABLE {SCHEMA}.items_heap ({TABLE_COLUMNS}, PRIMARY KEY (id), UNIQUE (cart_id, product_id))"
+    ))
+    await conn.execute(text(
+        f"CREATE TABLE {SCHEMA}.items_hash ({TABLE_COLUMNS}, PRIMARY KEY (cart_id, id), UNIQUE (cart_id, product_id)) "
+        f"PARTITION BY HASH (cart_id)"
+    ))
+    for remainder in range(PARTITIONS):
+        await conn.execute(text(
+            f"CREATE TABLE {SCHEMA}.items_hash_p{remainder:02d} PARTITION OF {SCHEMA}.items_hash "
+            f"FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})"
+        ))
+
+    await conn.execute(text(
+        f"CREATE TABLE {SCHEMA}.carts AS SELECT gen_random_uuid() AS id FROM generate_series(1, :carts)"
+    ), {"carts": max(1, items // items_per_cart)})
+    for table in ("items_heap", "items_hash"):
+        await conn.execute(text(
+            f"""
+            INSERT INTO {SCHEMA}.{table} (id, cart_id, product_id, quantity, unit_price, added_at)
+            SELECT gen_random_uuid(), c.id, 'SKU-' || g, 1, 9.99, now()
+            FROM {SCHEMA}.carts c CROSS JOIN generate_series(1, CAST(:per_cart AS integer)) AS g
+            """
+        ), {"per_cart": items_per_cart})
+        await conn.execute(text(f"ANALYZE {SCHEMA}.{table}"))
+    await conn.commit()
+
+
+async def measure(conn, statement, params: list[dict]) -> list[float]:
+    timings = []
+    for values in params:
+        started = time.perf_counter()
+        await conn.execute(statement, values)
+        await conn.commit()
+        timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)
+
+
+async def table_size_mb(conn, table: str) -> float:
+    size = await conn.scalar(text(
+        # 普通表在 pg_partition_tree 中没有行
+        "SELECT coalesce(sum(pg_total_relation_size(relid)), pg_total_relation_size(CAST(:table AS regclass))) "
+        "FROM pg_partition_tree(CAST(:table AS regclass))"
+    ), {"table": f"{SCHEMA}.{table}"})
+    return size / 1024 / 1024
+
+
+async def main(items: int, items_per_cart: int, samples: int) -> None:
+    engine.echo = False
+    async with engine.connect() as conn:
+        await setup(conn, items, items_per_cart)
+        try:
+            cart_ids = (await conn.execute(text(
+                f"SELECT id FROM {SCHEMA}.carts ORDER BY random() LIMIT :samples"
+            ), {"samples": samples})).scalars().all()
+            print(f"{'table':>11} {'operation':>10} {'median ms':>10} {'p99 ms':>8} {'size MB':>9}")
+            for table in ("items_heap", "items_hash"):
+                inserts = [
+                    {"id": uuid.uuid4(), "cart_id": cart_id, "product_id": f"NEW-{random.randrange(1000)}"}
+                    for cart_id in cart_ids
+                ]
+                insert = text(
+                    f"""
+                    INSERT INTO {SCHEMA}.{table} AS t (id, cart_id, product_id, quantity, unit_price, added_at)
+                    VALUES (:id, :cart_id, :product_id, 1, 9.99, now())
+                    ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = t.quantity + excluded.quantity
+                    """
+                )
+                lookup = text(f"SELECT * FROM {SCHEMA}.{table} WHERE cart_id = :cart_id")
+                update = text(f"UPDATE {SCHEMA}.{table} SET quantity = quantity + 1 WHERE cart_id = :cart_id AND id = :id")
+
+                results = {
+                    "insert": await measure(conn, insert, inserts),
+                    "lookup": await measure(conn, lookup, [{"cart_id": cart_id} for cart_id in cart_ids]),
+                    "update": await measure(conn, update, inserts),
+                }
+                size = await table_size_mb(conn, table)
+                for operation, timings in results.items():
+                    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+                    print(f"{table:>11} {operation:>10} {statistics.median(timings):>10.3f} {p99:>8.3f} {size:>9.1f}")
+        finally:
+            await conn.rollback()
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await conn.commit()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare cart_items heap vs hash-partitioned latency")
+    parser.add_argument("--items", type=int, default=2_000_000)
+    parser.add_argument("--items-per-cart", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.items_per_cart, args.samples))
@@ -0,0 +1,81 @@
+"""购物车读路径序列化基准测试
+
+对比两种 GET /carts/{cart_id} 的实现在 10 / 100 / 1000 个商品时每次请求的 CPU 时间：
+
+- orm:  CartService.get_cart (ORM + selectinload) -> CartResponse.model_validate -> model_dump_json
+- core: CartService.get_cart_document (Core 行) -> orjson
+
+CPU 时间以 time.process_time 统计，不含等待数据库的时间。
+
+    python -m benchmarks.bench_cart_serialization --sizes 10 100 1000 --repeat 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from sqlalchemy import delete, update
+
+from app.core.serialization import json_dumps
+from app.db.session import AsyncSessionLocal, engine
+from app.models.cart import Cart
+from app.schemas.cart import CartResponse
+from app.services.cart_service import CartService
+from benchmarks.bench_merge_carts import create_cart_with_items
+
+
+async def orm_path(cart_id: uuid.UUID) -> bytes:
+    async with AsyncSessionLocal() as db:
+        cart = await CartService.get_cart(db, cart_id)
+        response = CartResponse.model_validate(cart)
+        response.total_price = CartService.calculate_total(cart)
+        return response.model_dump_json().encode()
+
+
+async def core_path(cart_id: uuid.UUID) -> bytes:
+    async with AsyncSessionLocal() as db:
+        return json_dumps(await CartService.get_cart_document(db, cart_id))
+
+
+async def measure(path, cart_id: uuid.UUID, repeat: int) -> list[float]:
+    await path(cart_id)  # 预热连接与语句缓存
+    timings = []
+    for _ in range(repeat):
+        started = time.process_time()
+        await path(cart_id)
+        timings.append((time.process_time() - started) * 1000)
+    return timings
+
+
+async def main(sizes: list[int], repeat: int) -> None:
+    engine.echo = False
+    print(f"{'items':>8} {'path':>6} {'median cpu ms':>14} {'p95 cpu ms':>11} {'bytes':>9}")
+    for size in sizes:
+        cart_id = await create_cart_with_items([f"SKU-{i}" for i in range(size)])
+        # create_cart_with_items 只插入明细，这里补齐 item_count / subtotal
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Cart).where(Cart.id == cart_id).values(item_count=size, subtotal=Decimal("9.99") * size)
+            )
+            await db.commit()
+        try:
+            for name, path in (("orm", orm_path), ("core", core_path)):
+                timings = sorted(await measure(path, cart_id, repeat))
+                payload = await path(cart_id)
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                print(f"{size:>8} {name:>6} {statistics.median(timings):>14.3f} {p95:>11.3f} {len(payload):>9}")
+        finally:
+            async with AsyncSessionLocal() as db:
+                await db.execute(delete(Cart).where(Cart.id == cart_id))
+                await db.commit()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cart read serialization paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.repeat))
@@ -0,0 +1,144 @@
+"""轮询与变更事件流的读负载对比
+
+在进程内 (httpx ASGITransport) 创建 N 个购物车，每个购物车有 --devices 个客户端在同步；
+写入方以 --writes-per-second 的速率随机修改购物车，持续 --seconds 秒。两种同步方式：
+
+- poll：每个客户端每 --interval 秒带 If-None-Match 请求一次 GET /carts/{id}，变化时取回全量
+- stream：每个客户端订阅事件流，收到 cart.changed 后调用一次 GET /carts/{id}
+
+输出客户端发出的请求数、数据库语句数 (含写入方) 和从发出写请求到第一个客户端得知变更的延迟中位数。
+ASGITransport 不支持流式响应，stream 模式直接迭代事件流接口使用的生成器。结束后删除生成的购物车。
+
+    SQL_PROFILING_ENABLED=false ADMISSION_ENABLED=false \\
+        python -m benchmarks.bench_cart_streams --carts 200 --devices 2 --seconds 10
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+
+import httpx
+from sqlalchemy import delete, event
+
+from app.api.v1.endpoints.cart import _stream_cart_changes
+from app.db.session import AsyncSessionLocal, engine
+from app.main import app
+from app.models.cart import Cart
+
+MODES = ("poll", "stream")
+
+
+class Counters:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.statements = 0
+        self.latencies: list[float] = []
+        # 每个购物车最近一次写请求的发出时间
+        self.written: dict[str, float] = {}
+
+    def observed(self, cart_id: str) -> None:
+        written = self.written.pop(cart_id, None)
+        if written is not None:
+            self.latencies.append((time.perf_counter() - written) * 1000)
+
+
+async def writer(client: httpx.AsyncClient, cart_ids: list[str], rate: float, counters: Counters, stop: asyncio.Event):
+    n = 0
+    while not stop.is_set():
+        cart_id = random.choice(cart_ids)
+        n += 1
+        counters.written[cart_id] = time.perf_counter()
+        await client.post(
+            f"/api/v1/carts/{cart_id}/items:batch",
+            json={"operations": [{"op": "add", "product_id": f"SKU-{n % 50}", "unit_price": "9.99"}]},
+        )
+        await asyncio.sleep(random.expovariate(rate))
+
+
+async def fetch(client: httpx.AsyncClient, cart_id: str, counters: Counters) -> None:
+    counters.requests += 1
+    await client.get(f"/api/v1/carts/{cart_id}")
+
+
+async def poller(client: httpx.AsyncClient, cart_id: str, interval: float, counters: Counters, stop: asyncio.Event):
+    etag = None
+    await asyncio.sleep(random.uniform(0, interval))
+    while not stop.is_set():
+        counters.requests += 1
+        response = await client.get(f"/api/v1/carts/{cart_id}", headers={"If-None-Match": etag} if etag else {})
+        if response.status_code == 200:
+            etag = response.headers["ETag"]
+            counters.observed(cart_id)
+        await asyncio.sleep(interval)
+
+
+async def subscriber(client: httpx.AsyncClient, cart_id: str, counters: Counters, stop: asyncio.Event):
+    stream = _stream_cart_changes(uuid.UUID(cart_id), None)
+    try:
+        async for message in stream:
+            if stop.is_set():
+                break
+            if message.startswith(b"id: "):
+                counters.observed(cart_id)
+                await fetch(client, cart_id, counters)
+    finally:
+        await stream.aclose()
+
+
+async def run(client, mode: str, cart_ids: list[str], args) -> Counters:
+    counters = Counters()
+    stop = asyncio.Event()
+    if mode == "poll":
+        clients = [poller(client, cart_id, args.interval, counters, stop) for cart_id in cart_ids for _ in range(args.devices)]
+    else:
+        clients = [subscriber(client, cart_id, counters, stop) for cart_id in cart_ids for _ in range(args.devices)]
+    tasks = [asyncio.create_task(coro) for coro in clients]
+    # 事件流建立连接时各查询一次版本号，不计入稳态
+    await asyncio.sleep(1)
+    counters.requests = counters.statements = 0
+    counters.latencies.clear()
+
+    def count(*_):
+        counters.statements += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    write = asyncio.create_task(writer(client, cart_ids, args.writes_per_second, counters, stop))
+    await asyncio.sleep(args.seconds)
+    stop.set()
+    event.remove(engine.sync_engine, "before_cursor_execute", count)
+    for task in [write, *tasks]:
+        task.cancel()
+    await asyncio.gather(write, *tasks, return_exceptions=True)
+    return counters
+
+
+async def main(args) -> None:
+    engine.echo = False
+    created: list[str] = []
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for _ in range(args.carts):
+                created.append((await client.post("/api/v1/carts", json={})).json()["id"])
+            print(f"{'mode':>6} {'requests':>9} {'statements':>11} {'latency ms':>11}")
+            for mode in MODES:
+                counters = await run(client, mode, created, args)
+                latency = statistics.median(counters.latencies) if counters.latencies else float("nan")
+                print(f"{mode:>6} {counters.requests:>9} {counters.statements:>11} {latency:>11.1f}")
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Cart).where(Cart.id.in_(created)))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare polling with the cart change stream")
+    parser.add_argument("--carts", type=int, default=200)
+    parser.add_argument("--devices", type=int, default=2, help="每个购物车同步的客户端数")
+    parser.add_argument("--interval", type=float, default=2, help="轮询间隔 (秒)")
+    parser.add_argument("--writes-per-second", type=float, default=20)
+    parser.add_argument("--seconds", type=float, default=10)
+    asyncio.run(main(parser.parse_args()))
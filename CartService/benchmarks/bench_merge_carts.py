@@ -0,0 +1,80 @@
+"""合并购物车基准测试
+
+在 DATABASE_URL 指向的数据库中生成源购物车 (N 个商品) 和目标购物车 (与源购物车重叠一半商品)，
+测量 CartService.merge_carts 的耗时，结束后清理生成的数据。
+
+    python -m benchmarks.bench_merge_carts --sizes 10 1000 10000 --repeat 3
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import delete, insert
+
+from app.db.session import AsyncSessionLocal, engine
+from app.models.cart import Cart, CartItem
+from app.services.cart_service import CartService
+
+
+async def create_cart_with_items(product_ids: list[str]) -> uuid.UUID:
+    now = datetime.utcnow()
+    cart_id = uuid.uuid4()
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(Cart).values(id=cart_id, status="active", created_at=now, updated_at=now))
+        if product_ids:
+            await db.execute(
+                insert(CartItem),
+                [
+                    {
+                        "id": uuid.uuid4(),
+                        "cart_id": cart_id,
+                        "product_id": product_id,
+                        "quantity": 1,
+                        "unit_price": Decimal("9.99"),
+                        "added_at": now,
+                    }
+                    for product_id in product_ids
+                ],
+            )
+        await db.commit()
+    return cart_id
+
+
+async def run_once(size: int) -> float:
+    source_products = [f"SKU-{i}" for i in range(size)]
+    target_products = source_products[: size // 2]
+    source_id = await create_cart_with_items(source_products)
+    target_id = await create_cart_with_items(target_products)
+
+    try:
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            cart = await CartService.merge_carts(db, target_id, source_id)
+            elapsed = time.perf_counter() - started
+        assert len(cart.items) == size
+        return elapsed
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Cart).where(Cart.id.in_([source_id, target_id])))
+            await db.commit()
+
+
+async def main(sizes: list[int], repeat: int) -> None:
+    engine.echo = False
+    print(f"{'items':>8} {'min ms':>10} {'median ms':>10} {'max ms':>10}")
+    for size in sizes:
+        timings = [await run_once(size) * 1000 for _ in range(repeat)]
+        print(f"{size:>8} {min(timings):>10.2f} {statistics.median(timings):>10.2f} {max(timings):>10.2f}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark CartService.merge_carts")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.repeat))
@@ -0,0 +1,79 @@
+"""decimal 与 minor_units 金额模式的大购物车读取基准测试
+
+创建一个含 N 个明细的购物车，在两种 CART_MONEY_MODE 下交替执行与 GET /carts/{id} 相同的
+Core 查询 + 组装 + orjson 序列化，以及与合并 / 批量接口相同的 calculate_total，输出每次的耗时中位数。
+两种模式的序列化结果必须相同，结束后删除该购物车。需要先执行 alembic upgrade head。
+
+    python -m benchmarks.bench_money_mode --items 500 --rounds 300
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from decimal import Decimal
+
+from sqlalchemy import delete
+
+from app.core.config import settings
+from app.core.serialization import json_dumps
+from app.db.session import AsyncSessionLocal, engine
+from app.models.cart import Cart
+from app.schemas.cart import CartCreate, CartBatchAdd
+from app.services.cart_service import CartService
+
+MODES = ("decimal", "minor_units")
+
+
+async def seed(items: int):
+    async with AsyncSessionLocal() as db:
+        cart = await CartService.create_cart(db, CartCreate())
+        operations = [
+            CartBatchAdd(op="add", product_id=f"SKU-{n}", quantity=n % 5 + 1, unit_price=Decimal(n % 997) + Decimal("0.99"))
+            for n in range(items)
+        ]
+        await CartService.apply_batch(db, cart.id, operations)
+        return cart.id
+
+
+async def measure(cart_id, rounds: int) -> dict[str, tuple]:
+    results = {}
+    async with AsyncSessionLocal() as db:
+        cart = await CartService.get_cart(db, cart_id)
+        for mode in MODES:
+            settings.CART_MONEY_MODE = mode
+            reads, totals = [], []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                body = json_dumps(await CartService.get_cart_document(db, cart_id))
+                reads.append((time.perf_counter() - started) * 1000)
+                started = time.perf_counter()
+                total = CartService.calculate_total(cart)
+                totals.append((time.perf_counter() - started) * 1000)
+            results[mode] = (reads, totals, body, total)
+    return results
+
+
+async def main(items: int, rounds: int) -> None:
+    engine.echo = False
+    cart_id = await seed(items)
+    try:
+        results = await measure(cart_id, rounds)
+        print(f"{'mode':>12} {'read ms':>9} {'total ms':>9}")
+        for mode, (reads, totals, _, _) in results.items():
+            print(f"{mode:>12} {statistics.median(reads):>9.3f} {statistics.median(totals):>9.4f}")
+        bodies = {body for _, _, body, _ in results.values()}
+        totals = {total for _, _, _, total in results.values()}
+        assert len(bodies) == 1 and len(totals) == 1, "money modes disagree"
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Cart).where(Cart.id == cart_id))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare decimal vs minor-unit money reads on a large cart")
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.rounds))
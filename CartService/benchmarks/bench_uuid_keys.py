@@ -0,0 +1,93 @@
+"""uuid4 与 UUIDv7 主键插入基准测试
+
+在独立的 bench_uuid schema 中为两种键各建一张表，先用数据库端生成的键预填 N 行，
+再从应用端 (uuid.uuid4 / app.core.ids.uuid7) 分批插入 M 行，输出插入吞吐量、
+本轮产生的 WAL 和最终主键索引大小，结束后删除 schema。
+
+索引大于 shared_buffers 时 uuid4 的随机写入会频繁换页，差距随表增大而拉开。
+每轮开始前执行 CHECKPOINT 使两轮的整页写入 (full page writes) 条件一致，需要超级用户或 pg_checkpoint 角色。
+需要先执行 alembic upgrade head 创建 uuid_generate_v7()。
+
+    python -m benchmarks.bench_uuid_keys --prefill 5000000 --rows 500000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import text
+
+from app.core.ids import uuid7
+from app.db.session import engine
+
+SCHEMA = "bench_uuid"
+GENERATORS = {
+    "v4": (uuid.uuid4, "gen_random_uuid()"),
+    "v7": (uuid7, "uuid_generate_v7()"),
+}
+
+
+async def prefill(conn, table: str, sql_generator: str, rows: int) -> None:
+    await conn.execute(text(
+        f"CREATE TABLE {SCHEMA}.{table} (id uuid PRIMARY KEY, user_id uuid, created_at timestamp NOT NULL)"
+    ))
+    await conn.execute(text(
+        f"""
+        INSERT INTO {SCHEMA}.{table} (id, user_id, created_at)
+        SELECT {sql_generator}, gen_random_uuid(), clock_timestamp() FROM generate_series(1, :rows)
+        """
+    ), {"rows": rows})
+    await conn.execute(text(f"ANALYZE {SCHEMA}.{table}"))
+    await conn.commit()
+
+
+async def insert_rows(conn, table: str, generator, rows: int, batch_size: int) -> tuple[float, int]:
+    """返回 (耗时秒数, 产生的 WAL 字节数)"""
+    statement = text(f"INSERT INTO {SCHEMA}.{table} (id, user_id, created_at) VALUES (:id, :user_id, now())")
+    await conn.execute(text("CHECKPOINT"))
+    wal_start = await conn.scalar(text("SELECT pg_current_wal_lsn()"))
+    started = time.perf_counter()
+    for offset in range(0, rows, batch_size):
+        batch = [{"id": generator(), "user_id": uuid.uuid4()} for _ in range(min(batch_size, rows - offset))]
+        await conn.execute(statement, batch)
+        await conn.commit()
+    elapsed = time.perf_counter() - started
+    wal_bytes = await conn.scalar(
+        text("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), CAST(:start AS pg_lsn))"), {"start": wal_start}
+    )
+    return elapsed, int(wal_bytes)
+
+
+async def main(prefill_rows: int, rows: int, batch_size: int) -> None:
+    engine.echo = False
+    async with engine.connect() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        await conn.commit()
+        try:
+            print(f"{'key':>4} {'rows/s':>10} {'WAL MB':>9} {'WAL B/row':>10} {'index MB':>9}")
+            for name, (generator, sql_generator) in GENERATORS.items():
+                table = f"keys_{name}"
+                await prefill(conn, table, sql_generator, prefill_rows)
+                elapsed, wal_bytes = await insert_rows(conn, table, generator, rows, batch_size)
+                index_size = await conn.scalar(
+                    text("SELECT pg_relation_size(CAST(:index AS regclass))"), {"index": f"{SCHEMA}.{table}_pkey"}
+                )
+                print(
+                    f"{name:>4} {rows / elapsed:>10.0f} {wal_bytes / 1024 / 1024:>9.1f} "
+                    f"{wal_bytes / rows:>10.0f} {index_size / 1024 / 1024:>9.1f}"
+                )
+        finally:
+            await conn.rollback()
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await conn.commit()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark uuid4 vs UUIDv7 primary key inserts")
+    parser.add_argument("--prefill", type=int, default=5_000_000)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.prefill, args.rows, args.batch_size))
@@ -0,0 +1,121 @@
+"""准入控制压测
+
+在进程内 (httpx ASGITransport) 以固定并发压测应用，连接池远小于并发数，模拟数据库饱和：
+80% 读取已有购物车、15% 添加商品、5% 新建购物车。分别在关闭和开启准入控制时运行，
+输出成功请求的 p50 / p99 延迟、被拒绝 (429 / 503) 和失败的请求数。
+
+连接池大小等在导入应用前从环境变量读取，建议：
+
+    DB_POOL_SIZE=4 DB_MAX_OVERFLOW=0 DB_POOL_TIMEOUT=10 CART_CACHE_BACKEND=none \\
+        python -m benchmarks.load_admission --concurrency 200 --seconds 20 --max-in-flight 16
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from collections import Counter
+
+import httpx
+from sqlalchemy import delete
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, engine
+from app.main import app
+from app.models.cart import Cart
+from benchmarks.bench_merge_carts import create_cart_with_items
+
+
+async def worker(client: httpx.AsyncClient, cart_ids: list[uuid.UUID], created: list[str], deadline: float, results: list) -> None:
+    user = str(uuid.uuid4())
+    headers = {"X-User-Id": user}
+    while time.perf_counter() < deadline:
+        roll = random.random()
+        cart_id = random.choice(cart_ids)
+        started = time.perf_counter()
+        try:
+            if roll < 0.80:
+                kind = "read"
+                response = await client.get(f"/api/v1/carts/{cart_id}", headers=headers)
+            elif roll < 0.95:
+                kind = "write"
+                response = await client.post(
+                    f"/api/v1/carts/{cart_id}/items",
+                    json={"product_id": f"SKU-{random.randrange(50)}", "quantity": 1, "unit_price": "9.99"},
+                    headers=headers,
+                )
+            else:
+                kind = "create"
+                response = await client.post("/api/v1/carts", json={"user_id": str(uuid.uuid4())}, headers=headers)
+                if response.status_code == 201:
+                    created.append(response.json()["id"])
+            status = response.status_code
+        except Exception:
+            kind, status = "error", 0
+        elapsed = (time.perf_counter() - started) * 1000
+        results.append((kind, status, elapsed))
+        if status in (429, 503):
+            # 客户端遵守 Retry-After，加随机抖动避免同时重试
+            await asyncio.sleep(float(response.headers["retry-after"]) * random.uniform(0.5, 1.5))
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(enabled: bool, cart_ids: list[uuid.UUID], created: list[str], concurrency: int, seconds: float) -> None:
+    settings.ADMISSION_ENABLED = enabled
+    results: list[tuple[str, int, float]] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(worker(client, cart_ids, created, deadline, results) for _ in range(concurrency)))
+
+    ok = [elapsed for _, status, elapsed in results if status < 400]
+    statuses = Counter(status for _, status, _ in results)
+    failed = sum(count for status, count in statuses.items() if (status >= 500 and status != 503) or status == 0)
+    by_kind = {
+        kind: percentile([e for k, s, e in results if k == kind and s < 400], 0.99) for kind in ("read", "write", "create")
+    }
+    print(
+        f"{'on' if enabled else 'off':>9} {len(results) / seconds:>8.0f} {len(ok) / seconds:>8.0f} "
+        f"{statistics.median(ok) if ok else float('nan'):>8.1f} {percentile(ok, 0.99):>8.1f} "
+        f"{by_kind['read']:>9.1f} {by_kind['write']:>9.1f} {by_kind['create']:>10.1f} "
+        f"{statuses[429]:>6} {statuses[503]:>6} {failed:>6}"
+    )
+
+
+async def main(carts: int, concurrency: int, seconds: float, max_in_flight: int, user_rate: float) -> None:
+    engine.echo = False
+    settings.ADMISSION_MAX_IN_FLIGHT = max_in_flight
+    settings.ADMISSION_RATE_PER_SECOND = user_rate
+    settings.ADMISSION_BURST = int(user_rate * 2)
+    cart_ids = [await create_cart_with_items([f"SKU-{i}" for i in range(20)]) for _ in range(carts)]
+    created: list[str] = []
+    try:
+        print(
+            f"{'admission':>9} {'req/s':>8} {'ok/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+            f"{'p99 read':>9} {'p99 write':>9} {'p99 create':>10} {'429':>6} {'503':>6} {'failed':>6}"
+        )
+        for enabled in (False, True):
+            await run(enabled, cart_ids, created, concurrency, seconds)
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Cart).where(Cart.id.in_([*cart_ids, *map(uuid.UUID, created)])))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test admission control under a saturated DB pool")
+    parser.add_argument("--carts", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    parser.add_argument("--user-rate", type=float, default=50, help="每个虚拟用户每秒允许的请求数")
+    args = parser.parse_args()
+    asyncio.run(main(args.carts, args.concurrency, args.seconds, args.max_in_flight, args.user_rate))
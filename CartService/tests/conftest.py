@@ -0,0 +1,70 @@
+"""测试使用 DATABASE_URL 指向的数据库 (需已执行 alembic upgrade head)，通过 ASGITransport 在进程内调用应用"""
+import httpx
+import pytest
+from app.core.metrics import endpoint_label
+from app.core.profiling import check_query_budget, profile_queries
+from app.db.session import engine
+from app.main import app
+
+# 默认配置下每个请求允许执行的 SQL 语句数和同一语句形状的最多出现次数，键为 /metrics 中的 endpoint 标签。
+# 不含刷新数量写缓冲的语句；新增接口或改变查询方式时同步修改。
+# 条件请求 (If-None-Match -> 304) 与 GET /carts/{cart_id} 共用预算。GET /carts/{cart_id}/events 不在其中：
+# 它是不会结束的 SSE 响应，ASGITransport 不支持流式响应，无法在请求结束时检查；
+# 它只在建立连接时读取一次版本号，之后的推送不访问数据库
+QUERY_BUDGETS: dict[str, tuple[int, int]] = {
+    "POST /carts": (2, 1),
+    "GET /carts/{cart_id}": (2, 1),
+    "GET /carts/{cart_id}/summary": (1, 1),
+    "GET /carts/{cart_id}/changes": (3, 1),
+    "POST /carts:batchGet": (2, 1),
+    "POST /carts/{cart_id}/items": (2, 1),
+    "POST /carts/{cart_id}/items:batch": (6, 1),
+    "PATCH /carts/{cart_id}/items/{item_id}": (2, 1),
+    "DELETE /carts/{cart_id}/items/{item_id}": (2, 1),
+    "DELETE /carts/{cart_id}": (2, 1),
+    "POST /carts/{cart_id}/merge": (4, 1),
+    "PUT /carts/{cart_id}/user": (2, 1),
+    "GET /users/{user_id}/carts": (1, 1),
+    "GET /users/{user_id}/active-cart": (2, 1),
+}
+
+
+class QueryBudgetMiddleware:
+    """每个请求结束后按 QUERY_BUDGETS 检查语句数，没有声明预算的接口直接失败"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        with profile_queries() as profile:
+            await self.app(scope, receive, send)
+        if scope["type"] != "http":
+            return
+        endpoint = endpoint_label(scope)
+        assert endpoint in QUERY_BUDGETS, f"no query budget declared for {endpoint}"
+        check_query_budget(profile, *QUERY_BUDGETS[endpoint], label=endpoint)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def _client(asgi_app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi_app), base_url="http://test") as client:
+        yield client
+    # 每个测试运行在新的事件循环中，连接不能跨测试复用
+    await engine.dispose()
+
+
+@pytest.fixture
+async def client():
+    async for client in _client(app):
+        yield client
+
+
+@pytest.fixture
+async def budgeted_client():
+    """逐个请求按 QUERY_BUDGETS 约束 SQL 语句数的客户端"""
+    async for client in _client(QueryBudgetMiddleware(app)):
+        yield client
@@ -0,0 +1,39 @@
+import httpx
+import pytest
+from app.core.admission import AdmissionControlMiddleware
+from app.core.config import settings
+
+pytestmark = pytest.mark.anyio
+
+
+async def ok(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+@pytest.fixture
+def limited(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_ENABLED", True)
+    monkeypatch.setattr(settings, "ADMISSION_RATE_PER_SECOND", 1)
+    monkeypatch.setattr(settings, "ADMISSION_BURST", 2)
+    app = AdmissionControlMiddleware(ok, path_prefix="/api/v1")
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def statuses(client, method, path, headers=None, count=4):
+    return [(await client.request(method, path, headers=headers)).status_code for _ in range(count)]
+
+
+async def test_rate_limits_identified_users(limited):
+    assert await statuses(limited, "GET", "/api/v1/carts/c1", {"X-User-Id": "u1"}) == [200, 200, 429, 429]
+    # 其他用户有自己的令牌桶
+    assert await statuses(limited, "GET", "/api/v1/users/u2/carts", count=1) == [200]
+
+
+async def test_requests_without_identity_share_no_bucket(limited):
+    # 代理之后所有请求的客户端地址相同，不能按地址限流
+    assert await statuses(limited, "GET", "/api/v1/carts/c1") == [200] * 4
+
+
+async def test_service_batch_get_is_not_rate_limited(limited):
+    assert await statuses(limited, "POST", "/api/v1/carts:batchGet", {"X-User-Id": "u1"}) == [200] * 4
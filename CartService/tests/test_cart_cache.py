@@ -0,0 +1,21 @@
+import uuid
+import pytest
+from app.services.cart_cache import CachedCart, MemoryCartCache
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_set_after_invalidate_refuses_older_version():
+    cache = MemoryCartCache(max_entries=10, ttl_seconds=30)
+    cart_id = uuid.uuid4()
+    await cache.set(cart_id, CachedCart(3, b"v3"))
+    await cache.invalidate({cart_id: 4})
+
+    # 滞后的副本仍读到版本 3
+    await cache.set(cart_id, CachedCart(3, b"v3"))
+    assert await cache.get(cart_id) is None
+
+    await cache.set(cart_id, CachedCart(4, b"v4"))
+    await cache.set(cart_id, CachedCart(3, b"v3"))
+    assert await cache.get(cart_id) == CachedCart(4, b"v4")
+    assert cache.stats.stale_sets == 2
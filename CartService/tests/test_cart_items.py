@@ -0,0 +1,65 @@
+import pytest
+from app.core.config import settings
+from app.services.quantity_buffer import quantity_buffer
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_buffered_patch_in_minor_units_mode_returns_decimal_unit_price(client, monkeypatch):
+    monkeypatch.setattr(settings, "CART_MONEY_MODE", "minor_units")
+    monkeypatch.setattr(quantity_buffer, "enabled", True)
+    cart_id = (await client.post("/api/v1/carts", json={})).json()["id"]
+    item = (await client.post(
+        f"/api/v1/carts/{cart_id}/items", json={"product_id": "SKU-1", "quantity": 1, "unit_price": "9.99"}
+    )).json()
+
+    response = await client.patch(f"/api/v1/carts/{cart_id}/items/{item['id']}", json={"quantity": 3})
+    assert response.status_code == 200
+    assert response.json()["quantity"] == 3
+    assert response.json()["unit_price"] == "9.99"
+
+    # 读请求先刷新缓冲
+    cart = (await client.get(f"/api/v1/carts/{cart_id}")).json()
+    assert [(line["quantity"], line["unit_price"]) for line in cart["items"]] == [(3, "9.99")]
+    assert cart["total_price"] == "29.97"
+
+
+async def test_item_writes_return_etag_usable_for_if_match(client):
+    created = await client.post("/api/v1/carts", json={})
+    cart_id, etag = created.json()["id"], created.headers["ETag"]
+
+    added = await client.post(
+        f"/api/v1/carts/{cart_id}/items",
+        json={"product_id": "SKU-1", "quantity": 1, "unit_price": "9.99"},
+        headers={"If-Match": etag},
+    )
+    assert added.status_code == 201 and added.headers["ETag"] != etag
+    updated = await client.patch(
+        f"/api/v1/carts/{cart_id}/items/{added.json()['id']}", json={"quantity": 2}, headers={"If-Match": added.headers["ETag"]}
+    )
+    assert updated.status_code == 200
+    removed = await client.delete(
+        f"/api/v1/carts/{cart_id}/items/{added.json()['id']}", headers={"If-Match": updated.headers["ETag"]}
+    )
+    assert removed.status_code == 204
+    cleared = await client.delete(f"/api/v1/carts/{cart_id}", headers={"If-Match": removed.headers["ETag"]})
+    assert cleared.status_code == 204
+    assert (await client.get(f"/api/v1/carts/{cart_id}")).headers["ETag"] == cleared.headers["ETag"]
+
+
+@pytest.mark.parametrize("money_mode", ["decimal", "minor_units"])
+async def test_single_item_writes_keep_cart_totals(client, monkeypatch, money_mode):
+    monkeypatch.setattr(settings, "CART_MONEY_MODE", money_mode)
+    cart_id = (await client.post("/api/v1/carts", json={})).json()["id"]
+    items = f"/api/v1/carts/{cart_id}/items"
+    first = (await client.post(items, json={"product_id": "SKU-1", "quantity": 2, "unit_price": "9.99"})).json()
+    await client.post(items, json={"product_id": "SKU-2", "quantity": 1, "unit_price": "1.50"})
+    # 再次加购时单价改变，原有数量也按新单价计算
+    await client.post(items, json={"product_id": "SKU-1", "quantity": 1, "unit_price": "8.00"})
+    second = (await client.post(items, json={"product_id": "SKU-3", "quantity": 4, "unit_price": "0.25"})).json()
+    await client.patch(f"{items}/{second['id']}", json={"quantity": 2})
+    await client.delete(f"{items}/{first['id']}")
+
+    summary = (await client.get(f"/api/v1/carts/{cart_id}/summary")).json()
+    assert summary["item_count"] == 3
+    assert summary["subtotal"] == "2.00"
@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def _cart_with_item(client, product_id: str, quantity: int) -> str:
+    cart_id = (await client.post("/api/v1/carts", json={})).json()["id"]
+    added = await client.post(
+        f"/api/v1/carts/{cart_id}/items", json={"product_id": product_id, "quantity": quantity, "unit_price": "1.00"}
+    )
+    assert added.status_code == 201
+    return cart_id
+
+
+async def test_merging_an_already_merged_source_is_rejected(client):
+    target_id = await _cart_with_item(client, "SKU-1", 1)
+    source_id = await _cart_with_item(client, "SKU-1", 2)
+
+    merged = await client.post(f"/api/v1/carts/{target_id}/merge", json={"source_cart_id": source_id})
+    assert merged.status_code == 200
+    assert [line["quantity"] for line in merged.json()["items"]] == [3]
+
+    replayed = await client.post(f"/api/v1/carts/{target_id}/merge", json={"source_cart_id": source_id})
+    assert replayed.status_code in (404, 409)
+    cart = (await client.get(f"/api/v1/carts/{target_id}")).json()
+    assert [line["quantity"] for line in cart["items"]] == [3]
+
+
+async def test_opposite_concurrent_merges_do_not_deadlock(client):
+    first_id = await _cart_with_item(client, "SKU-1", 1)
+    second_id = await _cart_with_item(client, "SKU-2", 1)
+
+    responses = await asyncio.gather(
+        client.post(f"/api/v1/carts/{first_id}/merge", json={"source_cart_id": second_id}),
+        client.post(f"/api/v1/carts/{second_id}/merge", json={"source_cart_id": first_id}),
+    )
+    # 后加锁的一方看到源购物车已被合并
+    assert sorted(response.status_code for response in responses) == [200, 409]
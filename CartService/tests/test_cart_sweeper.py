@@ -0,0 +1,37 @@
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select, update
+from app.db.session import AsyncSessionLocal
+from app.models.cart import Cart, CartItemTombstone
+from app.services.cart_sweeper import prune_tombstones
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_prune_tombstones_keeps_updated_at(client):
+    cart_id = (await client.post("/api/v1/carts", json={})).json()["id"]
+    item = (await client.post(
+        f"/api/v1/carts/{cart_id}/items", json={"product_id": "SKU-1", "quantity": 1, "unit_price": "9.99"}
+    )).json()
+    assert (await client.delete(f"/api/v1/carts/{cart_id}/items/{item['id']}")).status_code == 204
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(CartItemTombstone)
+            .where(CartItemTombstone.cart_id == uuid.UUID(cart_id))
+            .values(removed_at=datetime.utcnow() - timedelta(hours=2))
+        )
+        await db.commit()
+        before = (await db.execute(select(Cart.updated_at, Cart.version).where(Cart.id == uuid.UUID(cart_id)))).one()
+
+    assert await prune_tombstones(timedelta(hours=1), batch_size=1000) >= 1
+
+    async with AsyncSessionLocal() as db:
+        after = (await db.execute(
+            select(Cart.updated_at, Cart.version, Cart.changes_horizon).where(Cart.id == uuid.UUID(cart_id))
+        )).one()
+        remaining = await db.scalar(select(CartItemTombstone.item_id).where(CartItemTombstone.cart_id == uuid.UUID(cart_id)))
+    assert remaining is None
+    assert (after.updated_at, after.version) == (before.updated_at, before.version)
+    assert after.changes_horizon == before.version
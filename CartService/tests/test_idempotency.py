@@ -0,0 +1,33 @@
+import pytest
+from app.core.idempotency import IdempotencyRecord, MemoryIdempotencyStore, StoredResponse
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_memory_store_never_evicts_in_flight_records():
+    store = MemoryIdempotencyStore(ttl_seconds=60, lock_seconds=60, max_entries=2)
+    assert await store.claim("in-flight", "a") is None
+    assert await store.claim("done", "b") is None
+    await store.complete("done", IdempotencyRecord("b", StoredResponse(201, [], b"{}")))
+
+    # 超限时淘汰已完成的记录，处理中的记录保留
+    assert await store.claim("new", "c") is None
+    assert await store.claim("in-flight", "a") == IdempotencyRecord("a")
+    assert await store.claim("done", "b") is None
+
+    # 只剩处理中的记录时允许暂时超出上限
+    assert await store.claim("another", "d") is None
+    assert await store.claim("in-flight", "a") == IdempotencyRecord("a")
+
+
+async def test_same_key_from_different_users_is_not_shared(client):
+    headers = {"Idempotency-Key": "create-cart-1"}
+    first = await client.post("/api/v1/carts", json={}, headers={**headers, "X-User-Id": "user-a"})
+    second = await client.post("/api/v1/carts", json={}, headers={**headers, "X-User-Id": "user-b"})
+    assert first.status_code == second.status_code == 201
+    assert "idempotent-replayed" not in second.headers
+    assert first.json()["id"] != second.json()["id"]
+
+    replayed = await client.post("/api/v1/carts", json={}, headers={**headers, "X-User-Id": "user-a"})
+    assert replayed.headers["idempotent-replayed"] == "true"
+    assert replayed.json()["id"] == first.json()["id"]
@@ -0,0 +1,50 @@
+import uuid
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def expect(response, status_code: int):
+    # 提前失败的请求执行的语句更少，不检查状态码会让预算测试漏掉回归
+    assert response.status_code == status_code, (response.request.method, response.request.url.path, response.text)
+    return response
+
+
+async def test_cart_endpoints_stay_within_query_budgets(budgeted_client):
+    client = budgeted_client
+    user_id = str(uuid.uuid4())
+    cart_id = expect(await client.post("/api/v1/carts", json={"user_id": user_id}), 201).json()["id"]
+    items = f"/api/v1/carts/{cart_id}/items"
+    for product_id in ("SKU-1", "SKU-2", "SKU-3"):
+        added = expect(
+            await client.post(items, json={"product_id": product_id, "quantity": 1, "unit_price": "1.00"}), 201
+        )
+    item_id = added.json()["id"]
+    expect(await client.patch(f"{items}/{item_id}", json={"quantity": 2}), 200)
+    expect(await client.post(f"{items}:batch", json={"operations": [
+        {"op": "add", "product_id": "SKU-4", "unit_price": "2.00"},
+        {"op": "set_quantity", "product_id": "SKU-1", "quantity": 3},
+        {"op": "remove", "product_id": "SKU-2"},
+    ]}), 200)
+
+    # 第一次读取未命中缓存，随后的条件请求返回 304
+    etag = expect(await client.get(f"/api/v1/carts/{cart_id}"), 200).headers["ETag"]
+    expect(await client.get(f"/api/v1/carts/{cart_id}", headers={"If-None-Match": etag}), 304)
+    expect(await client.get(f"/api/v1/carts/{cart_id}/summary"), 200)
+    expect(await client.get(f"/api/v1/carts/{cart_id}/changes", params={"since": 1}), 200)
+    expect(await client.get(f"/api/v1/users/{user_id}/carts"), 200)
+    expect(await client.get(f"/api/v1/users/{user_id}/active-cart"), 200)
+
+    source_id = expect(await client.post("/api/v1/carts", json={}), 201).json()["id"]
+    for product_id in ("SKU-1", "SKU-5"):
+        expect(
+            await client.post(f"/api/v1/carts/{source_id}/items", json={"product_id": product_id, "unit_price": "1.00"}),
+            201,
+        )
+    expect(await client.post(f"/api/v1/carts/{cart_id}/merge", json={"source_cart_id": source_id}), 200)
+    other_id = expect(await client.post("/api/v1/carts", json={}), 201).json()["id"]
+    expect(await client.put(f"/api/v1/carts/{other_id}/user", json={"user_id": str(uuid.uuid4())}), 200)
+    expect(await client.post("/api/v1/carts:batchGet", json={"cart_ids": [cart_id, source_id, other_id]}), 200)
+
+    expect(await client.delete(f"{items}/{item_id}"), 204)
+    expect(await client.delete(f"/api/v1/carts/{cart_id}"), 204)